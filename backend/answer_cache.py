@@ -0,0 +1,131 @@
+"""
+Similarity cache for AI Buddy answers.
+
+Doubts are represented as TF-IDF weighted character n-gram vectors (feature
+hashed, computed locally). Candidates come from the MinHash/LSH index used
+for question dedup, and an answer is served only when the TF-IDF cosine
+similarity clears the threshold. Each worker keeps its own cache, warmed from
+recent chat_messages at startup.
+"""
+
+import math
+import os
+import time
+import zlib
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from question_dedup import LshIndex, lsh_bands, minhash, normalize_text
+
+BUDDY_CACHE_THRESHOLD = float(os.environ.get('BUDDY_CACHE_THRESHOLD', 0.9))
+BUDDY_CACHE_MAX_ENTRIES = int(os.environ.get('BUDDY_CACHE_MAX_ENTRIES', 20000))
+
+NGRAM_SIZES = (3, 4, 5)
+FEATURE_BITS = 20
+FEATURE_MASK = (1 << FEATURE_BITS) - 1
+
+
+def char_ngrams(text: str) -> Counter:
+    """Hashed character n-gram counts of the normalized text"""
+    padded = f" {normalize_text(text)} "
+    return Counter(
+        zlib.crc32(padded[i:i + n].encode("utf-8")) & FEATURE_MASK
+        for n in NGRAM_SIZES
+        for i in range(len(padded) - n + 1)
+    )
+
+
+@dataclass
+class CacheEntry:
+    question: str
+    answer: str
+    terms: Counter
+    bands: list
+    hits: int = 0
+
+
+@dataclass
+class CacheHit:
+    question: str
+    answer: str
+    similarity: float
+
+
+class AnswerCache:
+    def __init__(self, threshold: float = BUDDY_CACHE_THRESHOLD, max_entries: int = BUDDY_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.index = LshIndex()
+        self.document_frequency: Counter = Counter()
+        self.lookups = 0
+        self.hits = 0
+        self.similarity_total = 0.0
+        self.lookup_seconds = 0.0
+
+    def _idf(self, term: int) -> float:
+        return math.log((1 + len(self.entries)) / (1 + self.document_frequency[term])) + 1
+
+    def _cosine(self, a: Counter, b: Counter) -> float:
+        if len(a) > len(b):
+            a, b = b, a
+        dot = sum(count * b[term] * self._idf(term) ** 2 for term, count in a.items() if term in b)
+        if not dot:
+            return 0.0
+        norm_a = math.sqrt(sum((count * self._idf(term)) ** 2 for term, count in a.items()))
+        norm_b = math.sqrt(sum((count * self._idf(term)) ** 2 for term, count in b.items()))
+        return dot / (norm_a * norm_b)
+
+    def lookup(self, question: str, threshold: Optional[float] = None) -> Optional[CacheHit]:
+        """Return the cached answer of the most similar past doubt, if similar enough"""
+        started = time.perf_counter()
+        threshold = self.threshold if threshold is None else threshold
+        self.lookups += 1
+        terms = char_ngrams(question)
+        signature = minhash({"question": question})
+
+        best_key, best_score = None, 0.0
+        for key in {key for band in lsh_bands(signature) for key in self.index.buckets.get(band, ())}:
+            score = self._cosine(terms, self.entries[key].terms)
+            if score > best_score:
+                best_key, best_score = key, score
+
+        self.lookup_seconds += time.perf_counter() - started
+        if best_key is None or best_score < threshold:
+            return None
+        entry = self.entries[best_key]
+        entry.hits += 1
+        self.entries.move_to_end(best_key)
+        self.hits += 1
+        self.similarity_total += best_score
+        return CacheHit(question=entry.question, answer=entry.answer, similarity=round(best_score, 3))
+
+    def add(self, question: str, answer: str):
+        key = normalize_text(question)
+        if not key or key in self.entries:
+            return
+        signature = minhash({"question": question})
+        entry = CacheEntry(question=question, answer=answer, terms=char_ngrams(question), bands=lsh_bands(signature))
+        self.entries[key] = entry
+        self.document_frequency.update(entry.terms.keys())
+        self.index.add(key, signature, entry.bands)
+        while len(self.entries) > self.max_entries:
+            self._evict()
+
+    def _evict(self):
+        key, entry = self.entries.popitem(last=False)
+        self.document_frequency.subtract(entry.terms.keys())
+        self.index.remove(key, entry.bands)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "entries": len(self.entries),
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "misses": self.lookups - self.hits,
+            "hitRate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "avgHitSimilarity": round(self.similarity_total / self.hits, 4) if self.hits else 0.0,
+            "avgLookupMs": round(self.lookup_seconds / self.lookups * 1000, 3) if self.lookups else 0.0,
+        }
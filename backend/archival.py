@@ -0,0 +1,161 @@
+"""
+Retention for high-volume collections.
+
+Ephemeral collections (daily questions, pre-generated question sets) expire
+through TTL indexes. Per-user history (AI Buddy chat, practice sessions) is
+kept forever but moved out of the hot collections once it is older than the
+hot window: documents are compacted into one bucket document per user and
+month, e.g. chat_archive {userId, month: "2026-03", items: [...]}, so hot
+indexes stay small and archived reads fetch a handful of documents.
+
+Archiving is idempotent: buckets are filled with $addToSet, so a run that
+stops between writing a bucket and deleting the hot documents can simply be
+repeated.
+
+CLI (reads MONGO_URL and DB_NAME from the environment or backend/.env):
+
+    python archival.py                   # archive with the configured windows
+    python archival.py --chat-days 30    # override the hot window for chat
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+CHAT_HOT_DAYS = int(os.environ.get('CHAT_HOT_DAYS', 90))
+PRACTICE_HOT_DAYS = int(os.environ.get('PRACTICE_HOT_DAYS', 365))
+DAILY_QUESTION_TTL_DAYS = int(os.environ.get('DAILY_QUESTION_TTL_DAYS', 30))
+PREGENERATED_TTL_DAYS = int(os.environ.get('PREGENERATED_TTL_DAYS', 90))
+ARCHIVE_BATCH_SIZE = 2000
+INDEX_OPTIONS_CONFLICT = 85
+
+
+# ==================== TTL Indexes ====================
+
+async def ensure_ttl_index(db, collection: str, field: str, days: int):
+    """Create a TTL index, or change its expiry if it already exists with another one"""
+    seconds = days * 86400
+    try:
+        await db[collection].create_index(field, expireAfterSeconds=seconds)
+    except OperationFailure as e:
+        if e.code != INDEX_OPTIONS_CONFLICT:
+            raise
+        await db.command("collMod", collection, index={"keyPattern": {field: 1}, "expireAfterSeconds": seconds})
+
+
+# ==================== Compaction ====================
+
+def compact_chat(message: dict) -> dict:
+    return {k: message[k] for k in ("id", "sessionId", "message", "response", "cached", "createdAt") if k in message}
+
+
+def compact_practice_session(session: dict) -> dict:
+    return {k: v for k, v in session.items() if k not in ("_id", "userId")}
+
+
+ARCHIVES = {
+    # source collection: (archive collection, compaction)
+    "chat_messages": ("chat_archive", compact_chat),
+    "practice_sessions": ("practice_archive", compact_practice_session),
+}
+
+
+async def archive_collection(db, source: str, older_than: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> dict:
+    """Move documents created before `older_than` into per-user monthly buckets"""
+    archive, compact = ARCHIVES[source]
+    moved = buckets = 0
+    while True:
+        documents = await db[source].find({"createdAt": {"$lt": older_than}}).sort(
+            [("userId", 1), ("createdAt", 1)]
+        ).to_list(batch_size)
+        if not documents:
+            break
+
+        grouped: Dict[tuple, List[dict]] = defaultdict(list)
+        for document in documents:
+            grouped[(document["userId"], document["createdAt"].strftime("%Y-%m"))].append(compact(document))
+        await db[archive].bulk_write([
+            UpdateOne(
+                {"userId": user_id, "month": month},
+                {"$addToSet": {"items": {"$each": items}},
+                 "$min": {"firstAt": items[0]["createdAt"]},
+                 "$max": {"lastAt": items[-1]["createdAt"]}},
+                upsert=True,
+            )
+            for (user_id, month), items in grouped.items()
+        ], ordered=False)
+        await db[source].delete_many({"_id": {"$in": [d["_id"] for d in documents]}})
+
+        moved += len(documents)
+        buckets += len(grouped)
+    return {"collection": source, "archive": archive, "moved": moved, "bucketWrites": buckets}
+
+
+async def run_archival(db, chat_days: int = CHAT_HOT_DAYS, practice_days: int = PRACTICE_HOT_DAYS) -> dict:
+    now = datetime.utcnow()
+    return {
+        "chat": await archive_collection(db, "chat_messages", now - timedelta(days=chat_days)),
+        "practice": await archive_collection(db, "practice_sessions", now - timedelta(days=practice_days)),
+    }
+
+
+async def ensure_archive_indexes(db):
+    for archive, _ in ARCHIVES.values():
+        await db[archive].create_index([("userId", 1), ("month", -1)], unique=True)
+
+
+# ==================== Reads ====================
+
+async def read_archived(db, source: str, user_id: str, limit: int,
+                        predicate: Optional[Callable[[dict], bool]] = None) -> List[dict]:
+    """Newest-first archived items of a user, rehydrated to the hot document shape"""
+    archive, _ = ARCHIVES[source]
+    items = []
+    async for bucket in db[archive].find({"userId": user_id}, {"_id": 0, "items": 1}).sort("month", -1):
+        month = [
+            {"userId": user_id, **item} for item in bucket["items"]
+            if predicate is None or predicate(item)
+        ]
+        items.extend(sorted(month, key=lambda item: item["createdAt"], reverse=True))
+        if len(items) >= limit:
+            break
+    return items[:limit]
+
+
+# ==================== CLI ====================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive cold chat history and practice sessions")
+    parser.add_argument("--chat-days", type=int, default=CHAT_HOT_DAYS)
+    parser.add_argument("--practice-days", type=int, default=PRACTICE_HOT_DAYS)
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            db = client[os.environ['DB_NAME']]
+            await ensure_archive_indexes(db)
+            return await run_archival(db, args.chat_days, args.practice_days)
+        finally:
+            client.close()
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
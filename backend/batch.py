@@ -0,0 +1,96 @@
+"""
+Building blocks of the offline batch jobs (question calibration, weak areas).
+
+Jobs stream a collection in fixed-size batches, hand each batch to a
+function running in a process pool (the CPU-bound part) and write results back
+with unordered bulk writes. Results come back in submission order, so a job
+can checkpoint after every batch and resume from there after a crash.
+
+With workers <= 1 no pool is started and batches run in a thread instead,
+which is what the API's job workers use; the CLIs default to one process per
+CPU.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterable, List, Optional
+
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))
+BATCH_SIZE = int(os.environ.get('BATCH_SIZE', 50_000))
+BULK_WRITE_SIZE = 1000
+
+
+async def iter_batches(cursor, size: int = BATCH_SIZE) -> AsyncIterator[List[dict]]:
+    """Stream a cursor as lists of at most `size` documents"""
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def process_pool(workers: int, initializer: Optional[Callable] = None, initargs: tuple = ()) -> Optional[ProcessPoolExecutor]:
+    """A pool of `workers` processes, or None to run inline when workers <= 1"""
+    if workers <= 1:
+        if initializer:
+            initializer(*initargs)
+        return None
+    # spawn: forking a process that runs Motor's threads can deadlock the child
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=initializer, initargs=initargs)
+
+
+async def map_batches(pool: Optional[ProcessPoolExecutor], fn: Callable, batches: AsyncIterator,
+                      max_inflight: int = 2) -> AsyncIterator:
+    """Yield fn(batch) for every batch, in order, keeping at most `max_inflight` batches in the pool"""
+    loop = asyncio.get_running_loop()
+    inflight = deque()
+    async for batch in batches:
+        inflight.append(loop.run_in_executor(pool, fn, batch) if pool else asyncio.ensure_future(asyncio.to_thread(fn, batch)))
+        if len(inflight) >= max_inflight:
+            yield await inflight.popleft()
+    while inflight:
+        yield await inflight.popleft()
+
+
+async def bulk_write_batches(collection, operations: Iterable, size: int = BULK_WRITE_SIZE) -> int:
+    """Unordered bulk writes of `size` operations at a time; returns the number of operations sent"""
+    sent = 0
+    chunk = []
+    for operation in operations:
+        chunk.append(operation)
+        if len(chunk) >= size:
+            await collection.bulk_write(chunk, ordered=False)
+            sent += len(chunk)
+            chunk = []
+    if chunk:
+        await collection.bulk_write(chunk, ordered=False)
+        sent += len(chunk)
+    return sent
+
+
+class Checkpoint:
+    """Progress of a resumable job in the batch_checkpoints collection"""
+
+    def __init__(self, db, job: str):
+        self.collection = db.batch_checkpoints
+        self.job = job
+
+    async def load(self) -> Optional[dict]:
+        checkpoint = await self.collection.find_one({"job": self.job}, {"_id": 0})
+        return checkpoint["state"] if checkpoint else None
+
+    async def save(self, state: dict):
+        await self.collection.update_one(
+            {"job": self.job}, {"$set": {"state": state, "updatedAt": datetime.utcnow()}}, upsert=True
+        )
+
+    async def clear(self):
+        await self.collection.delete_one({"job": self.job})
@@ -0,0 +1,216 @@
+"""
+Empirical difficulty and discrimination of questions from attempt events.
+
+Two passes over question_attempts (events whose correctness is known):
+
+1. One aggregation gives every student's smoothed share of correct answers,
+   used as their ability.
+2. The events are streamed in batches; a process pool reduces each batch to
+   per-question sums (attempts, correct, ability moments) with bincount. The
+   sums of all batches are added up, so a question may span any number of
+   batches.
+
+From the sums, per question:
+
+- pCorrect: share of correct attempts, mapped to easy (>= 0.7), hard (< 0.4)
+  or medium and written back to `difficulty`
+- discrimination: point-biserial correlation between answering correctly and
+  ability (low or negative values flag ambiguous or mis-keyed questions)
+- irtDifficulty: Rasch item difficulty in logits by the PROX normal
+  approximation, b = mean(theta) + sqrt(1 + var(theta) / 2.89) * ln((1 - p) / p)
+
+Only questions with at least `min_attempts` attempts are updated. The question
+catalog is recounted afterwards, as difficulties move between levels.
+
+CLI (reads MONGO_URL and DB_NAME from the environment or backend/.env):
+
+    python calibration.py                  # one process per CPU
+    python calibration.py --workers 1 --dry-run
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from pymongo import UpdateOne
+
+from batch import BATCH_SIZE, BATCH_WORKERS, bulk_write_batches, iter_batches, map_batches, process_pool
+from question_catalog import rebuild_catalog
+
+logger = logging.getLogger(__name__)
+
+CALIBRATION_MIN_ATTEMPTS = int(os.environ.get('CALIBRATION_MIN_ATTEMPTS', 30))
+EASY_P_CORRECT = 0.7
+HARD_P_CORRECT = 0.4
+PROB_CLIP = 0.01  # keeps logits finite for all-correct / all-wrong questions and students
+
+# attempts, correct, ability, ability^2, correct*ability, theta, theta^2
+STAT_COLUMNS = 7
+
+
+def logit(p: np.ndarray) -> np.ndarray:
+    p = np.clip(p, PROB_CLIP, 1 - PROB_CLIP)
+    return np.log(p / (1 - p))
+
+
+# ==================== Worker Side ====================
+
+_abilities: Dict[str, float] = {}
+
+
+def init_worker(abilities: Dict[str, float]):
+    global _abilities
+    _abilities = abilities
+
+
+def item_statistics(events: List[dict]) -> Tuple[List[str], np.ndarray]:
+    """Per-question sums of one batch of events: (question ids, [questions x STAT_COLUMNS])"""
+    codes: Dict[str, int] = {}
+    count = len(events)
+    question = np.fromiter((codes.setdefault(e["meta"]["questionId"], len(codes)) for e in events),
+                           dtype=np.int64, count=count)
+    correct = np.fromiter((e["correct"] for e in events), dtype=np.float64, count=count)
+    ability = np.fromiter((_abilities.get(e["userId"], 0.5) for e in events), dtype=np.float64, count=count)
+    theta = logit(ability)
+    stats = np.stack([
+        np.bincount(question, weights=column, minlength=len(codes))
+        for column in (np.ones(count), correct, ability, ability * ability, correct * ability, theta, theta * theta)
+    ], axis=1)
+    return list(codes), stats
+
+
+# ==================== Estimates ====================
+
+def item_estimates(stats: np.ndarray) -> Dict[str, np.ndarray]:
+    """Difficulty and discrimination from the summed statistics of every question"""
+    n = np.maximum(stats[:, 0], 1)
+    p = stats[:, 1] / n
+    mean_ability = stats[:, 2] / n
+    ability_var = np.maximum(stats[:, 3] / n - mean_ability ** 2, 0)
+    covariance = stats[:, 4] / n - p * mean_ability
+    spread = np.sqrt(p * (1 - p) * ability_var)
+    discrimination = np.divide(covariance, spread, out=np.zeros_like(p), where=spread > 0)
+
+    mean_theta = stats[:, 5] / n
+    theta_var = np.maximum(stats[:, 6] / n - mean_theta ** 2, 0)
+    irt_difficulty = mean_theta + np.sqrt(1 + theta_var / 2.89) * -logit(p)
+    return {
+        "attempts": stats[:, 0].astype(np.int64),
+        "pCorrect": p,
+        "discrimination": discrimination,
+        "irtDifficulty": irt_difficulty,
+        "difficulty": np.where(p >= EASY_P_CORRECT, "easy", np.where(p < HARD_P_CORRECT, "hard", "medium")),
+    }
+
+
+# ==================== Job ====================
+
+async def user_abilities(attempts) -> Dict[str, float]:
+    """Laplace-smoothed share of correct answers per student"""
+    abilities = {}
+    async for group in attempts.aggregate([
+        {"$match": {"correct": {"$ne": None}}},
+        {"$group": {"_id": "$userId", "n": {"$sum": 1}, "correct": {"$sum": {"$cond": ["$correct", 1, 0]}}}},
+    ], allowDiskUse=True):
+        abilities[group["_id"]] = (group["correct"] + 1) / (group["n"] + 2)
+    return abilities
+
+
+async def calibrate(db, workers: int = 1, min_attempts: int = CALIBRATION_MIN_ATTEMPTS,
+                    batch_size: int = BATCH_SIZE, apply: bool = True) -> dict:
+    started = time.perf_counter()
+    abilities = await user_abilities(db.question_attempts)
+
+    index: Dict[str, int] = {}
+    totals = np.zeros((1024, STAT_COLUMNS))
+    events = 0
+    pool = process_pool(workers, init_worker, (abilities,))
+    try:
+        cursor = db.question_attempts.find(
+            {"correct": {"$ne": None}}, {"_id": 0, "meta.questionId": 1, "userId": 1, "correct": 1}
+        ).batch_size(min(batch_size, 10_000))
+        async for ids, stats in map_batches(pool, item_statistics, iter_batches(cursor, batch_size),
+                                            max_inflight=max(2, workers * 2)):
+            rows = [index.setdefault(question_id, len(index)) for question_id in ids]
+            if len(index) > len(totals):
+                totals = np.concatenate([totals, np.zeros((max(len(index), 2 * len(totals)) - len(totals), STAT_COLUMNS))])
+            totals[rows] += stats
+            events += int(stats[:, 0].sum())
+    finally:
+        if pool:
+            pool.shutdown()
+
+    question_ids = list(index)
+    estimates = item_estimates(totals[:len(question_ids)])
+    calibrated = np.flatnonzero(estimates["attempts"] >= min_attempts)
+    now = datetime.utcnow()
+    updates = [
+        UpdateOne({"id": question_ids[i]}, {"$set": {
+            "difficulty": str(estimates["difficulty"][i]),
+            "calibration": {
+                "attempts": int(estimates["attempts"][i]),
+                "pCorrect": round(float(estimates["pCorrect"][i]), 4),
+                "discrimination": round(float(estimates["discrimination"][i]), 4),
+                "irtDifficulty": round(float(estimates["irtDifficulty"][i]), 3),
+                "calibratedAt": now,
+            },
+        }})
+        for i in calibrated
+    ]
+    updated = 0
+    if apply and updates:
+        updated = await bulk_write_batches(db.questions, updates)
+        await rebuild_catalog(db.questions, db.question_catalog)
+
+    report = {
+        "events": events,
+        "students": len(abilities),
+        "questions": len(question_ids),
+        "calibrated": len(calibrated),
+        "updated": updated,
+        "levels": dict(Counter(str(level) for level in estimates["difficulty"][calibrated])),
+        "lowDiscrimination": int((estimates["discrimination"][calibrated] < 0.1).sum()),
+        "applied": apply,
+        "elapsedSeconds": round(time.perf_counter() - started, 2),
+    }
+    logger.info(f"Calibration: {report}")
+    return report
+
+
+# ==================== CLI ====================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate question difficulty from attempt events")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--min-attempts", type=int, default=CALIBRATION_MIN_ATTEMPTS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Report without updating questions")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            return await calibrate(client[os.environ['DB_NAME']], args.workers, args.min_attempts,
+                                   args.batch_size, apply=not args.dry_run)
+        finally:
+            client.close()
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,145 @@
+"""
+Batch grading of answer sheets with NEET marking (+4 correct, -1 wrong, 0 skipped).
+
+A batch is graded as arrays rather than sheet by sheet: responses form a
+sheets x questions matrix (-1 where a question was skipped), compared once
+against the answer key; per-chapter totals are a matrix product with a
+question x chapter one-hot matrix. Only building the matrix from the request
+and formatting the results touch Python objects per answer.
+"""
+
+from dataclasses import dataclass
+from itertools import chain, repeat
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+CORRECT_MARKS = 4
+WRONG_MARKS = -1
+SKIPPED = -1
+MAX_OPTIONS = 10  # choices are option indexes 0..MAX_OPTIONS-1
+# Same boundary as the weak-area report: below 40% a chapter is weak
+WEAK_CHAPTER_ACCURACY = 40.0
+
+_SKIPPED_CHOICE = {None: np.nan}  # .get(choice, choice) maps None to NaN and keeps every choice
+
+
+@dataclass
+class AnswerKey:
+    ids: List[str]
+    index: Dict[str, int]
+    correct: np.ndarray  # [questions] correct option
+    chapters: List[str]
+    chapter_of: np.ndarray  # [questions] index into chapters
+    subjects: Dict[str, str]  # chapter -> subject
+
+    @classmethod
+    def build(cls, questions: List[dict]) -> "AnswerKey":
+        ids = [q["id"] for q in questions]
+        chapters = list(dict.fromkeys(q["chapter"] for q in questions))
+        chapter_index = {chapter: i for i, chapter in enumerate(chapters)}
+        return cls(
+            ids=ids,
+            index={question_id: i for i, question_id in enumerate(ids)},
+            correct=np.array([q["correctAnswer"] for q in questions], dtype=np.int8),
+            chapters=chapters,
+            chapter_of=np.array([chapter_index[q["chapter"]] for q in questions], dtype=np.int32),
+            subjects={q["chapter"]: q.get("subject") for q in questions},
+        )
+
+    def one_hot(self) -> np.ndarray:
+        matrix = np.zeros((len(self.ids), len(self.chapters)), dtype=np.float32)
+        matrix[np.arange(len(self.ids)), self.chapter_of] = 1
+        return matrix
+
+
+def response_matrix(key: AnswerKey, sheets: List[Dict[str, Optional[int]]],
+                    full_paper: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Responses [sheets x questions], which questions each sheet was given, and unknown ids per sheet.
+
+    With `full_paper` every sheet is graded on every question of the key, so a
+    missing answer counts as skipped; otherwise a sheet covers only the
+    questions it lists.
+    """
+    responses = np.full((len(sheets), len(key.ids)), SKIPPED, dtype=np.int16)
+    presented = np.full((len(sheets), len(key.ids)), full_paper, dtype=bool)
+    counts = np.fromiter(map(len, sheets), dtype=np.int64, count=len(sheets))
+    total = int(counts.sum())
+
+    # Flatten every answer with C-level iterators; question ids not in the key map to -1
+    rows = np.repeat(np.arange(len(sheets)), counts)
+    cols = np.fromiter(chain.from_iterable(map(key.index.get, sheet, repeat(-1)) for sheet in sheets),
+                       dtype=np.int64, count=total)
+    # Floats so a skipped question (NaN) can't be confused with any choice the client sent
+    choices = np.fromiter(chain.from_iterable(map(_SKIPPED_CHOICE.get, sheet.values(), sheet.values()) for sheet in sheets),
+                          dtype=np.float64, count=total)
+    skipped = np.isnan(choices)
+    if ((choices[~skipped] < 0) | (choices[~skipped] >= MAX_OPTIONS)).any():
+        raise ValueError(f"choices must be option indexes 0..{MAX_OPTIONS - 1} or None")
+    values = np.where(skipped, SKIPPED, choices).astype(np.int16)
+
+    known = cols >= 0
+    responses[rows[known], cols[known]] = values[known]
+    presented[rows[known], cols[known]] = True
+    unknown = np.bincount(rows[~known], minlength=len(sheets))
+    return responses, presented, unknown
+
+
+def grade(key: AnswerKey, responses: np.ndarray, presented: np.ndarray) -> dict:
+    """Per-sheet totals and per-chapter counts, all as arrays"""
+    attempted = presented & (responses != SKIPPED)
+    correct = attempted & (responses == key.correct)
+    wrong = attempted & ~correct
+    one_hot = key.one_hot()
+    return {
+        "total": presented.sum(axis=1),
+        "correct": correct.sum(axis=1),
+        "wrong": wrong.sum(axis=1),
+        "skipped": (presented & ~attempted).sum(axis=1),
+        "score": CORRECT_MARKS * correct.sum(axis=1) + WRONG_MARKS * wrong.sum(axis=1),
+        "chapterTotal": np.rint(presented.astype(np.float32) @ one_hot).astype(np.int32),
+        "chapterCorrect": np.rint(correct.astype(np.float32) @ one_hot).astype(np.int32),
+    }
+
+
+def grade_sheets(key: AnswerKey, sheets: List[Dict[str, Optional[int]]], full_paper: bool) -> List[dict]:
+    """Results for every sheet, in request order"""
+    responses, presented, unknown = response_matrix(key, sheets, full_paper)
+    graded = grade(key, responses, presented)
+
+    total = graded["total"]
+    accuracy = np.round(np.divide(graded["correct"] * 100, total, out=np.zeros(len(sheets)), where=total > 0), 1)
+    chapter_accuracy = np.divide(graded["chapterCorrect"] * 100, graded["chapterTotal"],
+                                 out=np.zeros(graded["chapterTotal"].shape), where=graded["chapterTotal"] > 0)
+    weak = (graded["chapterTotal"] > 0) & (chapter_accuracy < WEAK_CHAPTER_ACCURACY)
+
+    # Plain lists make the per-sheet formatting below far cheaper than indexing arrays
+    columns = {name: graded[name].tolist() for name in ("total", "correct", "wrong", "skipped", "score")}
+    chapter_total = graded["chapterTotal"].tolist()
+    chapter_correct = graded["chapterCorrect"].tolist()
+    chapter_accuracy = np.round(chapter_accuracy, 1).tolist()
+    weak = weak.tolist()
+    accuracy = accuracy.tolist()
+    unknown = unknown.tolist()
+    chapter_subjects = [key.subjects[chapter] for chapter in key.chapters]
+
+    results = []
+    for row in range(len(sheets)):
+        totals, corrects, accuracies, weak_row = chapter_total[row], chapter_correct[row], chapter_accuracy[row], weak[row]
+        results.append({
+            "totalQuestions": columns["total"][row],
+            "correctAnswers": columns["correct"][row],
+            "wrongAnswers": columns["wrong"][row],
+            "skipped": columns["skipped"][row],
+            "score": columns["score"][row],
+            "maxScore": columns["total"][row] * CORRECT_MARKS,
+            "accuracy": accuracy[row],
+            "chapters": [
+                {"subject": chapter_subjects[c], "chapter": chapter, "total": totals[c],
+                 "correct": corrects[c], "accuracy": accuracies[c]}
+                for c, chapter in enumerate(key.chapters) if totals[c]
+            ],
+            "weakChapters": [chapter for c, chapter in enumerate(key.chapters) if weak_row[c]],
+            "unknownQuestions": unknown[row],
+        })
+    return results
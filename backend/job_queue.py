@@ -0,0 +1,291 @@
+"""
+Mongo-backed job queue for long-running generations.
+
+Submitting a job inserts a `queued` document and returns immediately. Worker
+tasks in every API process claim jobs with an atomic find_one_and_update that
+sets a lease; a heartbeat keeps the lease alive while the handler runs, so a
+job whose worker died is picked up again once its lease expires. Failed jobs
+are retried with exponential backoff up to `maxAttempts`; a job whose worker
+died on its last attempt is marked failed when the lease expires. The lease is
+held until the outcome is written, and a failed outcome write is retried, so
+a database blip does not send a finished job round again.
+
+A job submitted with a dedup key also carries it as `activeKey` until it
+finishes. A unique sparse index on `activeKey` makes MongoDB reject a second
+queued or running job with the same key, even when every process submits at
+the same moment.
+
+Clients poll GET /api/jobs/{id}, optionally long-polling with ?wait=seconds.
+Completion in the same process wakes waiters immediately; other processes
+notice on their next poll.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', 60))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))
+JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', 7))
+LATENCY_WINDOW = 500
+OUTCOME_WRITE_ATTEMPTS = 5
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+Handler = Callable[[dict], Awaitable[dict]]
+FailureHandler = Callable[[dict], Awaitable[None]]
+
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS, lease_seconds: float = JOB_LEASE_SECONDS,
+                 poll_interval: float = JOB_POLL_INTERVAL):
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.collection = None
+        self.handlers: Dict[str, Handler] = {}
+        self.failure_handlers: Dict[str, FailureHandler] = {}
+        self._tasks = []
+        self._wake = asyncio.Event()
+        self._waiters: Dict[str, asyncio.Event] = {}
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.queue_waits = deque(maxlen=LATENCY_WINDOW)
+        self.run_times = deque(maxlen=LATENCY_WINDOW)
+
+    def register(self, job_type: str, handler: Handler, on_failure: Optional[FailureHandler] = None):
+        """`on_failure` gets the payload once a job of this type has failed its last attempt"""
+        self.handlers[job_type] = handler
+        if on_failure:
+            self.failure_handlers[job_type] = on_failure
+
+    async def start(self, collection):
+        self.collection = collection
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work(f"{os.getpid()}-{i}")) for i in range(self.workers)]
+
+    async def stop(self):
+        """Stop claiming jobs; jobs still running are re-claimed elsewhere once their lease expires"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ==================== Submit / Poll ====================
+
+    async def submit(self, job_type: str, payload: dict, user_id: Optional[str] = None,
+                     dedup_key: Optional[str] = None, max_attempts: int = JOB_MAX_ATTEMPTS) -> dict:
+        """Queue a job; with `dedup_key` an identical queued or running job is returned instead"""
+        now = datetime.utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            "type": job_type,
+            "payload": payload,
+            "userId": user_id,
+            "dedupKey": dedup_key,
+            "status": "queued",
+            "attempts": 0,
+            "maxAttempts": max_attempts,
+            "runAfter": now,
+            "leaseUntil": None,
+            "result": None,
+            "error": None,
+            "createdAt": now,
+            "startedAt": None,
+            "finishedAt": None,
+        }
+        if dedup_key:
+            job["activeKey"] = dedup_key
+        while True:
+            try:
+                await self.collection.insert_one(dict(job))
+                break
+            except DuplicateKeyError:
+                existing = await self.collection.find_one({"activeKey": dedup_key}, {"_id": 0, "workerId": 0})
+                if existing:
+                    return existing
+                # The other job finished in between; submit ours after all
+        self.submitted += 1
+        self._wake.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"id": job_id}, {"_id": 0, "workerId": 0})
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Return the job once it finishes or `timeout` seconds pass, whichever is first"""
+        deadline = time.monotonic() + timeout
+        event = self._waiters.setdefault(job_id, asyncio.Event())
+        try:
+            while True:
+                job = await self.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["status"] in TERMINAL_STATUSES or remaining <= 0:
+                    return job
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(self.poll_interval, remaining))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiters.pop(job_id, None)
+
+    # ==================== Workers ====================
+
+    async def _fail_exhausted(self, now: datetime):
+        """Fail jobs whose worker died (rather than raised) on their last attempt"""
+        result = await self.collection.update_many(
+            {"status": "running", "leaseUntil": {"$lt": now}, "$expr": {"$gte": ["$attempts", "$maxAttempts"]}},
+            {"$set": {"status": "failed", "error": "Lease expired on the last attempt", "finishedAt": now},
+             "$unset": {"activeKey": ""}},
+        )
+        self.failed += result.modified_count
+
+    async def _claim(self, worker_id: str) -> Optional[dict]:
+        now = datetime.utcnow()
+        await self._fail_exhausted(now)
+        job = await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "runAfter": {"$lte": now}},
+                {"status": "running", "leaseUntil": {"$lt": now}, "$expr": {"$lt": ["$attempts", "$maxAttempts"]}},
+            ]},
+            {"$set": {"status": "running", "workerId": worker_id, "startedAt": now,
+                      "leaseUntil": now + timedelta(seconds=self.lease_seconds)},
+             "$inc": {"attempts": 1}},
+            sort=[("runAfter", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if job:
+            job.pop("_id", None)
+        return job
+
+    async def _heartbeat(self, job_id: str, worker_id: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.collection.update_one(
+                    {"id": job_id, "workerId": worker_id, "status": "running"},
+                    {"$set": {"leaseUntil": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}},
+                )
+            except Exception as e:
+                # The next beat still lands within the lease
+                logger.warning(f"Heartbeat of job {job_id} failed: {e!r}")
+
+    async def _work(self, worker_id: str):
+        while True:
+            try:
+                job = await self._claim(worker_id)
+            except Exception as e:
+                logger.error(f"Job claim failed: {e}")
+                job = None
+            if job is None:
+                # asyncio.wait, unlike wait_for before Python 3.12, never turns stop()'s cancellation into a timeout
+                wake = asyncio.ensure_future(self._wake.wait())
+                try:
+                    await asyncio.wait([wake], timeout=self.poll_interval)
+                finally:
+                    wake.cancel()
+                self._wake.clear()
+                continue
+            try:
+                await self._run(job, worker_id)
+            except Exception as e:
+                # The lease expires and the job is claimed again; this worker moves on
+                logger.error(f"Job {job['id']} ({job['type']}) could not be recorded: {e!r}")
+
+    async def _run(self, job: dict, worker_id: str):
+        handler = self.handlers.get(job["type"])
+        started = time.perf_counter()
+        self.queue_waits.append((job["startedAt"] - job["createdAt"]).total_seconds() * 1000)
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"], worker_id))
+        try:
+            try:
+                if handler is None:
+                    raise ValueError(f"No handler registered for job type {job['type']}")
+                result = await handler(job["payload"])
+                update = {"status": "succeeded", "result": result, "error": None, "finishedAt": datetime.utcnow()}
+                self.succeeded += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job['id']} ({job['type']}) attempt {job['attempts']} failed: {e!r}")
+                if job["attempts"] < job["maxAttempts"]:
+                    update = {"status": "queued", "error": str(e),
+                              "runAfter": datetime.utcnow() + timedelta(seconds=2 ** job["attempts"])}
+                    self.retried += 1
+                else:
+                    update = {"status": "failed", "error": str(e), "finishedAt": datetime.utcnow()}
+                    self.failed += 1
+                    await self._failed(job)
+            self.run_times.append((time.perf_counter() - started) * 1000)
+
+            changes = {"$set": update}
+            if update["status"] in TERMINAL_STATUSES:
+                changes["$unset"] = {"activeKey": ""}
+            await self._record(job["id"], worker_id, changes)
+        finally:
+            heartbeat.cancel()
+        waiter = self._waiters.get(job["id"])
+        if waiter:
+            waiter.set()
+
+    async def _failed(self, job: dict):
+        on_failure = self.failure_handlers.get(job["type"])
+        if on_failure:
+            try:
+                await on_failure(job["payload"])
+            except Exception as e:
+                logger.error(f"Failure handler of job {job['id']} ({job['type']}) failed: {e!r}")
+
+    async def _record(self, job_id: str, worker_id: str, changes: dict):
+        """Write a job's outcome; only the worker holding the lease may, so transient errors are retried"""
+        for attempt in range(OUTCOME_WRITE_ATTEMPTS):
+            try:
+                await self.collection.update_one({"id": job_id, "workerId": worker_id}, changes)
+                return
+            except Exception as e:
+                if attempt == OUTCOME_WRITE_ATTEMPTS - 1:
+                    raise
+                logger.warning(f"Recording the outcome of job {job_id} failed, retrying: {e!r}")
+                await asyncio.sleep(min(0.5 * 2 ** attempt, self.lease_seconds / 3))
+
+    # ==================== Metrics ====================
+
+    async def stats(self) -> dict:
+        depth = await self.collection.count_documents({"status": "queued"}) if self.collection is not None else 0
+        running = await self.collection.count_documents({"status": "running"}) if self.collection is not None else 0
+        return {
+            "workers": len(self._tasks),
+            "depth": depth,
+            "running": running,
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "avgQueueWaitMs": _avg(self.queue_waits),
+            "p95QueueWaitMs": _p95(self.queue_waits),
+            "avgRunMs": _avg(self.run_times),
+            "p95RunMs": _p95(self.run_times),
+        }
+
+
+def _avg(values) -> float:
+    return round(sum(values) / len(values), 1) if values else 0.0
+
+
+def _p95(values) -> float:
+    ordered = sorted(values)
+    return round(ordered[int(0.95 * (len(ordered) - 1))], 1) if ordered else 0.0
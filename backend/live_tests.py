@@ -0,0 +1,177 @@
+"""
+Server-side state of in-progress mock tests.
+
+A test attempt is one compact document in test_attempts: the answers are a
+string with one character per paper question ("-" unanswered, "0".."3" the
+chosen option), plus the questions marked for review and the current
+position. The client streams answer events over a WebSocket; each event only
+changes the in-memory state of the attempt, and an AttemptWriter saves the
+whole state at most once per debounce window. A 180-question paper therefore
+costs a handful of writes per minute of activity instead of one per answer:
+
+    writes per attempt <= min(events, active seconds / debounce) + reconnects + 2
+
+(the 2 being creation and submission). Disconnecting flushes immediately, and
+every write carries the state version so an older write never overwrites a
+newer one. Reconnecting to the same worker reuses the live writer; reconnecting
+elsewhere resumes from the last saved version.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from grading import MAX_OPTIONS
+
+logger = logging.getLogger(__name__)
+
+LIVE_SAVE_DEBOUNCE_SECONDS = float(os.environ.get('LIVE_SAVE_DEBOUNCE_SECONDS', 5))
+LIVE_TICK_SECONDS = float(os.environ.get('LIVE_TICK_SECONDS', 30))
+NO_ANSWER = "-"
+
+
+def new_attempt_answers(question_count: int) -> str:
+    return NO_ANSWER * question_count
+
+
+def answers_by_question(answers: str, question_ids: List[str]) -> Dict[str, Optional[int]]:
+    """Expand the compact answer string into a grading sheet"""
+    return {
+        question_id: None if choice == NO_ANSWER else int(choice)
+        for question_id, choice in zip(question_ids, answers)
+    }
+
+
+class AttemptWriter:
+    """Live state of one attempt and the debounced saving of it"""
+
+    def __init__(self, collection, attempt: dict, debounce: float = LIVE_SAVE_DEBOUNCE_SECONDS, stats: dict = None):
+        self.collection = collection
+        self.id = attempt["id"]
+        self.deadline: datetime = attempt["deadline"]
+        self.answers = list(attempt["answers"])
+        self.marked = set(attempt.get("marked", []))
+        self.current = attempt.get("current", 0)
+        self.version = attempt.get("version", 0)
+        self.saved_version = self.version
+        self.writes = attempt.get("writes", 0)
+        self.debounce = debounce
+        self.stats = stats if stats is not None else {}
+        self._dirty = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def snapshot(self) -> dict:
+        return {
+            "attemptId": self.id,
+            "answers": "".join(self.answers),
+            "marked": sorted(self.marked),
+            "current": self.current,
+            "version": self.version,
+            "savedVersion": self.saved_version,
+            "remainingSeconds": self.remaining_seconds(),
+        }
+
+    def remaining_seconds(self) -> float:
+        return max(0.0, round((self.deadline - datetime.utcnow()).total_seconds(), 1))
+
+    def apply(self, event: dict) -> Optional[str]:
+        """Apply an answer, mark or navigate event; returns an error message for a bad event"""
+        index = event.get("index")
+        if not isinstance(index, int) or not 0 <= index < len(self.answers):
+            return "index out of range"
+        kind = event.get("type")
+        if kind == "answer":
+            choice = event.get("choice")
+            if choice is not None and (not isinstance(choice, int) or not 0 <= choice < MAX_OPTIONS):
+                return "choice must be an option index or null"
+            self.answers[index] = NO_ANSWER if choice is None else str(choice)
+        elif kind == "mark":
+            (self.marked.add if event.get("marked", True) else self.marked.discard)(index)
+        elif kind == "navigate":
+            self.current = index
+        else:
+            return f"unknown event type {kind!r}"
+        self.version += 1
+        self.stats["events"] = self.stats.get("events", 0) + 1
+        self._dirty.set()
+        return None
+
+    async def _run(self):
+        while True:
+            await self._dirty.wait()
+            # Everything that arrives during the window goes into the same write
+            await asyncio.sleep(self.debounce)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Saving attempt {self.id} failed, retrying next window: {e}")
+
+    async def flush(self):
+        if self.version == self.saved_version:
+            self._dirty.clear()
+            return
+        # Cleared before the write so events arriving during it schedule another one
+        self._dirty.clear()
+        version = self.version
+        try:
+            result = await self.collection.update_one(
+                {"id": self.id, "status": "in_progress", "version": {"$lt": version}},
+                {"$set": {"answers": "".join(self.answers), "marked": sorted(self.marked), "current": self.current,
+                          "version": version, "updatedAt": datetime.utcnow()},
+                 "$inc": {"writes": 1}},
+            )
+        except Exception:
+            self._dirty.set()  # retry in the next window
+            raise
+        self.saved_version = version
+        if result.modified_count:
+            self.writes += 1
+            self.stats["writes"] = self.stats.get("writes", 0) + 1
+
+    async def close(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        await self.flush()
+
+
+class LiveAttempts:
+    """Writers of the attempts connected to this process, shared by reconnecting sockets"""
+
+    def __init__(self, debounce: float = LIVE_SAVE_DEBOUNCE_SECONDS):
+        self.debounce = debounce
+        self.writers: Dict[str, AttemptWriter] = {}
+        self.connections: Dict[str, int] = {}
+        self.stats = {"connections": 0, "events": 0, "writes": 0, "submitted": 0, "maxWritesPerAttempt": 0}
+
+    def open(self, collection, attempt: dict) -> AttemptWriter:
+        writer = self.writers.get(attempt["id"])
+        if writer is None:
+            writer = self.writers[attempt["id"]] = AttemptWriter(collection, attempt, self.debounce, self.stats)
+        self.connections[writer.id] = self.connections.get(writer.id, 0) + 1
+        self.stats["connections"] += 1
+        return writer
+
+    async def release(self, writer: AttemptWriter):
+        """Drop a connection; the last one out saves pending changes"""
+        self.connections[writer.id] -= 1
+        if self.connections[writer.id] > 0:
+            return
+        del self.connections[writer.id]
+        self.writers.pop(writer.id, None)
+        await writer.close()
+        self.stats["maxWritesPerAttempt"] = max(self.stats["maxWritesPerAttempt"], writer.writes)
+
+    async def close_all(self):
+        for writer in list(self.writers.values()):
+            await writer.close()
+        self.writers.clear()
+        self.connections.clear()
+
+    def report(self) -> dict:
+        return {
+            **self.stats,
+            "live": len(self.writers),
+            "eventsPerWrite": round(self.stats["events"] / self.stats["writes"], 1) if self.stats["writes"] else 0,
+        }
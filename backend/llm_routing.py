@@ -0,0 +1,144 @@
+"""
+Model routing table for LLM calls.
+
+Every call site names a route (motivation, buddy, study_plan, ...). A route
+maps to an ordered fallback chain of "provider/model" entries plus a
+per-attempt timeout: short, latency-sensitive tasks go to a faster model and
+fall back to the flagship one when it errors or times out.
+
+Defaults can be overridden per route with the LLM_ROUTES environment variable
+(JSON), e.g.
+
+    LLM_ROUTES='{"buddy": {"models": ["anthropic/claude-sonnet-4-5-20250929"], "timeout": 20}}'
+
+Prices (USD per million input/output tokens) used for the cost estimates in
+/api/metrics can be overridden the same way with LLM_PRICES.
+"""
+
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+FAST_CHAIN = ["openai/gpt-5-mini", "openai/gpt-5.2"]
+FLAGSHIP_CHAIN = ["openai/gpt-5.2", "anthropic/claude-sonnet-4-5-20250929"]
+
+DEFAULT_ROUTES = {
+    "default": {"models": ["openai/gpt-5.2"], "timeout": 90},
+    "motivation": {"models": FAST_CHAIN, "timeout": 10},
+    "daily_question": {"models": FAST_CHAIN, "timeout": 20},
+    "buddy": {"models": FAST_CHAIN, "timeout": 20},
+    "summary": {"models": ["openai/gpt-5-nano", "openai/gpt-5-mini"], "timeout": 20},
+    "mcq_batch": {"models": FLAGSHIP_CHAIN, "timeout": 90},
+    "pregenerated": {"models": FLAGSHIP_CHAIN, "timeout": 90},
+    "study_plan": {"models": FLAGSHIP_CHAIN, "timeout": 120},
+}
+
+DEFAULT_PRICES = {
+    "openai/gpt-5.2": (1.75, 14.0),
+    "openai/gpt-5-mini": (0.25, 2.0),
+    "openai/gpt-5-nano": (0.05, 0.4),
+    "anthropic/claude-sonnet-4-5-20250929": (3.0, 15.0),
+}
+
+LATENCY_WINDOW = 500  # recent calls kept per route/model for percentiles
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for budgeting and cost estimates"""
+    return len(text) // 4 + 1
+
+
+@dataclass
+class Route:
+    name: str
+    models: List[Tuple[str, str]]  # (provider, model) in fallback order
+    timeout: float
+
+
+def parse_model(spec: str) -> Tuple[str, str]:
+    provider, _, model = spec.partition("/")
+    if not model:
+        raise ValueError(f"Model must be given as provider/model: {spec}")
+    return provider, model
+
+
+def load_routes(overrides: str = None) -> Dict[str, Route]:
+    config = {name: dict(route) for name, route in DEFAULT_ROUTES.items()}
+    for name, route in json.loads(overrides or "{}").items():
+        config[name] = {**config.get(name, config["default"]), **route}
+    return {
+        name: Route(name=name, models=[parse_model(m) for m in route["models"]], timeout=float(route["timeout"]))
+        for name, route in config.items()
+    }
+
+
+class ModelStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def to_dict(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "promptTokens": self.prompt_tokens,
+            "completionTokens": self.completion_tokens,
+            "estimatedCostUsd": round(self.cost_usd, 4),
+            "avgMs": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+            "p95Ms": round(latencies[int(0.95 * (len(latencies) - 1))], 1) if latencies else 0.0,
+        }
+
+
+class LlmRouter:
+    def __init__(self, routes: Dict[str, Route], prices: Dict[str, tuple]):
+        self.routes = routes
+        self.prices = prices
+        self.stats: Dict[Tuple[str, str], ModelStats] = {}
+        self.fallbacks: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> "LlmRouter":
+        prices = {**DEFAULT_PRICES, **{k: tuple(v) for k, v in json.loads(os.environ.get('LLM_PRICES') or "{}").items()}}
+        return cls(load_routes(os.environ.get('LLM_ROUTES')), prices)
+
+    def route(self, name: str) -> Route:
+        return self.routes.get(name) or self.routes["default"]
+
+    def record(self, route: str, provider: str, model: str, started: float, prompt: str,
+               response: str = None, error: bool = False) -> float:
+        """Update the route/model counters; returns the estimated cost of the call"""
+        key = f"{provider}/{model}"
+        stats = self.stats.setdefault((route, key), ModelStats())
+        stats.calls += 1
+        stats.latencies.append((time.perf_counter() - started) * 1000)
+        if error:
+            stats.errors += 1
+            return 0.0
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(response or "")
+        stats.prompt_tokens += prompt_tokens
+        stats.completion_tokens += completion_tokens
+        input_price, output_price = self.prices.get(key, (0.0, 0.0))
+        cost = (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+        stats.cost_usd += cost
+        return cost
+
+    def record_fallback(self, route: str):
+        self.fallbacks[route] = self.fallbacks.get(route, 0) + 1
+
+    def report(self) -> dict:
+        routes = {}
+        for (route, model), stats in sorted(self.stats.items()):
+            entry = routes.setdefault(route, {"fallbacks": self.fallbacks.get(route, 0), "models": {}})
+            entry["models"][model] = stats.to_dict()
+        return {
+            "table": {name: [f"{p}/{m}" for p, m in r.models] for name, r in self.routes.items()},
+            "routes": routes,
+        }
@@ -0,0 +1,103 @@
+"""
+Question allocation for full mock papers built from a blueprint.
+
+A blueprint gives the number of questions per subject, optional chapter
+weights and a difficulty mix. Each section is first split across difficulties,
+then every difficulty across chapters, using the largest-remainder method so
+the parts are whole numbers that add up exactly. Parts are capped by the
+questions the bank actually has (from the question catalog) and the surplus
+is handed to the other parts, so a paper is only short when the bank is.
+
+The result is a list of (subject, chapter, difficulty, count) cells that the
+API draws in one aggregation.
+"""
+
+import hashlib
+import json
+from typing import Dict, Hashable, List, Optional, Tuple
+
+DEFAULT_DIFFICULTY_MIX = {"easy": 0.3, "medium": 0.5, "hard": 0.2}
+
+# NEET-UG: 45 Physics, 45 Chemistry, 90 Biology
+NEET_SECTIONS = [
+    {"subject": "Physics", "questions": 45},
+    {"subject": "Chemistry", "questions": 45},
+    {"subject": "Biology", "questions": 90},
+]
+
+Availability = Dict[Tuple[str, str, str], int]  # (subject, chapter, difficulty) -> stored questions
+
+
+def largest_remainder(total: int, weights: Dict[Hashable, float],
+                      capacity: Optional[Dict[Hashable, int]] = None) -> Dict[Hashable, int]:
+    """Split `total` in proportion to `weights` into whole parts, none above its capacity.
+
+    Ties go to the key listed first. The parts sum to `total` unless the
+    capacities add up to less.
+    """
+    allocation = {key: 0 for key in weights}
+    open_keys = [key for key, weight in weights.items() if weight > 0 and (capacity is None or capacity.get(key, 0) > 0)]
+    remaining = total
+    while remaining > 0 and open_keys:
+        weight_sum = sum(weights[key] for key in open_keys)
+        quotas = {key: remaining * weights[key] / weight_sum for key in open_keys}
+        shares = {key: int(quotas[key]) for key in open_keys}
+        leftover = remaining - sum(shares.values())
+        for key in sorted(open_keys, key=lambda k: quotas[k] - shares[k], reverse=True)[:leftover]:
+            shares[key] += 1
+        for key in open_keys:
+            room = capacity[key] - allocation[key] if capacity is not None else shares[key]
+            allocation[key] += min(shares[key], room)
+        remaining = total - sum(allocation.values())
+        if capacity is None:
+            break
+        open_keys = [key for key in open_keys if allocation[key] < capacity[key]]
+    return allocation
+
+
+def allocate_section(subject: str, questions: int, chapter_weights: Dict[str, float],
+                     difficulty_mix: Dict[str, float], available: Availability) -> List[dict]:
+    """Cells of one subject; difficulty is split first so the mix holds for the whole section"""
+    by_difficulty = largest_remainder(questions, difficulty_mix, {
+        level: sum(available.get((subject, chapter, level), 0) for chapter in chapter_weights)
+        for level in difficulty_mix
+    })
+    cells = []
+    for level, count in by_difficulty.items():
+        by_chapter = largest_remainder(count, chapter_weights, {
+            chapter: available.get((subject, chapter, level), 0) for chapter in chapter_weights
+        })
+        cells.extend(
+            {"subject": subject, "chapter": chapter, "difficulty": level, "count": n}
+            for chapter, n in by_chapter.items() if n
+        )
+    return cells
+
+
+def allocate_paper(sections: List[dict], difficulty_mix: Dict[str, float], available: Availability) -> Tuple[List[dict], List[dict]]:
+    """Cells for every section, and a per-section summary of requested vs allocated questions.
+
+    A section without chapter weights uses every chapter the bank has for its
+    subject, weighted by how many questions each one holds.
+    """
+    cells, summary = [], []
+    for section in sections:
+        subject = section["subject"]
+        chapters = section.get("chapters") or []
+        if chapters:
+            weights = {chapter["chapter"]: chapter["weight"] for chapter in chapters}
+        else:
+            weights = {}
+            for (s, chapter, _), n in available.items():
+                if s == subject:
+                    weights[chapter] = weights.get(chapter, 0) + n
+        section_cells = allocate_section(subject, section["questions"], weights, difficulty_mix, available)
+        allocated = sum(cell["count"] for cell in section_cells)
+        cells.extend(section_cells)
+        summary.append({"subject": subject, "requested": section["questions"], "allocated": allocated})
+    return cells, summary
+
+
+def blueprint_key(blueprint: dict) -> str:
+    """Stable key of a blueprint, version included, for caching assembled papers"""
+    return hashlib.sha1(json.dumps(blueprint, sort_keys=True).encode()).hexdigest()[:16]
@@ -0,0 +1,200 @@
+"""
+Question counts per subject, chapter, topic and difficulty.
+
+The question_catalog collection holds one document per
+(subject, chapter, topic, difficulty) with the number of stored questions, so
+"how many Easy questions does Gravitation have?" is a lookup instead of a
+count_documents scan. Every write path of the questions collection (bulk
+import, sample population, dedup deletes) adjusts the counts with $inc
+upserts; `rebuild_catalog` recomputes them from scratch with one aggregation
+for drift or for a collection written before the catalog existed.
+
+Difficulty is stored normalized to easy/medium/hard, whatever label the source
+used.
+
+CLI (reads MONGO_URL and DB_NAME from the environment or backend/.env):
+
+    python question_catalog.py           # rebuild the catalog from the questions collection
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+CATALOG_CACHE_TTL = float(os.environ.get('CATALOG_CACHE_TTL', 60))
+
+# Stored difficulty labels vary by source ("Easy", "Moderate", "medium"); map each level to its spellings
+DIFFICULTY_LEVELS = {
+    "easy": ["easy", "Easy"],
+    "medium": ["medium", "Medium", "moderate", "Moderate"],
+    "hard": ["hard", "Hard", "difficult", "Difficult"],
+}
+
+CatalogKey = Tuple[str, str, str, str]
+
+
+def difficulty_level(label: str) -> Optional[str]:
+    """easy/medium/hard for a known difficulty label, None otherwise"""
+    value = label.strip().lower()
+    for level, labels in DIFFICULTY_LEVELS.items():
+        if value in (known.lower() for known in labels):
+            return level
+    return None
+
+
+def normalize_difficulty(difficulty: Optional[str]) -> str:
+    """Map a stored difficulty label to easy/medium/hard; unknown labels count as medium"""
+    return difficulty_level(difficulty or "medium") or "medium"
+
+
+def catalog_key(question: dict) -> CatalogKey:
+    return (question["subject"], question["chapter"], question.get("topic") or "General",
+            normalize_difficulty(question.get("difficulty")))
+
+
+# ==================== Maintenance ====================
+
+async def adjust_catalog(catalog, questions: Iterable[dict], sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) questions from the counts"""
+    counts = Counter(catalog_key(question) for question in questions)
+    if not counts:
+        return
+    await catalog.bulk_write([
+        UpdateOne(
+            {"subject": subject, "chapter": chapter, "topic": topic, "difficulty": difficulty},
+            {"$inc": {"count": sign * n}},
+            upsert=True,
+        )
+        for (subject, chapter, topic, difficulty), n in counts.items()
+    ], ordered=False)
+    if sign < 0:
+        await catalog.delete_many({"count": {"$lte": 0}})
+
+
+async def rebuild_catalog(questions, catalog) -> dict:
+    """Recompute every count from the questions collection"""
+    groups = await questions.aggregate([
+        {"$group": {
+            "_id": {"subject": "$subject", "chapter": "$chapter", "topic": "$topic", "difficulty": "$difficulty"},
+            "count": {"$sum": 1},
+        }},
+    ]).to_list(None)
+    # Several raw difficulty labels collapse onto one normalized entry
+    counts = Counter()
+    for group in groups:
+        counts[catalog_key(group["_id"])] += group["count"]
+
+    await catalog.delete_many({})
+    if counts:
+        await catalog.insert_many([
+            {"subject": subject, "chapter": chapter, "topic": topic, "difficulty": difficulty, "count": n}
+            for (subject, chapter, topic, difficulty), n in counts.items()
+        ])
+    return {"entries": len(counts), "questions": sum(counts.values())}
+
+
+async def ensure_catalog_indexes(catalog):
+    await catalog.create_index([("subject", 1), ("chapter", 1), ("topic", 1), ("difficulty", 1)], unique=True)
+
+
+# ==================== Reads ====================
+
+def summarize(entries: List[dict], subject: Optional[str] = None, chapter: Optional[str] = None) -> dict:
+    """Nest catalog entries as subject -> chapter -> counts by difficulty and topic"""
+    subjects: Dict[str, dict] = {}
+    for entry in entries:
+        if (subject and entry["subject"] != subject) or (chapter and entry["chapter"] != chapter):
+            continue
+        node = subjects.setdefault(entry["subject"], {"total": 0, "chapters": {}})
+        node["total"] += entry["count"]
+        chapter_node = node["chapters"].setdefault(
+            entry["chapter"], {"total": 0, "difficulty": {level: 0 for level in DIFFICULTY_LEVELS}, "topics": {}}
+        )
+        chapter_node["total"] += entry["count"]
+        chapter_node["difficulty"][entry["difficulty"]] += entry["count"]
+        chapter_node["topics"][entry["topic"]] = chapter_node["topics"].get(entry["topic"], 0) + entry["count"]
+    return {"total": sum(node["total"] for node in subjects.values()), "subjects": subjects}
+
+
+class CatalogCache:
+    """The whole catalog in memory, reloaded after `ttl` seconds or an invalidation"""
+
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL):
+        self.ttl = ttl
+        self.entries: Optional[List[dict]] = None
+        self.chapters: Dict[Tuple[str, str], List[dict]] = {}
+        self.loaded_at = 0.0
+        self.version = 0
+        self.loads = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self.entries = None
+        self.version += 1
+
+    async def get(self, catalog) -> List[dict]:
+        if self.entries is not None and time.monotonic() - self.loaded_at < self.ttl:
+            return self.entries
+        async with self._lock:
+            # Another request may have reloaded while this one waited
+            if self.entries is None or time.monotonic() - self.loaded_at >= self.ttl:
+                version = self.version
+                entries = await catalog.find({"count": {"$gt": 0}}, {"_id": 0}).to_list(None)
+                self.loads += 1
+                if version == self.version:
+                    self.entries, self.loaded_at = entries, time.monotonic()
+                    self.chapters = by_chapter(entries)
+                else:
+                    return entries
+        return self.entries
+
+    async def count(self, catalog, subject: str, chapter: str, topic: Optional[str] = None,
+                    difficulty: Optional[str] = None) -> int:
+        entries = await self.get(catalog)
+        chapters = self.chapters if entries is self.entries else by_chapter(entries)
+        return sum(
+            entry["count"] for entry in chapters.get((subject, chapter), [])
+            if (topic is None or entry["topic"] == topic)
+            and (difficulty is None or entry["difficulty"] == difficulty)
+        )
+
+
+def by_chapter(entries: List[dict]) -> Dict[Tuple[str, str], List[dict]]:
+    chapters: Dict[Tuple[str, str], List[dict]] = {}
+    for entry in entries:
+        chapters.setdefault((entry["subject"], entry["chapter"]), []).append(entry)
+    return chapters
+
+
+# ==================== CLI ====================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild question counts from the questions collection")
+    parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            db = client[os.environ['DB_NAME']]
+            await ensure_catalog_indexes(db.question_catalog)
+            return await rebuild_catalog(db.questions, db.question_catalog)
+        finally:
+            client.close()
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""
+Exact and near-duplicate detection for the question bank.
+
+Exact duplicates: every stored question carries a `contentHash` of its
+normalized text and options, backed by a unique index so repeats are
+rejected at insert time. Questions stored before the hash existed are
+annotated by backfill_hashes before an import relies on the index.
+
+Near duplicates: a MinHash signature over character shingles is split into
+LSH bands; the band keys are stored as `lshBands` (multikey index) so a new
+question finds its candidates with one indexed query. The batch job rebuilds
+the same index in memory to cluster the whole collection.
+
+CLI (reads MONGO_URL and DB_NAME from the environment or backend/.env):
+
+    python question_dedup.py                 # report clusters only
+    python question_dedup.py --apply         # delete duplicates, keep the oldest
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from question_catalog import adjust_catalog
+
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', 0.8))
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16  # 16 bands x 4 rows: candidates start around 0.5 similarity
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64(0xFFFFFFFF)
+DEDUP_BATCH_SIZE = 5000
+DUPLICATE_KEY_ERROR = 11000
+
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 2 ** 31, size=NUM_PERMUTATIONS).astype(np.uint64)
+_PERM_B = _rng.randint(0, 2 ** 31, size=NUM_PERMUTATIONS).astype(np.uint64)
+
+VARIATION_SUFFIX = re.compile(r"\(\s*variation\s+\d+\s*\)")
+NON_WORD = re.compile(r"[^\w\s]+")
+
+
+# ==================== Normalization ====================
+
+def normalize_text(text: str) -> str:
+    """Case-fold, drop punctuation and "(Variation N)" suffixes, collapse whitespace"""
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    text = VARIATION_SUFFIX.sub(" ", text)
+    text = NON_WORD.sub(" ", text)
+    return " ".join(text.split())
+
+
+def content_hash(question: dict) -> str:
+    """Order-insensitive hash of subject, question text and options"""
+    options = sorted(normalize_text(o) for o in question.get("options", []))
+    payload = "\x1e".join([normalize_text(question.get("subject") or ""), normalize_text(question["question"])] + options)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def shingle_text(question: dict) -> str:
+    return " ".join([normalize_text(question["question"])] + sorted(normalize_text(o) for o in question.get("options", [])))
+
+
+def shingles(text: str) -> np.ndarray:
+    """32-bit hashes of the distinct character shingles of `text`"""
+    if len(text) <= SHINGLE_SIZE:
+        grams = {text}
+    else:
+        grams = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+# ==================== MinHash / LSH ====================
+
+def minhash(question: dict) -> np.ndarray:
+    hashes = shingles(shingle_text(question))
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % MERSENNE_PRIME & MAX_HASH
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def lsh_bands(signature: np.ndarray) -> List[str]:
+    """One key per band; questions sharing any key are near-duplicate candidates"""
+    return [
+        f"{band}:{hashlib.blake2b(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes(), digest_size=8).hexdigest()}"
+        for band in range(LSH_BANDS)
+    ]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity from two MinHash signatures"""
+    return float(np.count_nonzero(a == b)) / NUM_PERMUTATIONS
+
+
+def annotate(question: dict) -> dict:
+    """Add contentHash and lshBands to a question document before it is stored"""
+    question["contentHash"] = content_hash(question)
+    question["lshBands"] = lsh_bands(minhash(question))
+    return question
+
+
+class LshIndex:
+    """In-memory band index over MinHash signatures"""
+
+    def __init__(self):
+        self.buckets: Dict[str, List[str]] = defaultdict(list)
+        self.signatures: Dict[str, np.ndarray] = {}
+
+    def add(self, key: str, signature: np.ndarray, bands: Optional[List[str]] = None):
+        self.signatures[key] = signature
+        for band in bands or lsh_bands(signature):
+            self.buckets[band].append(key)
+
+    def remove(self, key: str, bands: List[str]):
+        self.signatures.pop(key, None)
+        for band in bands:
+            bucket = self.buckets.get(band)
+            if bucket and key in bucket:
+                bucket.remove(key)
+                if not bucket:
+                    del self.buckets[band]
+
+    def query(self, signature: np.ndarray, threshold: float = NEAR_DUPLICATE_THRESHOLD,
+              bands: Optional[List[str]] = None) -> List[tuple]:
+        """Return (key, similarity) pairs at or above `threshold`, most similar first"""
+        candidates = {key for band in bands or lsh_bands(signature) for key in self.buckets.get(band, ())}
+        matches = [(key, similarity(signature, self.signatures[key])) for key in candidates]
+        return sorted((m for m in matches if m[1] >= threshold), key=lambda m: -m[1])
+
+
+async def ensure_dedup_indexes(collection):
+    # Sparse so questions stored before contentHash existed don't collide on null
+    await collection.create_index("contentHash", unique=True, sparse=True)
+    await collection.create_index("lshBands")
+
+
+async def write_hashes(collection, updates: List[UpdateOne], batch_size: int = DEDUP_BATCH_SIZE) -> int:
+    """Unordered writes of contentHash updates; ones the unique index rejects are skipped. Returns the number written"""
+    written = 0
+    for start in range(0, len(updates), batch_size):
+        try:
+            result = await collection.bulk_write(updates[start:start + batch_size], ordered=False)
+            written += result.modified_count
+        except BulkWriteError as e:
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in e.details.get("writeErrors", [])):
+                raise
+            written += e.details.get("nModified", 0)
+    return written
+
+
+async def backfill_hashes(collection, batch_size: int = DEDUP_BATCH_SIZE) -> int:
+    """
+    Annotate questions stored before contentHash existed, so the unique index
+    covers them too. Of several copies only the first written gets the hash;
+    the others are left for the dedup job. Returns the number annotated.
+    """
+    cursor = collection.find(
+        {"contentHash": {"$exists": False}},
+        {"_id": 0, "id": 1, "question": 1, "options": 1, "subject": 1},
+    ).sort("createdAt", 1).batch_size(batch_size)
+    updates = []
+    async for question in cursor:
+        annotate(question)
+        updates.append(UpdateOne({"id": question["id"], "contentHash": {"$exists": False}},
+                                 {"$set": {"contentHash": question["contentHash"], "lshBands": question["lshBands"]}}))
+    return await write_hashes(collection, updates, batch_size)
+
+
+async def find_near_duplicates(collection, question: dict, threshold: float = NEAR_DUPLICATE_THRESHOLD,
+                               limit: int = 10) -> List[dict]:
+    """Stored questions of the same subject that are near duplicates of `question`"""
+    signature = minhash(question)
+    query = {"lshBands": {"$in": lsh_bands(signature)}}
+    if question.get("subject"):
+        query["subject"] = question["subject"]
+    candidates = await collection.find(query, {"_id": 0, "id": 1, "question": 1, "options": 1}).to_list(500)
+
+    matches = []
+    for candidate in candidates:
+        score = similarity(signature, minhash(candidate))
+        if score >= threshold:
+            matches.append({"id": candidate["id"], "question": candidate["question"], "similarity": round(score, 3)})
+    matches.sort(key=lambda m: -m["similarity"])
+    return matches[:limit]
+
+
+# ==================== Batch Dedup Job ====================
+
+class _UnionFind:
+    """Union-find whose roots are always the earliest-added member"""
+
+    def __init__(self):
+        self.parent: Dict[str, str] = {}
+        self.order: Dict[str, int] = {}
+
+    def find(self, key: str) -> str:
+        if key not in self.parent:
+            self.parent[key] = key
+            self.order[key] = len(self.order)
+        parent = self.parent[key]
+        if parent != key:
+            parent = self.parent[key] = self.find(parent)
+        return parent
+
+    def union(self, a: str, b: str):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            first, second = sorted((root_a, root_b), key=self.order.__getitem__)
+            self.parent[second] = first
+
+
+async def dedup_collection(collection, threshold: float = NEAR_DUPLICATE_THRESHOLD, apply: bool = False,
+                           batch_size: int = DEDUP_BATCH_SIZE, catalog=None) -> dict:
+    """
+    Cluster the whole collection by near-duplicate similarity.
+
+    The oldest question of each cluster is kept. With apply=True the others are
+    deleted; otherwise they are only marked with `duplicateOf`. Keepers missing
+    contentHash/lshBands are backfilled either way, except that a dry run leaves
+    the hash off a keeper while an exact copy of it is still stored. Deleted
+    questions are subtracted from `catalog` if given.
+    """
+    index = LshIndex()
+    clusters = _UnionFind()
+    subjects: Dict[str, str] = {}
+    scanned = 0
+    backfill = []
+    hash_holders: Dict[str, List[str]] = defaultdict(list)
+
+    cursor = collection.find(
+        {},
+        {"_id": 0, "id": 1, "question": 1, "options": 1, "subject": 1, "contentHash": 1, "lshBands": 1},
+    ).sort("createdAt", 1).batch_size(batch_size)
+    async for question in cursor:
+        scanned += 1
+        signature = minhash(question)
+        bands = lsh_bands(signature)
+        key = question["id"]
+        clusters.find(key)
+        subjects[key] = question.get("subject")
+        for match, _ in index.query(signature, threshold, bands):
+            if subjects[match] == subjects[key]:
+                clusters.union(match, key)
+        index.add(key, signature, bands)
+        hash_ = content_hash(question)
+        hash_holders[hash_].append(key)
+        if question.get("contentHash") != hash_ or question.get("lshBands") != bands:
+            backfill.append((key, hash_, bands))
+
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for key in index.signatures:
+        groups[clusters.find(key)].append(key)
+    duplicate_clusters = [
+        {
+            "keep": root,
+            "duplicates": [k for k in members if k != root],
+            "minSimilarity": round(min(similarity(index.signatures[root], index.signatures[k]) for k in members if k != root), 3),
+        }
+        for root, members in groups.items() if len(members) > 1
+    ]
+    duplicate_ids = {k for cluster in duplicate_clusters for k in cluster["duplicates"]}
+
+    if duplicate_ids:
+        if apply:
+            deleted = await collection.find(
+                {"id": {"$in": list(duplicate_ids)}},
+                {"_id": 0, "subject": 1, "chapter": 1, "topic": 1, "difficulty": 1},
+            ).to_list(None)
+            await collection.delete_many({"id": {"$in": list(duplicate_ids)}})
+            if catalog is not None:
+                await adjust_catalog(catalog, deleted, sign=-1)
+        else:
+            await collection.bulk_write([
+                UpdateOne({"id": k}, {"$set": {"duplicateOf": cluster["keep"]}})
+                for cluster in duplicate_clusters for k in cluster["duplicates"]
+            ], ordered=False)
+
+    # Copies still stored after a dry run would hold (or be refused) the same hash under the unique index
+    remaining = set() if apply else duplicate_ids
+    updates = [
+        UpdateOne({"id": key}, {"$set": {"contentHash": hash_, "lshBands": bands}})
+        for key, hash_, bands in backfill
+        if key not in duplicate_ids and not any(k != key and k in remaining for k in hash_holders[hash_])
+    ]
+    backfilled = await write_hashes(collection, updates, batch_size)
+
+    return {
+        "scanned": scanned,
+        "clusters": len(duplicate_clusters),
+        "duplicates": len(duplicate_ids),
+        "applied": apply,
+        "backfilled": backfilled,
+        "sample": duplicate_clusters[:20],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find and remove near-duplicate questions")
+    parser.add_argument("--threshold", type=float, default=NEAR_DUPLICATE_THRESHOLD)
+    parser.add_argument("--apply", action="store_true", help="Delete duplicates instead of marking them")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            db = client[os.environ['DB_NAME']]
+            return await dedup_collection(db.questions, args.threshold, args.apply, catalog=db.question_catalog)
+        finally:
+            client.close()
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
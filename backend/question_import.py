@@ -0,0 +1,292 @@
+"""
+Streaming bulk import of question banks from NDJSON or CSV.
+
+Rows are read lazily, validated against the Question model in chunks,
+deduplicated by content hash (and optionally by near-duplicate similarity)
+and written with unordered insert_many batches, so memory stays bounded by
+the chunk size rather than the file size. Inserted questions are added to the
+question catalog counts.
+
+CLI (reads MONGO_URL and DB_NAME from the environment or backend/.env):
+
+    python question_import.py bank.ndjson
+    python question_import.py bank.csv --chunk-size 2000
+    python question_import.py bank.ndjson --near-duplicates 0.85
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from question_catalog import adjust_catalog, ensure_catalog_indexes
+from question_dedup import LshIndex, annotate, backfill_hashes, ensure_dedup_indexes, minhash
+
+IMPORT_CHUNK_SIZE = int(os.environ.get('QUESTION_IMPORT_CHUNK_SIZE', 1000))
+MAX_REPORTED_ERRORS = 100
+DUPLICATE_KEY_ERROR = 11000
+
+OPTION_LETTERS = "ABCD"
+OPTION_COLUMN = re.compile(r"^option[_ ]?([a-d])$", re.IGNORECASE)
+
+Row = Tuple[int, object]  # (line number, parsed row or the exception raised while parsing it)
+
+
+@dataclass
+class ImportReport:
+    read: int = 0
+    inserted: int = 0
+    invalid: int = 0
+    duplicates: int = 0
+    nearDuplicates: int = 0
+    errors: List[dict] = field(default_factory=list)
+    startedAt: float = field(default_factory=time.perf_counter)
+
+    def add_error(self, line: int, error: str):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def to_dict(self) -> dict:
+        return {
+            "read": self.read,
+            "inserted": self.inserted,
+            "invalid": self.invalid,
+            "duplicates": self.duplicates,
+            "nearDuplicates": self.nearDuplicates,
+            "errors": self.errors,
+            "errorsTruncated": self.invalid > len(self.errors),
+            "elapsedSeconds": round(time.perf_counter() - self.startedAt, 2),
+        }
+
+
+# ==================== Row Parsing ====================
+
+def iter_ndjson_rows(lines: Iterable[str]) -> Iterator[Row]:
+    """Yield one JSON object per non-blank line"""
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, e
+            continue
+        if not isinstance(row, dict):
+            yield line_no, ValueError(f"expected a JSON object, got {type(row).__name__}")
+            continue
+        yield line_no, row
+
+
+def iter_csv_rows(lines: Iterable[str]) -> Iterator[Row]:
+    """Yield one dict per CSV record; line numbers count the header as line 1"""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def detect_format(filename: Optional[str], explicit: Optional[str] = None) -> str:
+    if explicit:
+        return explicit.lower()
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    return "ndjson"
+
+
+def iter_rows(stream: io.TextIOBase, fmt: str) -> Iterator[Row]:
+    if fmt == "csv":
+        return iter_csv_rows(stream)
+    if fmt in ("ndjson", "jsonl", "json"):
+        return iter_ndjson_rows(stream)
+    raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def normalize_row(row: dict) -> dict:
+    """Map CSV columns and the frontend MCQ shape ({"A": ...}, "correct": "B") onto Question fields"""
+    data = {k.strip(): v.strip() if isinstance(v, str) else v for k, v in row.items() if k}
+    data = {k: v for k, v in data.items() if v not in ("", None)}
+
+    option_columns = sorted((m.group(1).upper(), k) for k in data for m in [OPTION_COLUMN.match(k)] if m)
+    if option_columns and "options" not in data:
+        data["options"] = [data.pop(k) for _, k in option_columns]
+
+    options = data.get("options")
+    if isinstance(options, str):
+        data["options"] = json.loads(options) if options.startswith("[") else [o.strip() for o in options.split("|")]
+    elif isinstance(options, dict):
+        data["options"] = [options[k] for k in sorted(options)]
+
+    answer = data.pop("correct", None) if "correctAnswer" not in data else data["correctAnswer"]
+    if isinstance(answer, str):
+        answer = answer.strip().upper()
+        answer = OPTION_LETTERS.index(answer) if answer in OPTION_LETTERS else int(answer)
+    if answer is not None:
+        data["correctAnswer"] = answer
+    return data
+
+
+def prepare_chunk(rows: Iterator[Row], size: int, model: type, seen: set, report: ImportReport) -> List[dict]:
+    """Read up to `size` rows and return the valid, not yet seen question documents"""
+    documents = []
+    for line_no, row in islice(rows, size):
+        report.read += 1
+        if isinstance(row, Exception):
+            report.invalid += 1
+            report.add_error(line_no, f"Malformed row: {row}")
+            continue
+        try:
+            question = model(**normalize_row(row)).dict()
+            if not 0 <= question["correctAnswer"] < len(question["options"]):
+                raise ValueError("correctAnswer is out of range of options")
+        except ValidationError as e:
+            report.invalid += 1
+            error = e.errors()[0]
+            report.add_error(line_no, f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}")
+            continue
+        except (ValueError, TypeError) as e:
+            report.invalid += 1
+            report.add_error(line_no, str(e))
+            continue
+
+        annotate(question)
+        if question["contentHash"] in seen:
+            report.duplicates += 1
+            continue
+        seen.add(question["contentHash"])
+        documents.append(question)
+    return documents
+
+
+# ==================== Import ====================
+
+async def insert_chunk(collection, documents: List[dict], report: ImportReport) -> List[dict]:
+    """Unordered insert; duplicate-key rejections are counted, not fatal. Returns the inserted documents"""
+    if not documents:
+        return []
+    try:
+        result = await collection.insert_many(documents, ordered=False)
+        report.inserted += len(result.inserted_ids)
+        return documents
+    except BulkWriteError as e:
+        details = e.details
+        report.inserted += details.get("nInserted", 0)
+        for error in details.get("writeErrors", []):
+            if error.get("code") == DUPLICATE_KEY_ERROR:
+                report.duplicates += 1
+            else:
+                report.invalid += 1
+                report.add_error(-1, error.get("errmsg", "write error"))
+        rejected = {error.get("index") for error in details.get("writeErrors", [])}
+        return [document for i, document in enumerate(documents) if i not in rejected]
+
+
+async def drop_near_duplicates(collection, documents: List[dict], threshold: float,
+                               report: ImportReport) -> List[dict]:
+    """Drop documents that nearly match a stored question or an earlier row of the chunk"""
+    if not documents:
+        return documents
+    index = LshIndex()
+    subjects = {}
+    bands = list({band for document in documents for band in document["lshBands"]})
+    stored = await collection.find(
+        {"lshBands": {"$in": bands}},
+        {"_id": 0, "id": 1, "question": 1, "options": 1, "subject": 1, "lshBands": 1},
+    ).to_list(None)
+    for question in stored:
+        subjects[question["id"]] = question.get("subject")
+        index.add(question["id"], minhash(question), question["lshBands"])
+
+    kept = []
+    for document in documents:
+        signature = minhash(document)
+        matches = index.query(signature, threshold, document["lshBands"])
+        if any(subjects[key] == document["subject"] for key, _ in matches):
+            report.nearDuplicates += 1
+            continue
+        subjects[document["id"]] = document["subject"]
+        index.add(document["id"], signature, document["lshBands"])
+        kept.append(document)
+    return kept
+
+
+async def import_questions(collection, rows: Iterator[Row], model: type,
+                           chunk_size: int = IMPORT_CHUNK_SIZE,
+                           near_duplicate_threshold: Optional[float] = None,
+                           catalog=None,
+                           on_progress: Optional[Callable[[ImportReport], None]] = None) -> ImportReport:
+    """Validate and insert questions chunk by chunk, counting inserted ones in `catalog` if given"""
+    report = ImportReport()
+    seen = set()
+    # Stored questions without a hash would not collide with their copies in the file
+    await backfill_hashes(collection)
+    while True:
+        read_before = report.read
+        # Parsing and validation are CPU bound; keep them off the event loop
+        documents = await asyncio.to_thread(prepare_chunk, rows, chunk_size, model, seen, report)
+        if report.read == read_before:
+            break
+        if near_duplicate_threshold:
+            documents = await drop_near_duplicates(collection, documents, near_duplicate_threshold, report)
+        inserted = await insert_chunk(collection, documents, report)
+        if catalog is not None:
+            await adjust_catalog(catalog, inserted)
+        if on_progress:
+            on_progress(report)
+    return report
+
+
+# ==================== CLI ====================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a question bank into MongoDB")
+    parser.add_argument("path", help="NDJSON (.ndjson/.jsonl) or CSV file")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="Override format detection")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument("--near-duplicates", type=float, metavar="THRESHOLD",
+                        help="Also skip rows this similar to an existing question")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    from server import Question
+
+    def progress(report: ImportReport):
+        print(f"\rread {report.read}  inserted {report.inserted}  duplicates {report.duplicates}  "
+              f"near {report.nearDuplicates}  invalid {report.invalid}", end="", file=sys.stderr, flush=True)
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            with open(args.path, encoding="utf-8-sig", newline="") as f:
+                rows = iter_rows(f, detect_format(args.path, args.format))
+                db = client[os.environ['DB_NAME']]
+                # Without the unique contentHash index, repeats from earlier runs would be inserted again
+                await ensure_dedup_indexes(db.questions)
+                await ensure_catalog_indexes(db.question_catalog)
+                return await import_questions(db.questions, rows, Question, args.chunk_size, args.near_duplicates,
+                                              catalog=db.question_catalog, on_progress=progress)
+        finally:
+            client.close()
+
+    report = asyncio.run(run())
+    print(file=sys.stderr)
+    print(json.dumps(report.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
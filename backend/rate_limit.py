@@ -0,0 +1,204 @@
+"""
+Token-bucket rate limiting for expensive routes.
+
+Each limited route has a bucket per user id and a bucket per client IP; a
+request is admitted only if both have a token left, otherwise it gets a 429
+with Retry-After. The default backend keeps buckets in process memory (one
+dict lookup per check). Set RATE_LIMIT_REDIS_URL to share buckets between
+workers (requires the `redis` package); each check is then a single Redis
+script call.
+
+Limits are per minute and can be overridden per route with RATE_LIMITS
+(JSON), e.g.
+
+    RATE_LIMITS='{"buddy": {"perMinute": 12, "burst": 20}}'
+
+Set RATE_LIMITS_ENABLED=false to turn limiting off.
+
+Client IPs come from the TCP peer. Behind reverse proxies set
+RATE_LIMIT_TRUST_PROXY=true and RATE_LIMIT_PROXY_HOPS to the number of
+proxies in front of the app; the IP is then read that many entries from the
+right of X-Forwarded-For, since entries further left are supplied by the
+client and can be forged.
+"""
+
+import json
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITS = {
+    "buddy": {"perMinute": 6, "burst": 10, "ipPerMinute": 30, "ipBurst": 40},
+    "study_plan": {"perMinute": 2, "burst": 3, "ipPerMinute": 10, "ipBurst": 10},
+    "pregenerated": {"perMinute": 10, "burst": 20, "ipPerMinute": 20, "ipBurst": 30},
+    "mcq_batch": {"perMinute": 5, "burst": 10, "ipPerMinute": 10, "ipBurst": 20},
+}
+MAX_MEMORY_BUCKETS = int(os.environ.get('RATE_LIMIT_MAX_BUCKETS', 100_000))
+TRUST_FORWARDED_FOR = os.environ.get('RATE_LIMIT_TRUST_PROXY', 'false').lower() == 'true'
+TRUSTED_PROXY_HOPS = max(int(os.environ.get('RATE_LIMIT_PROXY_HOPS', 1)), 1)
+
+
+@dataclass
+class Limit:
+    rate: float  # tokens per second
+    burst: float
+
+    @classmethod
+    def per_minute(cls, per_minute: Optional[float], burst: Optional[float]) -> Optional["Limit"]:
+        if not per_minute:
+            return None
+        return cls(rate=per_minute / 60, burst=burst or per_minute)
+
+
+@dataclass
+class RouteLimit:
+    user: Optional[Limit]
+    ip: Optional[Limit]
+
+
+# ==================== Backends ====================
+
+class MemoryBackend:
+    """Buckets in this process; least recently used keys are evicted past `max_keys`"""
+
+    def __init__(self, max_keys: int = MAX_MEMORY_BUCKETS):
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take_now(self, key: str, limit: Limit) -> float:
+        """Take one token; returns 0 if admitted, else seconds until a token is available"""
+        now = time.monotonic()
+        tokens, updated = self.buckets.pop(key, (limit.burst, now))
+        tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / limit.rate
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.max_keys:
+            # An evicted bucket comes back full, which is at worst a little lenient
+            self.buckets.popitem(last=False)
+        return wait
+
+    async def take(self, key: str, limit: Limit) -> float:
+        return self.take_now(key, limit)
+
+
+TOKEN_BUCKET_SCRIPT = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 't', 'u')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 't', tokens, 'u', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    """Buckets shared by all workers; fails open if Redis is unavailable"""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.prefix = prefix
+        self.script = self.redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self.errors = 0
+
+    async def take(self, key: str, limit: Limit) -> float:
+        try:
+            wait = await self.script(keys=[self.prefix + key], args=[limit.rate, limit.burst, time.time()])
+            return float(wait)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Rate limit check failed, admitting request: {e}")
+            return 0.0
+
+
+# ==================== Limiter ====================
+
+def load_limits(overrides: str = None) -> Dict[str, RouteLimit]:
+    config = {name: dict(limit) for name, limit in DEFAULT_LIMITS.items()}
+    for name, limit in json.loads(overrides or "{}").items():
+        config[name] = {**config.get(name, {}), **limit}
+    return {
+        name: RouteLimit(
+            user=Limit.per_minute(limit.get("perMinute"), limit.get("burst")),
+            ip=Limit.per_minute(limit.get("ipPerMinute"), limit.get("ipBurst")),
+        )
+        for name, limit in config.items()
+    }
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_FORWARDED_FOR:
+        # Each trusted proxy appends the address it received the request from
+        forwarded = [entry.strip() for entry in request.headers.get("x-forwarded-for", "").split(",") if entry.strip()]
+        if forwarded:
+            return forwarded[max(len(forwarded) - TRUSTED_PROXY_HOPS, 0)]
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimiter:
+    def __init__(self, limits: Dict[str, RouteLimit], backend=None, enabled: bool = True):
+        self.limits = limits
+        self.backend = backend or MemoryBackend()
+        self.enabled = enabled
+        self.allowed: Dict[str, int] = {}
+        self.limited: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        redis_url = os.environ.get('RATE_LIMIT_REDIS_URL')
+        return cls(
+            load_limits(os.environ.get('RATE_LIMITS')),
+            RedisBackend(redis_url) if redis_url else MemoryBackend(),
+            enabled=os.environ.get('RATE_LIMITS_ENABLED', 'true').lower() == 'true',
+        )
+
+    async def check(self, route: str, user_id: Optional[str], ip: str) -> float:
+        """Seconds the caller must wait, 0 if the request is admitted"""
+        limit = self.limits.get(route)
+        if not self.enabled or limit is None:
+            return 0.0
+        wait = 0.0
+        if limit.user and user_id:
+            wait = await self.backend.take(f"{route}:u:{user_id}", limit.user)
+        if not wait and limit.ip:
+            wait = await self.backend.take(f"{route}:ip:{ip}", limit.ip)
+        counter = self.limited if wait else self.allowed
+        counter[route] = counter.get(route, 0) + 1
+        return wait
+
+    def dependency(self, route: str):
+        """FastAPI dependency enforcing the limits of `route`"""
+        async def enforce(request: Request):
+            wait = await self.check(route, request.query_params.get("userId"), client_ip(request))
+            if wait:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many requests, please slow down",
+                    headers={"Retry-After": str(math.ceil(wait))}
+                )
+        return enforce
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "allowed": dict(self.allowed),
+            "limited": dict(self.limited),
+        }
@@ -1,29 +1,96 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, Response, UploadFile, File, Query, WebSocket, WebSocketDisconnect
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import TEXT
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, OperationFailure
 import os
+import io
+import asyncio
+import json
+import random
 import logging
+import time
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, conint
+from typing import Dict, List, Optional
 import uuid
-from datetime import datetime
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from answer_cache import AnswerCache
+from calibration import CALIBRATION_MIN_ATTEMPTS, calibrate
+from archival import (DAILY_QUESTION_TTL_DAYS, PREGENERATED_TTL_DAYS, ensure_archive_indexes, ensure_ttl_index,
+                      read_archived, run_archival)
+from grading import MAX_OPTIONS, AnswerKey, grade_sheets
+from job_queue import JOB_RETENTION_DAYS, JobQueue
+from live_tests import LIVE_TICK_SECONDS, AttemptWriter, LiveAttempts, answers_by_question, new_attempt_answers
+from llm_routing import LlmRouter, estimate_tokens
+from rate_limit import RateLimiter
+from paper_assembly import DEFAULT_DIFFICULTY_MIX, NEET_SECTIONS, allocate_paper, blueprint_key
+from question_catalog import (DIFFICULTY_LEVELS, CatalogCache, ensure_catalog_indexes,
+                              difficulty_level, rebuild_catalog, summarize)
+from question_dedup import (NEAR_DUPLICATE_THRESHOLD, content_hash, dedup_collection, ensure_dedup_indexes,
+                            find_near_duplicates)
+from question_import import detect_format, import_questions, iter_rows
+from weak_areas import compute_weak_areas, ensure_weak_area_indexes
+from write_behind import WriteBehindQueue
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection, opened by the app lifespan (one client and pool per worker process)
+client = None
+db = None
 
 # Emergent LLM Key
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
 
-# Create the main app
-app = FastAPI()
+# Emergent LLM integration, imported on first use or during warm-up to keep `import server` fast
+LlmChat = None
+UserMessage = None
+
+# Model routing table (LLM_ROUTES) with per-route fallback chains and usage stats
+llm_router = LlmRouter.from_env()
+
+# Similarity cache of past AI Buddy answers
+BUDDY_CACHE_WARM_LIMIT = int(os.environ.get('BUDDY_CACHE_WARM_LIMIT', 5000))
+answer_cache = AnswerCache()
+
+# Chat history is persisted in the background instead of on the response path
+chat_writer = WriteBehindQueue(
+    "chat_messages",
+    max_batch=int(os.environ.get('CHAT_WRITE_BATCH_SIZE', 200)),
+    flush_interval=float(os.environ.get('CHAT_WRITE_FLUSH_INTERVAL', 0.5)),
+    max_pending=int(os.environ.get('CHAT_WRITE_MAX_PENDING', 10000))
+)
+
+# Ledger of every model call, written in the background like chat history
+llm_ledger = WriteBehindQueue(
+    "llm_calls",
+    max_batch=int(os.environ.get('LLM_LEDGER_BATCH_SIZE', 500)),
+    flush_interval=float(os.environ.get('LLM_LEDGER_FLUSH_INTERVAL', 1.0)),
+    max_pending=int(os.environ.get('LLM_LEDGER_MAX_PENDING', 20000))
+)
+LLM_LEDGER_RETENTION_DAYS = int(os.environ.get('LLM_LEDGER_RETENTION_DAYS', 90))
+
+# Per-question attempt events, batched into the question_attempts time-series collection
+attempt_events = WriteBehindQueue(
+    "question_attempts",
+    max_batch=int(os.environ.get('ATTEMPT_EVENTS_BATCH_SIZE', 1000)),
+    flush_interval=float(os.environ.get('ATTEMPT_EVENTS_FLUSH_INTERVAL', 1.0)),
+    max_pending=int(os.environ.get('ATTEMPT_EVENTS_MAX_PENDING', 100000))
+)
+QUESTION_ATTEMPT_RETENTION_DAYS = int(os.environ.get('QUESTION_ATTEMPT_RETENTION_DAYS', 730))
+
+# Token-bucket limits per user and IP on routes that call the model (RATE_LIMITS)
+rate_limiter = RateLimiter.from_env()
+
+# Per-user daily model call quotas by route, e.g. '{"buddy": 100, "study_plan": 5}'
+LLM_DAILY_QUOTAS = json.loads(os.environ.get('LLM_DAILY_QUOTAS') or '{"buddy": 100, "study_plan": 5}')
+
+# Long-running generations are processed by background workers (JOB_WORKERS per process)
+job_queue = JobQueue()
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -56,6 +123,83 @@ class Question(BaseModel):
     difficulty: str = "medium"  # easy, medium, hard
     createdAt: datetime = Field(default_factory=datetime.utcnow)
 
+class QuestionListItem(BaseModel):
+    """Question as shown in lists and tests; answer and explanation are fetched after submission"""
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    question: str
+    options: List[str]
+    subject: str
+    chapter: str
+    topic: str
+    difficulty: str = "medium"
+
+class AnswerRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=200)
+
+class QuestionBucket(BaseModel):
+    subject: str
+    chapter: str
+    topic: Optional[str] = None
+    difficulty: Optional[str] = Field(None, pattern="^(easy|medium|hard)$")
+    count: int = Field(10, ge=1, le=200)
+
+class AttemptEvent(BaseModel):
+    questionId: str
+    choice: Optional[int] = None  # None if skipped
+    correct: Optional[bool] = None
+    timeMs: int = Field(0, ge=0)
+    at: Optional[datetime] = None  # when the student answered; defaults to receipt time
+
+class AttemptEventBatch(BaseModel):
+    userId: str
+    sessionId: Optional[str] = None  # practice session or test attempt the events belong to
+    events: List[AttemptEvent] = Field(..., min_length=1, max_length=500)
+
+class MixedQuestionRequest(BaseModel):
+    buckets: List[QuestionBucket] = Field(..., min_length=1, max_length=50)
+    view: str = Field("full", pattern="^(full|list)$")
+
+MAX_MIXED_QUESTIONS = 200
+
+class AnswerSheet(BaseModel):
+    userId: str
+    answers: Dict[str, Optional[conint(ge=0, lt=MAX_OPTIONS)]]  # question id -> chosen option index, None if skipped
+    timeSpent: int = 0  # in seconds
+
+class GradeRequest(BaseModel):
+    paperId: Optional[str] = None  # grade against every question of an assembled paper
+    sheets: List[AnswerSheet] = Field(..., min_length=1, max_length=5000)
+    save: bool = False  # store a MockTest for each sheet
+
+class AttemptCreate(BaseModel):
+    userId: str
+    paperId: str
+    durationMinutes: int = Field(200, ge=1, le=600)  # NEET: 3 h 20 min
+
+class BlueprintChapter(BaseModel):
+    chapter: str
+    weight: float = Field(1.0, gt=0)
+
+class BlueprintSection(BaseModel):
+    subject: str
+    questions: int = Field(..., ge=1, le=200)
+    chapters: List[BlueprintChapter] = []  # empty: every chapter in the bank, weighted by its question count
+
+class PaperBlueprint(BaseModel):
+    name: str = "NEET Full Mock"
+    version: int = 1  # bump to assemble a fresh paper from the same blueprint
+    sections: List[BlueprintSection] = Field(default_factory=lambda: [BlueprintSection(**s) for s in NEET_SECTIONS])
+    difficultyMix: Dict[str, float] = Field(default_factory=lambda: dict(DEFAULT_DIFFICULTY_MIX))
+
+QUESTION_LIST_PROJECTION = {"_id": 0, **{field: 1 for field in QuestionListItem.model_fields}}
+# Dedup bookkeeping is never part of a response
+QUESTION_FULL_PROJECTION = {"_id": 0, "lshBands": 0, "contentHash": 0}
+
+class QuestionCandidate(BaseModel):
+    question: str
+    options: List[str] = []
+    subject: Optional[str] = None
+
 class PracticeSession(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     userId: str
@@ -106,33 +250,112 @@ class StudyPlan(BaseModel):
     dailyHours: int
     subjects: List[str]
     plan: dict  # AI-generated daily plan
+    templateId: Optional[str] = None  # shared study_plan_templates entry the plan was built from
     createdAt: datetime = Field(default_factory=datetime.utcnow)
 
 class ChatMessage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     userId: str
+    sessionId: Optional[str] = None  # conversation the message belongs to
     message: str
     response: str
+    cached: bool = False  # served from the answer cache
     createdAt: datetime = Field(default_factory=datetime.utcnow)
 
 
 # ==================== AI Helper Functions ====================
 
-async def generate_with_ai(prompt: str, system_message: str = "You are an expert NEET exam question creator and tutor.") -> str:
-    """Generate content using Emergent LLM"""
-    try:
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message=system_message
-        ).with_model("openai", "gpt-5.2")
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        return response
-    except Exception as e:
-        logging.error(f"AI generation failed: {e}")
-        raise HTTPException(status_code=500, detail="AI generation failed")
+def record_llm_call(route: str, user_id: Optional[str], model: Optional[str] = None, prompt: str = "",
+                    response: str = "", latency_ms: float = 0.0, ok: bool = True, cached: bool = False,
+                    fallback: bool = False, cost: float = 0.0):
+    """Append one model call (or cache hit) to the llm_calls ledger"""
+    now = datetime.utcnow()
+    llm_ledger.put({
+        "route": route,
+        "userId": user_id,
+        "model": model,
+        "promptChars": len(prompt),
+        "responseChars": len(response or ""),
+        "latencyMs": round(latency_ms, 1),
+        "ok": ok,
+        "cached": cached,
+        "fallback": fallback,
+        "costUsd": round(cost, 6),
+        "day": now.strftime("%Y-%m-%d"),
+        "createdAt": now
+    })
+
+async def consume_llm_quota(user_id: str, route: str) -> Optional[str]:
+    """Count one model call against the user's daily quota for `route`; 429 once it is used up.
+
+    Returns the day charged (None if the route has no quota), for refund_llm_quota.
+    """
+    limit = LLM_DAILY_QUOTAS.get(route)
+    if not limit:
+        return None
+    now = datetime.utcnow()
+    day = now.strftime("%Y-%m-%d")
+    for attempt in range(2):
+        try:
+            # The count filter makes the upsert collide with the unique index once the limit is reached
+            await db.llm_quotas.update_one(
+                {"userId": user_id, "route": route, "day": day, "count": {"$lt": limit}},
+                {"$inc": {"count": 1}, "$setOnInsert": {"createdAt": now}},
+                upsert=True
+            )
+            return day
+        except DuplicateKeyError:
+            # Concurrent first calls of the day both try the insert; the loser's retry updates the winner's document
+            if attempt:
+                break
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    raise HTTPException(
+        status_code=429,
+        detail=f"Daily {route} limit of {limit} requests reached",
+        headers={"Retry-After": str(int((midnight - now).total_seconds()) + 1)}
+    )
+
+async def refund_llm_quota(user_id: str, route: str, day: Optional[str]):
+    """Give back a call charged by consume_llm_quota whose generation failed"""
+    if day:
+        await db.llm_quotas.update_one(
+            {"userId": user_id, "route": route, "day": day, "count": {"$gt": 0}}, {"$inc": {"count": -1}}
+        )
+
+def load_llm_integration():
+    global LlmChat, UserMessage
+    if LlmChat is None:
+        from emergentintegrations.llm.chat import LlmChat as chat_class, UserMessage as message_class
+        LlmChat, UserMessage = chat_class, message_class
+
+async def generate_with_ai(prompt: str, system_message: str = "You are an expert NEET exam question creator and tutor.",
+                           route: str = "default", user_id: Optional[str] = None) -> str:
+    """Generate content using Emergent LLM, walking the route's model fallback chain"""
+    load_llm_integration()
+    chain = llm_router.route(route)
+    for attempt, (provider, model) in enumerate(chain.models):
+        if attempt:
+            llm_router.record_fallback(route)
+        started = time.perf_counter()
+        try:
+            chat = LlmChat(
+                api_key=EMERGENT_LLM_KEY,
+                session_id=str(uuid.uuid4()),
+                system_message=system_message
+            ).with_model(provider, model)
+            
+            user_message = UserMessage(text=prompt)
+            response = await asyncio.wait_for(chat.send_message(user_message), timeout=chain.timeout)
+            cost = llm_router.record(route, provider, model, started, prompt, response)
+            record_llm_call(route, user_id, f"{provider}/{model}", prompt, response,
+                            (time.perf_counter() - started) * 1000, fallback=attempt > 0, cost=cost)
+            return response
+        except Exception as e:
+            llm_router.record(route, provider, model, started, prompt, error=True)
+            record_llm_call(route, user_id, f"{provider}/{model}", prompt, latency_ms=(time.perf_counter() - started) * 1000,
+                            ok=False, fallback=attempt > 0)
+            logging.error(f"AI generation failed on {provider}/{model} for route {route}: {e!r}")
+    raise HTTPException(status_code=500, detail="AI generation failed")
 
 
 # ==================== User Routes ====================
@@ -170,7 +393,7 @@ async def get_daily_motivation():
         Focus on: consistency, hard work, NCERT importance, or exam strategy. 
         Make it uplifting and actionable. No emojis."""
         
-        motivation = await generate_with_ai(prompt, "You are a motivational NEET mentor.")
+        motivation = await generate_with_ai(prompt, "You are a motivational NEET mentor.", route="motivation")
         return {"message": motivation.strip()}
     except Exception as e:
         # Fallback motivation
@@ -179,6 +402,21 @@ async def get_daily_motivation():
 
 # ==================== Question Routes ====================
 
+def serialize_questions(documents: List[dict]) -> List[dict]:
+    """Validate raw question documents and convert them to response dicts"""
+    return [Question(**q).dict() for q in documents]
+
+
+def serialize_question_list(documents: List[dict]) -> List[dict]:
+    """List view of question documents (no answer or explanation)"""
+    return [QuestionListItem(**q).dict() for q in documents]
+
+
+def parse_ai_questions(response: str) -> List[dict]:
+    """Parse a JSON array of questions returned by the model"""
+    return serialize_questions(json.loads(response))
+
+
 @api_router.get("/questions/daily")
 async def get_daily_question():
     """Get or generate daily NEET question"""
@@ -207,7 +445,7 @@ async def get_daily_question():
 
 Make the question from a random important NEET chapter. Use proper medical exam standards."""
         
-        response = await generate_with_ai(prompt)
+        response = await generate_with_ai(prompt, route="daily_question")
         
         # Parse the response (it should be JSON)
         import json
@@ -253,8 +491,15 @@ Make the question from a random important NEET chapter. Use proper medical exam
 
 
 @api_router.post("/questions/generate")
-async def generate_questions(subject: str, chapter: str, topic: Optional[str] = None, count: int = 10):
-    """Get questions from database (faster than AI generation)"""
+async def generate_questions(subject: str, chapter: str, topic: Optional[str] = None, count: int = 10,
+                             view: str = Query("full", pattern="^(full|list)$")):
+    """Get questions from database (faster than AI generation)
+
+    view=list returns id, stem and options only; fetch answers and explanations
+    with POST /questions/answers once the student has submitted.
+    """
+    serialize = serialize_question_list if view == "list" else serialize_questions
+    projection = QUESTION_LIST_PROJECTION if view == "list" else QUESTION_FULL_PROJECTION
     try:
         # Build query
         query = {"subject": subject, "chapter": chapter}
@@ -262,18 +507,17 @@ async def generate_questions(subject: str, chapter: str, topic: Optional[str] =
             query["topic"] = topic
         
         # Get questions from database
-        questions_cursor = db.questions.find(query).limit(count)
+        questions_cursor = db.questions.find(query, projection).limit(count)
         questions = await questions_cursor.to_list(length=count)
         
-        if len(questions) >= count:
-            # Return questions from database
-            return {"questions": [Question(**q).dict() for q in questions]}
-        
-        # If not enough in database, return what we have
         if questions:
-            return {"questions": [Question(**q).dict() for q in questions]}
+            # Return what we have, even if fewer than requested
+            return {"questions": serialize(questions)}
         
-        # No questions found - return fallback
+        # No questions found - return fallback. A catalog still counting this chapter is stale; reload it
+        if await catalog_cache.count(db.question_catalog, subject, chapter, topic):
+            logging.warning(f"Question catalog lists {subject}/{chapter} but the bank has no questions; reloading it")
+            catalog_cache.invalidate()
         fallback_question = Question(
             question=f"Sample question for {subject} - {chapter}",
             options=["Option A", "Option B", "Option C", "Option D"],
@@ -284,7 +528,7 @@ async def generate_questions(subject: str, chapter: str, topic: Optional[str] =
             topic=topic or "General",
             difficulty="medium"
         )
-        return {"questions": [fallback_question.dict()]}
+        return {"questions": serialize([fallback_question.dict()])}
         
     except Exception as e:
         logging.error(f"Failed to get questions: {e}")
@@ -299,7 +543,89 @@ async def generate_questions(subject: str, chapter: str, topic: Optional[str] =
             topic=topic or "General",
             difficulty="medium"
         )
-        return {"questions": [fallback_question.dict()]}
+        return {"questions": serialize([fallback_question.dict()])}
+
+
+async def find_answer_documents(ids: List[str], fields: tuple) -> Dict[str, dict]:
+    """id -> selected fields of each question, including questions embedded in pre-generated sets"""
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in fields}}
+    found = {q["id"]: q async for q in db.questions.find({"id": {"$in": ids}}, projection)}
+
+    # Pre-generated sets keep their questions embedded rather than in db.questions
+    missing = [question_id for question_id in ids if question_id not in found]
+    if missing:
+        wanted = set(missing)
+        embedded = {f"questions.{field}": 1 for field in projection if field != "_id"}
+        async for chapter_set in db.pregenerated_questions.find({"questions.id": {"$in": missing}}, {"_id": 0, **embedded}):
+            for q in chapter_set["questions"]:
+                if q.get("id") in wanted and q["id"] not in found:
+                    found[q["id"]] = q
+    return found
+
+
+@api_router.post("/questions/answers")
+async def get_question_answers(request: AnswerRequest):
+    """Correct answers and explanations for up to 200 question ids, fetched after submission"""
+    ids = list(dict.fromkeys(request.ids))
+    found = await find_answer_documents(ids, ("correctAnswer", "explanation"))
+    return {
+        "answers": [
+            {"id": question_id, "correctAnswer": found[question_id]["correctAnswer"],
+             "explanation": found[question_id].get("explanation", "")}
+            for question_id in ids if question_id in found
+        ],
+        "missing": [question_id for question_id in ids if question_id not in found],
+    }
+
+
+def bucket_query(bucket: QuestionBucket) -> dict:
+    query = {"subject": bucket.subject, "chapter": bucket.chapter}
+    if bucket.topic:
+        query["topic"] = bucket.topic
+    if bucket.difficulty:
+        query["difficulty"] = {"$in": DIFFICULTY_LEVELS[bucket.difficulty]}
+    return query
+
+
+async def sample_question_buckets(buckets: List[QuestionBucket], projection: dict) -> List[List[dict]]:
+    """Random draws for every bucket in one aggregation; a bucket may come back short"""
+    queries = [bucket_query(bucket) for bucket in buckets]
+    pipeline = [
+        # The outer $match narrows the scan to the requested chapters using the index
+        {"$match": {"$or": queries}},
+        {"$facet": {
+            f"b{i}": [{"$match": query}, {"$sample": {"size": bucket.count}}, {"$project": projection}]
+            for i, (query, bucket) in enumerate(zip(queries, buckets))
+        }},
+    ]
+    result = await db.questions.aggregate(pipeline).to_list(1)
+    facets = result[0] if result else {}
+    return [facets.get(f"b{i}", []) for i in range(len(buckets))]
+
+
+@api_router.post("/questions/mixed")
+async def get_mixed_questions(request: MixedQuestionRequest):
+    """Shuffled question set drawn from several chapters in a single database round trip"""
+    requested = sum(bucket.count for bucket in request.buckets)
+    if requested > MAX_MIXED_QUESTIONS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_MIXED_QUESTIONS} questions per request")
+
+    list_view = request.view == "list"
+    drawn = await sample_question_buckets(
+        request.buckets, QUESTION_LIST_PROJECTION if list_view else QUESTION_FULL_PROJECTION
+    )
+
+    # Overlapping buckets (e.g. a chapter and one of its topics) can draw the same question
+    questions, seen, summary = [], set(), []
+    for bucket, documents in zip(request.buckets, drawn):
+        fresh = [q for q in documents if q.get("id") not in seen]
+        seen.update(q.get("id") for q in fresh)
+        questions.extend(fresh)
+        summary.append({**bucket.dict(), "returned": len(fresh)})
+    random.shuffle(questions)
+
+    serialize = serialize_question_list if list_view else serialize_questions
+    return {"questions": serialize(questions), "buckets": summary, "requested": requested}
 
 
 # ==================== Practice Routes ====================
@@ -311,31 +637,29 @@ async def create_practice_session(session: PracticeSession):
     return session
 
 @api_router.get("/practice/sessions/{user_id}", response_model=List[PracticeSession])
-async def get_user_practice_sessions(user_id: str):
-    """Get all practice sessions for a user"""
-    sessions = await db.practice_sessions.find({"userId": user_id}).to_list(100)
+async def get_user_practice_sessions(user_id: str, includeArchived: bool = False):
+    """Get all practice sessions for a user, newest first"""
+    sessions = await db.practice_sessions.find({"userId": user_id}, {"_id": 0}).sort("createdAt", -1).to_list(100)
+    if includeArchived and len(sessions) < 100:
+        sessions += await read_archived(db, "practice_sessions", user_id, 100 - len(sessions))
     return [PracticeSession(**session) for session in sessions]
 
 
 # ==================== AI MCQ Generation Route (New Architecture) ====================
 
-@api_router.post("/ai/generate-mcq")
+@api_router.post("/ai/generate-mcq", dependencies=[Depends(rate_limiter.dependency("mcq_batch"))])
 async def generate_mcq(request: dict):
     """Generate NEET MCQs using the master prompt from architecture"""
     try:
         prompt = request.get("prompt")
         
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message="You are an expert NEET-UG question creator. Always respond with valid JSON only."
-        ).with_model("openai", "gpt-5.2")
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        response = await generate_with_ai(
+            prompt,
+            "You are an expert NEET-UG question creator. Always respond with valid JSON only.",
+            route="mcq_batch"
+        )
         
         # Parse JSON response
-        import json
         mcq_data = json.loads(response)
         
         return mcq_data
@@ -372,6 +696,51 @@ async def create_mock_test(test: MockTest):
     await db.mock_tests.insert_one(test.dict())
     return test
 
+@api_router.post("/tests/grade")
+async def grade_tests(request: GradeRequest):
+    """Grade one or many answer sheets server-side with NEET marking"""
+    if request.paperId:
+        paper = await db.papers.find_one({"id": request.paperId}, {"_id": 0, "questions.id": 1})
+        if not paper:
+            raise HTTPException(status_code=404, detail="Paper not found")
+        ids = [q["id"] for q in paper["questions"]]
+    else:
+        ids = list(dict.fromkeys(question_id for sheet in request.sheets for question_id in sheet.answers))
+    results, missing = await grade_answer_sheets(ids, request.sheets, request.paperId, request.save)
+    return {"results": results, "missingQuestions": missing}
+
+async def grade_answer_sheets(ids: List[str], sheets: List[AnswerSheet], paper_id: Optional[str],
+                              save: bool) -> tuple:
+    """Grade sheets against the questions `ids`, optionally storing a MockTest per sheet"""
+    found = await find_answer_documents(ids, ("correctAnswer", "subject", "chapter"))
+    key = AnswerKey.build([found[question_id] for question_id in ids if question_id in found])
+
+    # Array work for thousands of sheets is CPU bound; keep it off the event loop
+    results = await asyncio.to_thread(grade_sheets, key, [sheet.answers for sheet in sheets], paper_id is not None)
+
+    tests = []
+    for sheet, result in zip(sheets, results):
+        test = MockTest(
+            userId=sheet.userId,
+            testType=mock_test_type(paper_id, result["chapters"]),
+            totalQuestions=result["totalQuestions"],
+            correctAnswers=result["correctAnswers"],
+            score=result["score"],
+            timeSpent=sheet.timeSpent,
+            accuracy=result["accuracy"],
+            weakChapters=result["weakChapters"],
+        )
+        result.update(userId=sheet.userId, testId=test.id if save else None)
+        tests.append(test.dict())
+    if save:
+        await db.mock_tests.insert_many(tests, ordered=False)
+    return results, len(ids) - len(key.ids)
+
+def mock_test_type(paper_id: Optional[str], chapters: List[dict]) -> str:
+    if paper_id or len({c["subject"] for c in chapters}) > 1:
+        return "full"
+    return "chapter" if len(chapters) == 1 else "subject"
+
 @api_router.get("/tests/{user_id}", response_model=List[MockTest])
 async def get_user_tests(user_id: str):
     """Get all mock tests for a user"""
@@ -379,6 +748,279 @@ async def get_user_tests(user_id: str):
     return [MockTest(**test) for test in tests]
 
 
+# ==================== Paper Assembly Routes ====================
+
+PAPER_CACHE_SIZE = int(os.environ.get('PAPER_CACHE_SIZE', 64))
+SHORT_PAPER_REUSE_SECONDS = float(os.environ.get('SHORT_PAPER_REUSE_SECONDS', 300))
+
+assembled_papers: "OrderedDict[str, dict]" = OrderedDict()  # in-process LRU by blueprint key
+_paper_locks = {}
+
+def remember_paper(paper: dict):
+    assembled_papers[paper["blueprintKey"]] = paper
+    assembled_papers.move_to_end(paper["blueprintKey"])
+    while len(assembled_papers) > PAPER_CACHE_SIZE:
+        assembled_papers.popitem(last=False)
+
+async def find_paper(key: str) -> Optional[dict]:
+    paper = assembled_papers.get(key)
+    if paper:
+        assembled_papers.move_to_end(key)
+        return paper
+    # A short paper is reused for a few minutes, so a bank that cannot fill the blueprint is not reassembled per request
+    cutoff = datetime.utcnow() - timedelta(seconds=SHORT_PAPER_REUSE_SECONDS)
+    paper = await db.papers.find_one(
+        {"blueprintKey": key, "$or": [{"complete": True}, {"createdAt": {"$gte": cutoff}}]},
+        {"_id": 0}, sort=[("complete", -1), ("createdAt", -1)]
+    )
+    if paper and paper["complete"]:
+        remember_paper(paper)
+    return paper
+
+async def assemble_paper(blueprint: PaperBlueprint, key: str) -> dict:
+    """Allocate the blueprint against the catalog counts and draw every cell in one aggregation"""
+    available = {}
+    for entry in await catalog_cache.get(db.question_catalog):
+        cell = (entry["subject"], entry["chapter"], entry["difficulty"])
+        available[cell] = available.get(cell, 0) + entry["count"]
+    cells, sections = allocate_paper(
+        [section.dict() for section in blueprint.sections], blueprint.difficultyMix, available
+    )
+
+    drawn = await sample_question_buckets([QuestionBucket(**cell) for cell in cells], QUESTION_LIST_PROJECTION) if cells else []
+    questions, seen = [], set()
+    for documents in drawn:
+        for q in documents:
+            if q.get("id") not in seen:
+                seen.add(q.get("id"))
+                questions.append(q)
+    # Papers keep subject order (Physics, Chemistry, Biology); questions are shuffled within a section
+    order = {section.subject: i for i, section in enumerate(blueprint.sections)}
+    random.shuffle(questions)
+    questions.sort(key=lambda q: order.get(q["subject"], len(order)))
+
+    for section in sections:
+        section["returned"] = sum(1 for q in questions if q["subject"] == section["subject"])
+    requested = sum(section.questions for section in blueprint.sections)
+    return {
+        "id": str(uuid.uuid4()),
+        "blueprintKey": key,
+        "blueprint": blueprint.dict(),
+        "questions": serialize_question_list(questions),
+        "sections": sections,
+        "totalQuestions": len(questions),
+        # A short paper is only reused briefly, so it is rebuilt once the bank has grown
+        "complete": len(questions) == requested,
+        "createdAt": datetime.utcnow(),
+    }
+
+@api_router.post("/papers/assemble")
+async def get_assembled_paper(blueprint: PaperBlueprint = None, refresh: bool = False):
+    """Full mock paper for a blueprint (NEET pattern by default), shared by everyone using that blueprint version"""
+    blueprint = blueprint or PaperBlueprint()
+    unknown = set(blueprint.difficultyMix) - set(DIFFICULTY_LEVELS)
+    if unknown or not any(weight > 0 for weight in blueprint.difficultyMix.values()):
+        raise HTTPException(status_code=422, detail="difficultyMix needs positive weights for easy, medium and/or hard")
+    key = blueprint_key(blueprint.dict())
+
+    paper = None if refresh else await find_paper(key)
+    if paper is None:
+        lock = _paper_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                paper = None if refresh else await find_paper(key)
+                if paper is None:
+                    paper = await assemble_paper(blueprint, key)
+                    await db.papers.insert_one(dict(paper))
+                    if paper["complete"]:
+                        remember_paper(paper)
+        finally:
+            if not lock.locked():
+                _paper_locks.pop(key, None)
+    return paper
+
+@api_router.get("/papers/{paper_id}")
+async def get_paper(paper_id: str):
+    """An assembled paper; answers are fetched with POST /questions/answers after submission"""
+    paper = await db.papers.find_one({"id": paper_id}, {"_id": 0})
+    if not paper:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    return paper
+
+
+# ==================== Live Test Routes ====================
+
+live_attempts = LiveAttempts()
+
+@api_router.post("/tests/attempts")
+async def start_test_attempt(request: AttemptCreate):
+    """Start a timed attempt of an assembled paper, or resume the user's unfinished one"""
+    existing = await db.test_attempts.find_one(
+        {"userId": request.userId, "paperId": request.paperId, "status": "in_progress"}, {"_id": 0}
+    )
+    if existing:
+        return existing
+    paper = await db.papers.find_one({"id": request.paperId}, {"_id": 0, "totalQuestions": 1})
+    if not paper:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    now = datetime.utcnow()
+    attempt = {
+        "id": str(uuid.uuid4()),
+        "userId": request.userId,
+        "paperId": request.paperId,
+        "answers": new_attempt_answers(paper["totalQuestions"]),
+        "marked": [],
+        "current": 0,
+        "version": 0,
+        "status": "in_progress",
+        "startedAt": now,
+        "deadline": now + timedelta(minutes=request.durationMinutes),
+        "updatedAt": now,
+        "writes": 1,
+        "result": None,
+    }
+    await db.test_attempts.insert_one(dict(attempt))
+    return attempt
+
+@api_router.get("/tests/attempts/{attempt_id}")
+async def get_test_attempt(attempt_id: str):
+    """Saved state of an attempt (live state if it is connected to this worker)"""
+    writer = live_attempts.writers.get(attempt_id)
+    attempt = await db.test_attempts.find_one({"id": attempt_id}, {"_id": 0})
+    if not attempt:
+        raise HTTPException(status_code=404, detail="Attempt not found")
+    return {**attempt, **writer.snapshot()} if writer else attempt
+
+async def submit_attempt(writer: AttemptWriter) -> dict:
+    """Save, grade and close an attempt; repeated submissions return the first result"""
+    await writer.flush()
+    attempt = await db.test_attempts.find_one({"id": writer.id}, {"_id": 0})
+    if attempt["status"] == "submitted":
+        return attempt["result"]
+    paper = await db.papers.find_one({"id": attempt["paperId"]}, {"_id": 0, "questions.id": 1})
+    ids = [q["id"] for q in paper["questions"]]
+    submitted_at = datetime.utcnow()
+    sheet = AnswerSheet(
+        userId=attempt["userId"],
+        answers=answers_by_question(attempt["answers"], ids),
+        timeSpent=int((min(submitted_at, attempt["deadline"]) - attempt["startedAt"]).total_seconds()),
+    )
+    [result], _ = await grade_answer_sheets(ids, [sheet], attempt["paperId"], save=True)
+    updated = await db.test_attempts.update_one(
+        {"id": writer.id, "status": "in_progress"},
+        {"$set": {"status": "submitted", "submittedAt": submitted_at, "result": result}, "$inc": {"writes": 1}},
+    )
+    if not updated.modified_count:
+        # Submitted concurrently from another connection; keep its result and drop this grading
+        await db.mock_tests.delete_one({"id": result["testId"]})
+        return (await db.test_attempts.find_one({"id": writer.id}, {"_id": 0, "result": 1}))["result"]
+    writer.writes += 1
+    live_attempts.stats["submitted"] += 1
+    return result
+
+async def send_ticks(websocket: WebSocket, writer: AttemptWriter):
+    while True:
+        await asyncio.sleep(LIVE_TICK_SECONDS)
+        await websocket.send_json({
+            "type": "tick", "remainingSeconds": writer.remaining_seconds(), "savedVersion": writer.saved_version
+        })
+
+@api_router.websocket("/tests/attempts/{attempt_id}/live")
+async def live_test_attempt(websocket: WebSocket, attempt_id: str):
+    """
+    Live attempt session. Client events: {"type": "answer", "index": i, "choice": c | null},
+    {"type": "mark", "index": i, "marked": bool}, {"type": "navigate", "index": i}, {"type": "submit"}.
+    Server messages: "state" on connect, "tick" every LIVE_TICK_SECONDS, "error", and
+    "submitted" with the result (also sent when time runs out).
+    """
+    attempt = await db.test_attempts.find_one({"id": attempt_id}, {"_id": 0})
+    await websocket.accept()
+    if not attempt:
+        await websocket.close(code=4404, reason="Attempt not found")
+        return
+    if attempt["status"] != "in_progress":
+        await websocket.send_json({"type": "submitted", "result": attempt["result"]})
+        await websocket.close()
+        return
+
+    writer = live_attempts.open(db.test_attempts, attempt)
+    ticker = asyncio.create_task(send_ticks(websocket, writer))
+    try:
+        await websocket.send_json({"type": "state", **writer.snapshot()})
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.receive_json(), timeout=writer.remaining_seconds())
+            except asyncio.TimeoutError:
+                message = {"type": "submit"}
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "detail": "events must be JSON objects"})
+                continue
+            if message.get("type") == "submit" or writer.remaining_seconds() <= 0:
+                await websocket.send_json({"type": "submitted", "result": await submit_attempt(writer)})
+                await websocket.close()
+                break
+            error = writer.apply(message)
+            if error:
+                await websocket.send_json({"type": "error", "detail": error, "event": message})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        ticker.cancel()
+        # A tick sent to a closed socket raises; collect it rather than leave it unretrieved
+        await asyncio.gather(ticker, return_exceptions=True)
+        await live_attempts.release(writer)
+
+
+# ==================== Attempt Event Routes ====================
+
+@api_router.post("/attempts/events", status_code=202)
+async def ingest_attempt_events(batch: AttemptEventBatch):
+    """Queue per-question attempt events; they are written in the background in large batches"""
+    # All or nothing, so a client can safely resend a rejected batch
+    if attempt_events.room() < len(batch.events):
+        raise HTTPException(status_code=503, detail="Attempt ingestion is busy, retry shortly",
+                            headers={"Retry-After": "1"})
+    now = datetime.utcnow()
+    for event in batch.events:
+        attempt_events.put({
+            "ts": min(utc_naive(event.at), now) if event.at else now,
+            "meta": {"questionId": event.questionId},
+            "userId": batch.userId,
+            "sessionId": batch.sessionId,
+            "choice": event.choice,
+            "correct": event.correct,
+            "timeMs": event.timeMs,
+        })
+    return {"accepted": len(batch.events)}
+
+def utc_naive(moment: datetime) -> datetime:
+    """Stored timestamps are naive UTC; convert client times that carry an offset"""
+    return moment.astimezone(timezone.utc).replace(tzinfo=None) if moment.tzinfo else moment
+
+async def ensure_question_attempts_collection():
+    """question_attempts is a time-series collection (MongoDB 5.0+) bucketed per question"""
+    if not await db.list_collection_names(filter={"name": "question_attempts"}):
+        try:
+            await db.create_collection(
+                "question_attempts",
+                timeseries={"timeField": "ts", "metaField": "meta", "granularity": "hours"},
+                expireAfterSeconds=QUESTION_ATTEMPT_RETENTION_DAYS * 86400,
+            )
+        except CollectionInvalid:
+            pass  # created by another worker meanwhile
+        except Exception as e:
+            logger.warning(f"Time-series collections unavailable, using a regular question_attempts collection: {e!r}")
+            await ensure_ttl_index(db, "question_attempts", "ts", QUESTION_ATTEMPT_RETENTION_DAYS)
+    await db.question_attempts.create_index([("meta.questionId", 1), ("ts", 1)])
+    try:
+        # For the weak-area job, which reads a chunk of students at a time
+        await db.question_attempts.create_index([("userId", 1), ("ts", 1)])
+    except OperationFailure as e:
+        logger.warning(f"No userId index on question_attempts (time-series needs MongoDB 6.0+): {e}")
+
+
 # ==================== Syllabus Progress Routes ====================
 
 @api_router.post("/syllabus/progress")
@@ -406,16 +1048,14 @@ async def update_syllabus_progress(progress: SyllabusProgress):
 @api_router.get("/syllabus/progress/{user_id}")
 async def get_syllabus_progress(user_id: str):
     """Get all syllabus progress for a user"""
-    progress = await db.syllabus_progress.find({"userId": user_id}).to_list(1000)
+    progress = await db.syllabus_progress.find({"userId": user_id}, {"_id": 0}).to_list(1000)
     return progress
 
 
 # ==================== Pre-generated Questions Routes ====================
 
-@api_router.get("/questions/pregenerated")
-async def get_pregenerated_questions(subject: str, chapter: str, count: int = 10):
-    """Get pre-generated questions or generate if not available"""
-    # Check for existing pre-generated questions
+async def find_pregenerated(subject: str, chapter: str, count: int) -> Optional[List[dict]]:
+    """Stored pre-generated questions for a chapter, if there are at least `count`"""
     existing = await db.pregenerated_questions.find_one({
         "subject": subject,
         "chapter": chapter,
@@ -423,11 +1063,12 @@ async def get_pregenerated_questions(subject: str, chapter: str, count: int = 10
     })
     
     if existing and len(existing.get("questions", [])) >= count:
-        return {"questions": existing["questions"][:count]}
-    
-    # Generate new questions
-    try:
-        prompt = f"""Generate {count} NEET-level MCQ questions from {subject}, chapter: {chapter}.
+        return existing["questions"][:count]
+    return None
+
+async def build_pregenerated_questions(subject: str, chapter: str, count: int) -> List[dict]:
+    """Generate and store questions for a chapter (request path and job worker)"""
+    prompt = f"""Generate {count} NEET-level MCQ questions from {subject}, chapter: {chapter}.
         
 Return as a JSON array in this exact format:
 [
@@ -449,23 +1090,33 @@ Important:
 - Mix difficulty levels
 - Return ONLY valid JSON array"""
 
-        response = await generate_with_ai(prompt)
-        
-        import json
-        questions_data = json.loads(response)
-        questions = [Question(**q).dict() for q in questions_data]
-        
-        # Save to database for future use
-        pregenerated = PreGeneratedQuestions(
-            subject=subject,
-            chapter=chapter,
-            questions=questions,
-            questionCount=len(questions)
-        )
-        await db.pregenerated_questions.insert_one(pregenerated.dict())
-        
-        return {"questions": questions}
-        
+    response = await generate_with_ai(prompt, route="pregenerated")
+    questions = parse_ai_questions(response)
+    
+    # Save to database for future use
+    pregenerated = PreGeneratedQuestions(
+        subject=subject,
+        chapter=chapter,
+        questions=questions,
+        questionCount=len(questions)
+    )
+    await db.pregenerated_questions.insert_one(pregenerated.dict())
+    
+    return questions
+
+@api_router.get("/questions/pregenerated", dependencies=[Depends(rate_limiter.dependency("pregenerated"))])
+async def get_pregenerated_questions(subject: str, chapter: str, count: int = 10,
+                                     view: str = Query("full", pattern="^(full|list)$")):
+    """Get pre-generated questions or generate if not available"""
+    serialize = serialize_question_list if view == "list" else list
+    # Check for existing pre-generated questions
+    existing = await find_pregenerated(subject, chapter, count)
+    if existing is not None:
+        return {"questions": serialize(existing)}
+    
+    # Generate new questions
+    try:
+        return {"questions": serialize(await build_pregenerated_questions(subject, chapter, count))}
     except Exception as e:
         logging.error(f"Failed to generate questions: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate questions")
@@ -475,7 +1126,7 @@ Important:
 
 @api_router.post("/questions/populate-samples")
 async def populate_sample_questions():
-    """Populate database with 100 sample NEET questions"""
+    """Populate database with sample NEET questions (already stored questions are skipped)"""
     sample_questions = [
         # Physics - Laws of Motion (10 questions)
         {
@@ -974,68 +1625,340 @@ async def populate_sample_questions():
         },
     ]
     
-    # Add more questions to reach 100
-    for i in range(70):  # Add 70 more variations
-        base_q = sample_questions[i % 29]
-        new_q = base_q.copy()
-        new_q["question"] = f"{base_q['question']} (Variation {i+1})"
-        sample_questions.append(new_q)
+    # Insert into database in unordered batches; the contentHash index rejects repeats
+    report = await import_questions(db.questions, enumerate(sample_questions, start=1), Question,
+                                    catalog=db.question_catalog)
+    catalog_cache.invalidate()
+    inserted_count = report.inserted
+    
+    return {
+        "message": f"Successfully populated {inserted_count} sample questions",
+        "count": inserted_count,
+        "duplicates": report.duplicates
+    }
+
+
+@api_router.post("/questions/import")
+async def import_question_bank(file: UploadFile = File(...), format: Optional[str] = None,
+                               nearDuplicateThreshold: Optional[float] = None):
+    """Stream an NDJSON or CSV question bank into the questions collection"""
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        rows = iter_rows(stream, detect_format(file.filename, format))
+        report = await import_questions(db.questions, rows, Question, near_duplicate_threshold=nearDuplicateThreshold,
+                                        catalog=db.question_catalog)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        stream.detach()
+        catalog_cache.invalidate()
+    
+    logging.info(f"Imported question bank {file.filename}: {report.to_dict()}")
+    return report.to_dict()
+
+
+# ==================== Question Catalog Routes ====================
+
+catalog_cache = CatalogCache()
+
+@api_router.get("/questions/catalog")
+async def get_question_catalog(subject: Optional[str] = None, chapter: Optional[str] = None):
+    """Question counts per subject and chapter, by normalized difficulty and topic"""
+    return summarize(await catalog_cache.get(db.question_catalog), subject, chapter)
+
+@api_router.post("/questions/catalog/rebuild")
+async def rebuild_question_catalog():
+    """Recount the question bank, e.g. after writing to it outside the API"""
+    result = await rebuild_catalog(db.questions, db.question_catalog)
+    catalog_cache.invalidate()
+    return result
+
+
+# ==================== Question Search Routes ====================
+
+SEARCH_MAX_PAGE_SIZE = 50
+
+@api_router.get("/questions/search")
+async def search_questions(
+    q: str = Query(..., min_length=2),
+    subject: Optional[str] = None,
+    chapter: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    pageSize: int = Query(20, ge=1, le=SEARCH_MAX_PAGE_SIZE)
+):
+    """Full-text search over the question bank, ranked by text relevance"""
+    query = {"$text": {"$search": q}}
+    if subject:
+        query["subject"] = subject
+    if chapter:
+        query["chapter"] = chapter
+    if difficulty:
+        level = difficulty_level(difficulty)
+        if level is None:
+            raise HTTPException(status_code=400, detail=f"Unknown difficulty: {difficulty}")
+        query["difficulty"] = {"$in": DIFFICULTY_LEVELS[level]}
     
-    # Insert into database
-    inserted_count = 0
-    for q_data in sample_questions:
-        question = Question(**q_data)
-        await db.questions.insert_one(question.dict())
-        inserted_count += 1
+    # Fetch one extra row instead of counting every match
+    projection = {"_id": 0, "lshBands": 0, "contentHash": 0, "score": {"$meta": "textScore"}}
+    cursor = db.questions.find(query, projection).sort([("score", {"$meta": "textScore"})])
+    results = await cursor.skip((page - 1) * pageSize).limit(pageSize + 1).to_list(pageSize + 1)
     
-    return {"message": f"Successfully populated {inserted_count} sample questions", "count": inserted_count}
+    return {
+        "results": [
+            {**Question(**r).dict(), "score": round(r["score"], 3)} for r in results[:pageSize]
+        ],
+        "page": page,
+        "pageSize": pageSize,
+        "hasMore": len(results) > pageSize
+    }
+
+
+# ==================== Question Deduplication Routes ====================
+
+@api_router.post("/questions/near-duplicates")
+async def check_near_duplicates(candidate: QuestionCandidate, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+    """Find stored questions that are exact or near duplicates of a candidate question"""
+    candidate_dict = candidate.dict()
+    exact = await db.questions.find_one({"contentHash": content_hash(candidate_dict)}, {"_id": 0, "id": 1})
+    matches = await find_near_duplicates(db.questions, candidate_dict, threshold)
+    return {"exactDuplicateId": exact["id"] if exact else None, "nearDuplicates": matches}
+
+@api_router.post("/questions/dedup")
+async def dedup_questions(apply: bool = False, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+    """Cluster the question bank by near-duplicate similarity; delete duplicates when apply=true"""
+    result = await dedup_collection(db.questions, threshold, apply, catalog=db.question_catalog)
+    if apply:
+        catalog_cache.invalidate()
+    logging.info(f"Question dedup: {result['clusters']} clusters, {result['duplicates']} duplicates, applied={apply}")
+    return result
 
 
 # ==================== AI Buddy Routes ====================
 
-@api_router.post("/ai/buddy")
-async def ai_buddy_chat(userId: str, message: str):
+BUDDY_CONTEXT_TOKEN_BUDGET = int(os.environ.get('BUDDY_CONTEXT_TOKEN_BUDGET', 800))
+BUDDY_CONTEXT_MAX_TURNS = int(os.environ.get('BUDDY_CONTEXT_MAX_TURNS', 20))
+BUDDY_SUMMARY_MAX_WORDS = 120
+
+buddy_context_stats = {"answers": 0, "promptTokensTotal": 0, "promptTokensMax": 0, "summaries": 0}
+_summarizing_sessions = set()
+_background_tasks = set()
+BACKGROUND_TASK_DRAIN_SECONDS = 10
+
+def spawn_background(coro):
+    """Run a coroutine after the response without letting the task be garbage collected"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def load_buddy_context(user_id: str, session_id: str):
+    """Return (summary, recent turns oldest first, turns that fell out of the token window)"""
+    session = await db.chat_sessions.find_one({"id": session_id, "userId": user_id}, {"_id": 0}) or {}
+    summary = session.get("summary", "")
+    since = session.get("summarizedUntil")
+    
+    query = {"userId": user_id, "sessionId": session_id}
+    if since:
+        query["createdAt"] = {"$gt": since}
+    projection = {"_id": 0, "id": 1, "message": 1, "response": 1, "createdAt": 1}
+    turns = await db.chat_messages.find(query, projection).sort("createdAt", -1).to_list(BUDDY_CONTEXT_MAX_TURNS)
+    pending = chat_writer.pending(
+        lambda chat: chat["userId"] == user_id and chat.get("sessionId") == session_id
+        and (since is None or chat["createdAt"] > since)
+    )
+    turns = sorted({t["id"]: t for t in turns + pending}.values(), key=lambda t: t["createdAt"], reverse=True)
+    
+    # Newest turns first until the budget left after the summary is spent
+    budget = BUDDY_CONTEXT_TOKEN_BUDGET - estimate_tokens(summary)
+    window = []
+    for turn in turns:
+        cost = estimate_tokens(turn["message"]) + estimate_tokens(turn["response"])
+        if cost > budget:
+            break
+        window.append(turn)
+        budget -= cost
+    return summary, list(reversed(window)), turns[len(window):]
+
+async def summarize_buddy_session(user_id: str, session_id: str, previous_summary: str, since, until):
+    """Fold turns that left the context window into the session's rolling summary"""
+    try:
+        query = {"userId": user_id, "sessionId": session_id, "createdAt": {"$lte": until}}
+        if since:
+            query["createdAt"]["$gt"] = since
+        turns = await db.chat_messages.find(query, {"_id": 0, "message": 1, "response": 1}).sort("createdAt", 1).to_list(200)
+        transcript = "\n".join(f"Student: {t['message']}\nTutor: {t['response']}" for t in turns)
+        
+        prompt = f"""Update the running summary of a NEET tutoring conversation.
+
+Previous summary: {previous_summary or "None"}
+
+New turns:
+{transcript}
+
+Write at most {BUDDY_SUMMARY_MAX_WORDS} words covering the topics discussed, the student's doubts and what was already explained."""
+        
+        summary = await generate_with_ai(prompt, "You summarize tutoring conversations concisely.", route="summary", user_id=user_id)
+        now = datetime.utcnow()
+        await db.chat_sessions.update_one(
+            {"id": session_id, "userId": user_id},
+            {"$set": {"summary": summary.strip(), "summarizedUntil": until, "updatedAt": now},
+             "$setOnInsert": {"createdAt": now}},
+            upsert=True
+        )
+        buddy_context_stats["summaries"] += 1
+    except Exception as e:
+        logging.error(f"Failed to summarize buddy session {session_id}: {e}")
+    finally:
+        _summarizing_sessions.discard(session_id)
+
+@api_router.post("/ai/buddy", dependencies=[Depends(rate_limiter.dependency("buddy"))])
+async def ai_buddy_chat(userId: str, message: str, sessionId: Optional[str] = None):
     """AI Buddy - Conversational NEET tutor"""
+    sessionId = sessionId or str(uuid.uuid4())
     try:
-        prompt = f"""You are an expert NEET tutor. A student asks: "{message}"
+        summary, window, overflow = await load_buddy_context(userId, sessionId)
+        
+        context = ""
+        if summary:
+            context += f"\n\nEarlier in this conversation: {summary}"
+        if window:
+            history = "\n".join(f"Student: {t['message']}\nTutor: {t['response']}" for t in window)
+            context += f"\n\nRecent conversation:\n{history}"
+        
+        prompt = f"""You are an expert NEET tutor.{context}
+
+A student asks: "{message}"
 
 Provide a clear, concise answer:
 - If it's a concept question, explain with NCERT reference
 - If it's a problem, provide step-by-step solution
 - If it's doubt, clarify with examples
+- If it's a follow-up, build on the conversation above instead of repeating it
 - Keep it under 150 words
 - Be encouraging and supportive"""
 
-        response = await generate_with_ai(prompt, "You are a friendly NEET tutor helping students prepare for medical entrance exams.")
+        # Serve repeated doubts from the similarity cache; follow-ups depend on context so skip it
+        hit = answer_cache.lookup(message) if not context else None
+        if hit:
+            response = hit.answer
+            record_llm_call("buddy", userId, prompt=message, response=response, cached=True)
+        else:
+            charged = await consume_llm_quota(userId, "buddy")
+            try:
+                response = await generate_with_ai(prompt, "You are a friendly NEET tutor helping students prepare for medical entrance exams.",
+                                                  route="buddy", user_id=userId)
+            except Exception:
+                await refund_llm_quota(userId, "buddy", charged)
+                raise
+            if not context:
+                answer_cache.add(message, response)
+            prompt_tokens = estimate_tokens(prompt)
+            buddy_context_stats["answers"] += 1
+            buddy_context_stats["promptTokensTotal"] += prompt_tokens
+            buddy_context_stats["promptTokensMax"] = max(buddy_context_stats["promptTokensMax"], prompt_tokens)
+        
+        # Summarize turns that no longer fit the window, off the response path
+        if overflow and sessionId not in _summarizing_sessions:
+            _summarizing_sessions.add(sessionId)
+            session = await db.chat_sessions.find_one({"id": sessionId, "userId": userId}, {"_id": 0}) or {}
+            spawn_background(summarize_buddy_session(
+                userId, sessionId, summary, session.get("summarizedUntil"), overflow[0]["createdAt"]
+            ))
         
         # Save chat history
         chat = ChatMessage(
             userId=userId,
+            sessionId=sessionId,
             message=message,
-            response=response
+            response=response,
+            cached=hit is not None
         )
-        await db.chat_messages.insert_one(chat.dict())
+        chat_writer.put(chat.dict())
         
-        return {"response": response}
+        return {"response": response, "cached": hit is not None, "sessionId": sessionId}
+    except HTTPException as e:
+        if e.status_code == 429:
+            raise
+        return {
+            "response": "I'm having trouble processing your question. Could you please rephrase it?",
+            "sessionId": sessionId
+        }
     except Exception as e:
-        return {"response": "I'm having trouble processing your question. Could you please rephrase it?"}
+        return {
+            "response": "I'm having trouble processing your question. Could you please rephrase it?",
+            "sessionId": sessionId
+        }
+
+@api_router.post("/ai/buddy/cache/threshold")
+async def set_buddy_cache_threshold(threshold: float = Query(..., gt=0, le=1)):
+    """Tune the similarity needed to serve a cached answer (this worker only)"""
+    answer_cache.threshold = threshold
+    return answer_cache.stats()
 
 @api_router.get("/ai/buddy/history/{user_id}")
-async def get_chat_history(user_id: str):
-    """Get chat history for AI Buddy"""
-    messages = await db.chat_messages.find({"userId": user_id}).sort("createdAt", -1).to_list(50)
+async def get_chat_history(user_id: str, sessionId: Optional[str] = None, includeArchived: bool = False):
+    """Get chat history for AI Buddy, optionally for a single conversation"""
+    query = {"userId": user_id}
+    if sessionId:
+        query["sessionId"] = sessionId
+    messages = await db.chat_messages.find(query, {"_id": 0}).sort("createdAt", -1).to_list(50)
+    
+    # Include messages still waiting in the write-behind queue
+    pending = chat_writer.pending(
+        lambda chat: chat["userId"] == user_id and (not sessionId or chat.get("sessionId") == sessionId)
+    )
+    if pending:
+        messages = sorted(pending + messages, key=lambda chat: chat["createdAt"], reverse=True)[:50]
+    
+    # Older conversations live in monthly archive buckets
+    if includeArchived and len(messages) < 50:
+        messages += await read_archived(
+            db, "chat_messages", user_id, 50 - len(messages),
+            predicate=lambda chat: not sessionId or chat.get("sessionId") == sessionId
+        )
     return messages
 
 
 # ==================== Study Plan Routes ====================
 
-@api_router.post("/study-plan/generate")
-async def generate_study_plan(userId: str, dailyHours: int, duration: int, prepLevel: str, weakSubjects: List[str] = []):
-    """Generate personalized AI study plan"""
-    try:
-        weak_text = f"Focus more on: {', '.join(weakSubjects)}" if weakSubjects else ""
-        
-        prompt = f"""Create a {duration}-day NEET study plan for a {prepLevel} student who can study {dailyHours} hours daily. {weak_text}
+STUDY_PLAN_HOUR_BUCKETS = (2, 4, 6, 8, 10, 12)
+STUDY_PLAN_TEMPLATE_CACHE_SIZE = int(os.environ.get('STUDY_PLAN_TEMPLATE_CACHE_SIZE', 256))
+NEET_SUBJECTS = ("Physics", "Chemistry", "Biology")
+
+study_plan_templates: "OrderedDict[str, dict]" = OrderedDict()  # in-process LRU by template key
+_template_locks = {}
+study_plan_template_stats = {"memoryHits": 0, "dbHits": 0, "generated": 0}
+
+def study_plan_template_key(duration: int, dailyHours: int, prepLevel: str, weakSubjects: List[str]) -> tuple:
+    """Normalized parameters shared by every request that can reuse the same plan"""
+    hours = max([b for b in STUDY_PLAN_HOUR_BUCKETS if b <= dailyHours] or [STUDY_PLAN_HOUR_BUCKETS[0]])
+    weak = sorted({s.strip().title() for s in weakSubjects if s.strip()})
+    return f"{duration}d:{hours}h:{prepLevel.strip().lower()}:{'+'.join(weak)}", hours, weak
+
+def remember_study_plan_template(template: dict):
+    study_plan_templates[template["key"]] = template
+    study_plan_templates.move_to_end(template["key"])
+    while len(study_plan_templates) > STUDY_PLAN_TEMPLATE_CACHE_SIZE:
+        study_plan_templates.popitem(last=False)
+
+async def find_study_plan_template(key: str) -> Optional[dict]:
+    template = study_plan_templates.get(key)
+    if template:
+        study_plan_templates.move_to_end(key)
+        study_plan_template_stats["memoryHits"] += 1
+        return template
+    template = await db.study_plan_templates.find_one({"key": key}, {"_id": 0})
+    if template:
+        study_plan_template_stats["dbHits"] += 1
+        remember_study_plan_template(template)
+    return template
+
+async def generate_study_plan_template(key: str, hours: int, duration: int, prepLevel: str,
+                                       weakSubjects: List[str], userId: str) -> dict:
+    weak_text = f"Focus more on: {', '.join(weakSubjects)}" if weakSubjects else ""
+    
+    prompt = f"""Create a {duration}-day NEET study plan for a {prepLevel} student who can study {hours} hours daily. {weak_text}
 
 Return as JSON:
 {{
@@ -1045,7 +1968,7 @@ Return as JSON:
       "day": 1,
       "subjects": ["Physics", "Chemistry", "Biology"],
       "topics": ["Topic 1", "Topic 2"],
-      "hours": {dailyHours},
+      "hours": {hours},
       "goals": ["Goal 1", "Goal 2"]
     }}
   ],
@@ -1055,46 +1978,220 @@ Return as JSON:
 
 Make it realistic and NCERT-focused."""
 
-        response = await generate_with_ai(prompt, "You are an expert NEET study planner.")
-        
-        import json
-        plan_data = json.loads(response)
-        
-        study_plan = StudyPlan(
-            userId=userId,
-            title=plan_data.get("title", f"{duration}-Day NEET Study Plan"),
-            duration=duration,
-            dailyHours=dailyHours,
-            subjects=["Physics", "Chemistry", "Biology"],
-            plan=plan_data
-        )
-        
-        await db.study_plans.insert_one(study_plan.dict())
-        
-        return study_plan
-        
+    response = await generate_with_ai(prompt, "You are an expert NEET study planner.", route="study_plan", user_id=userId)
+    plan_data = json.loads(response)
+    
+    template = {
+        "id": str(uuid.uuid4()),
+        "key": key,
+        "title": plan_data.get("title", f"{duration}-Day NEET Study Plan"),
+        "duration": duration,
+        "dailyHours": hours,
+        "prepLevel": prepLevel,
+        "weakSubjects": weakSubjects,
+        "plan": plan_data,
+        "createdAt": datetime.utcnow()
+    }
+    try:
+        await db.study_plan_templates.insert_one(dict(template))
+        study_plan_template_stats["generated"] += 1
+    except DuplicateKeyError:
+        # Another worker stored the same combination first; use theirs
+        template = await db.study_plan_templates.find_one({"key": key}, {"_id": 0})
+    return template
+
+async def get_study_plan_template(duration: int, dailyHours: int, prepLevel: str, weakSubjects: List[str],
+                                  userId: str) -> dict:
+    """Cached template for the normalized parameters, generating it once if missing"""
+    key, hours, weak = study_plan_template_key(duration, dailyHours, prepLevel, weakSubjects)
+    template = await find_study_plan_template(key)
+    if template:
+        return template
+    # Single flight: concurrent requests for a new combination wait for one generation
+    lock = _template_locks.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            template = await find_study_plan_template(key)
+            if template is None:
+                template = await generate_study_plan_template(key, hours, duration, prepLevel, weak, userId)
+                remember_study_plan_template(template)
+            return template
+    finally:
+        if not lock.locked():
+            _template_locks.pop(key, None)
+
+def personalize_study_plan(plan: dict, template: dict) -> StudyPlan:
+    """Hydrate a stored per-user plan from its template"""
+    plan_data = dict(template["plan"])
+    if plan["dailyHours"] != template["dailyHours"]:
+        plan_data["dailySchedule"] = [
+            {**day, "hours": plan["dailyHours"]} for day in plan_data.get("dailySchedule", [])
+        ]
+    return StudyPlan(**{**plan, "title": template["title"], "plan": plan_data})
+
+async def build_study_plan(userId: str, dailyHours: int, duration: int, prepLevel: str, weakSubjects: List[str]) -> StudyPlan:
+    """Create a user's study plan from the shared template (request path and job worker)"""
+    template = await get_study_plan_template(duration, dailyHours, prepLevel, weakSubjects, userId)
+    
+    # Only the reference and the user's own parameters are stored per user
+    stored = {
+        "id": str(uuid.uuid4()),
+        "userId": userId,
+        "templateId": template["id"],
+        "title": template["title"],
+        "duration": duration,
+        "dailyHours": dailyHours,
+        "subjects": list(NEET_SUBJECTS),
+        "createdAt": datetime.utcnow()
+    }
+    await db.study_plans.insert_one(dict(stored))
+    
+    return personalize_study_plan(stored, template)
+
+async def consume_study_plan_quota(userId: str, duration: int, dailyHours: int, prepLevel: str,
+                                   weakSubjects: List[str]) -> Optional[str]:
+    """Template hits cost no model call, so only new combinations count against the quota"""
+    key, _, _ = study_plan_template_key(duration, dailyHours, prepLevel, weakSubjects)
+    if await find_study_plan_template(key):
+        record_llm_call("study_plan", userId, cached=True)
+        return None
+    return await consume_llm_quota(userId, "study_plan")
+
+@api_router.post("/study-plan/generate", dependencies=[Depends(rate_limiter.dependency("study_plan"))])
+async def generate_study_plan(userId: str, dailyHours: int, duration: int, prepLevel: str, weakSubjects: List[str] = []):
+    """Generate personalized AI study plan"""
+    charged = await consume_study_plan_quota(userId, duration, dailyHours, prepLevel, weakSubjects)
+    try:
+        return await build_study_plan(userId, dailyHours, duration, prepLevel, weakSubjects)
     except Exception as e:
         logging.error(f"Failed to generate study plan: {e}")
+        await refund_llm_quota(userId, "study_plan", charged)
         raise HTTPException(status_code=500, detail="Failed to generate study plan")
 
 @api_router.get("/study-plan/{user_id}")
 async def get_study_plans(user_id: str):
     """Get all study plans for a user"""
-    plans = await db.study_plans.find({"userId": user_id}).sort("createdAt", -1).to_list(10)
-    return [StudyPlan(**plan) for plan in plans]
+    plans = await db.study_plans.find({"userId": user_id}, {"_id": 0}).sort("createdAt", -1).to_list(10)
+    
+    # Plans created before templates carry their own copy
+    template_ids = list({p["templateId"] for p in plans if p.get("templateId")})
+    templates = {}
+    if template_ids:
+        async for template in db.study_plan_templates.find({"id": {"$in": template_ids}}, {"_id": 0}):
+            templates[template["id"]] = template
+    return [
+        personalize_study_plan(plan, templates[plan["templateId"]]) if plan.get("templateId") in templates
+        else StudyPlan(**plan)
+        for plan in plans if "plan" in plan or plan.get("templateId") in templates
+    ]
 
 
-# ==================== Progress Analytics Routes ====================
+# ==================== Job Routes ====================
 
-@api_router.get("/analytics/{user_id}")
-async def get_user_analytics(user_id: str):
-    """Get comprehensive analytics for user"""
-    # Get all practice sessions
-    practice_sessions = await db.practice_sessions.find({"userId": user_id}).to_list(1000)
-    
-    # Get all tests
-    tests = await db.mock_tests.find({"userId": user_id}).to_list(1000)
+async def run_study_plan_job(payload: dict) -> dict:
+    return (await build_study_plan(**{k: v for k, v in payload.items() if k != "quotaDay"})).dict()
+
+async def refund_study_plan_job(payload: dict):
+    # Retries share the one charge taken at submit, so it is given back only once every attempt failed
+    await refund_llm_quota(payload["userId"], "study_plan", payload.get("quotaDay"))
+
+async def run_pregenerated_job(payload: dict) -> dict:
+    # Another job may have filled the chapter while this one was queued
+    questions = await find_pregenerated(**payload)
+    if questions is None:
+        questions = await build_pregenerated_questions(**payload)
+    return {"questions": questions}
+
+async def run_archival_job(payload: dict) -> dict:
+    return await run_archival(db, **payload)
+
+async def run_calibration_job(payload: dict) -> dict:
+    # Batches run in a worker thread; the calibration CLI spreads them over processes
+    report = await calibrate(db, **payload)
+    if report["updated"]:
+        catalog_cache.invalidate()
+    return report
+
+async def run_weak_areas_job(payload: dict) -> dict:
+    # A retried job resumes from the checkpoint of the failed attempt
+    return await compute_weak_areas(db, **payload)
+
+job_queue.register("study_plan", run_study_plan_job, on_failure=refund_study_plan_job)
+job_queue.register("pregenerated_questions", run_pregenerated_job)
+job_queue.register("archival", run_archival_job)
+job_queue.register("calibration", run_calibration_job)
+job_queue.register("weak_areas", run_weak_areas_job)
+
+def job_response(job: dict) -> dict:
+    return {
+        "jobId": job["id"],
+        "type": job["type"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "result": job["result"],
+        "error": job["error"],
+        "createdAt": job["createdAt"],
+        "finishedAt": job["finishedAt"]
+    }
+
+@api_router.post("/jobs/study-plan", status_code=202, dependencies=[Depends(rate_limiter.dependency("study_plan"))])
+async def submit_study_plan_job(userId: str, dailyHours: int, duration: int, prepLevel: str, weakSubjects: List[str] = []):
+    """Queue study plan generation; poll GET /jobs/{jobId} for the plan"""
+    charged = await consume_study_plan_quota(userId, duration, dailyHours, prepLevel, weakSubjects)
+    job = await job_queue.submit("study_plan", {
+        "userId": userId,
+        "dailyHours": dailyHours,
+        "duration": duration,
+        "prepLevel": prepLevel,
+        "weakSubjects": weakSubjects,
+        "quotaDay": charged
+    }, user_id=userId)
+    return job_response(job)
+
+@api_router.post("/jobs/pregenerated-questions", status_code=202,
+                 dependencies=[Depends(rate_limiter.dependency("pregenerated"))])
+async def submit_pregenerated_job(subject: str, chapter: str, response: Response, count: int = 10):
+    """Queue question generation for a chapter unless it is already stored"""
+    existing = await find_pregenerated(subject, chapter, count)
+    if existing is not None:
+        response.status_code = 200
+        return {"jobId": None, "type": "pregenerated_questions", "status": "succeeded", "attempts": 0,
+                "result": {"questions": existing}, "error": None, "createdAt": None, "finishedAt": None}
     
+    job = await job_queue.submit(
+        "pregenerated_questions",
+        {"subject": subject, "chapter": chapter, "count": count},
+        dedup_key=f"pregenerated:{subject}:{chapter}:{count}"
+    )
+    return job_response(job)
+
+@api_router.post("/jobs/calibration", status_code=202)
+async def submit_calibration_job(minAttempts: int = Query(CALIBRATION_MIN_ATTEMPTS, ge=1), dryRun: bool = False):
+    """Queue recalibration of question difficulty from attempt events"""
+    job = await job_queue.submit(
+        "calibration", {"min_attempts": minAttempts, "apply": not dryRun}, dedup_key="calibration"
+    )
+    return job_response(job)
+
+@api_router.post("/jobs/weak-areas", status_code=202)
+async def submit_weak_areas_job(restart: bool = False):
+    """Queue the weak-area computation for all users; it also runs nightly"""
+    job = await job_queue.submit("weak_areas", {"restart": restart}, dedup_key="weak_areas")
+    return job_response(job)
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=30)):
+    """Job status and result; with wait > 0 long-polls until the job finishes"""
+    job = await job_queue.wait(job_id, wait) if wait else await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+
+# ==================== Progress Analytics Routes ====================
+
+def compute_analytics(practice_sessions: List[dict], tests: List[dict]) -> dict:
+    """Aggregate practice sessions and mock tests into the analytics payload"""
     # Calculate stats
     total_questions = sum(s.get("questionsAttempted", 0) for s in practice_sessions)
     total_correct = sum(s.get("questionsCorrect", 0) for s in practice_sessions)
@@ -1135,17 +2232,121 @@ async def get_user_analytics(user_id: str):
     }
 
 
-# ==================== Include Router ====================
-app.include_router(api_router)
+@api_router.get("/analytics/{user_id}")
+async def get_user_analytics(user_id: str, includeArchived: bool = False):
+    """Get comprehensive analytics for user"""
+    # Get all practice sessions, oldest first so recentSessions are the latest ones
+    practice_sessions = await db.practice_sessions.find({"userId": user_id}, {"_id": 0}).sort("createdAt", -1).to_list(1000)
+    if includeArchived and len(practice_sessions) < 1000:
+        practice_sessions += await read_archived(db, "practice_sessions", user_id, 1000 - len(practice_sessions))
+    practice_sessions.reverse()
+    
+    # Get all tests
+    tests = await db.mock_tests.find({"userId": user_id}, {"_id": 0}).to_list(1000)
+    
+    return compute_analytics(practice_sessions, tests)
+
+@api_router.get("/analytics/{user_id}/mastery")
+async def get_topic_mastery(user_id: str):
+    """Chapter and topic mastery from the last weak-area run"""
+    mastery = await db.topic_mastery.find_one({"userId": user_id}, {"_id": 0})
+    if mastery is None:
+        raise HTTPException(status_code=404, detail="No mastery computed for this user yet")
+    return mastery
+
+
+# ==================== LLM Usage Routes ====================
+
+@api_router.get("/llm/usage")
+async def get_llm_usage(days: int = Query(7, ge=1, le=90), route: Optional[str] = None):
+    """Model calls, latency and estimated cost per route and day"""
+    since = (datetime.utcnow() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    match = {"day": {"$gte": since}}
+    if route:
+        match["route"] = route
+    rows = await db.llm_calls.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {"day": "$day", "route": "$route"},
+            "calls": {"$sum": {"$cond": ["$cached", 0, 1]}},
+            "cacheHits": {"$sum": {"$cond": ["$cached", 1, 0]}},
+            "errors": {"$sum": {"$cond": ["$ok", 0, 1]}},
+            "fallbacks": {"$sum": {"$cond": ["$fallback", 1, 0]}},
+            "avgLatencyMs": {"$avg": {"$cond": ["$cached", None, "$latencyMs"]}},
+            "maxLatencyMs": {"$max": "$latencyMs"},
+            "promptChars": {"$sum": "$promptChars"},
+            "responseChars": {"$sum": "$responseChars"},
+            "costUsd": {"$sum": "$costUsd"}
+        }},
+        {"$sort": {"_id.day": -1, "costUsd": -1}}
+    ]).to_list(None)
+    return [
+        {**row["_id"], **{k: v for k, v in row.items() if k != "_id"},
+         "avgLatencyMs": round(row["avgLatencyMs"] or 0, 1), "costUsd": round(row["costUsd"], 4)}
+        for row in rows
+    ]
+
+@api_router.get("/llm/usage/users")
+async def get_llm_usage_by_user(days: int = Query(1, ge=1, le=90), route: Optional[str] = None,
+                                limit: int = Query(20, ge=1, le=200)):
+    """Users with the highest estimated model cost"""
+    since = (datetime.utcnow() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    match = {"day": {"$gte": since}, "userId": {"$ne": None}}
+    if route:
+        match["route"] = route
+    rows = await db.llm_calls.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": "$userId",
+            "calls": {"$sum": {"$cond": ["$cached", 0, 1]}},
+            "cacheHits": {"$sum": {"$cond": ["$cached", 1, 0]}},
+            "latencyMs": {"$sum": "$latencyMs"},
+            "costUsd": {"$sum": "$costUsd"}
+        }},
+        {"$sort": {"costUsd": -1}},
+        {"$limit": limit}
+    ]).to_list(None)
+    return [
+        {"userId": row["_id"], "calls": row["calls"], "cacheHits": row["cacheHits"],
+         "latencyMs": round(row["latencyMs"], 1), "costUsd": round(row["costUsd"], 4)}
+        for row in rows
+    ]
+
+@api_router.get("/llm/quota/{user_id}")
+async def get_llm_quota(user_id: str):
+    """Today's quota usage for a user"""
+    counters = await db.llm_quotas.find(
+        {"userId": user_id, "day": datetime.utcnow().strftime("%Y-%m-%d")}, {"_id": 0, "route": 1, "count": 1}
+    ).to_list(None)
+    used = {c["route"]: c["count"] for c in counters}
+    return {
+        route: {"limit": limit, "used": used.get(route, 0), "remaining": max(0, limit - used.get(route, 0))}
+        for route, limit in LLM_DAILY_QUOTAS.items()
+    }
+
+
+# ==================== Metrics Routes ====================
+
+@api_router.get("/metrics")
+async def get_metrics():
+    """In-process counters for this worker"""
+    return {
+        "buddyCache": answer_cache.stats(),
+        "chatWriteBehind": chat_writer.stats(),
+        "llmLedger": llm_ledger.stats(),
+        "attemptEvents": attempt_events.stats(),
+        "rateLimits": rate_limiter.stats(),
+        "jobs": await job_queue.stats(),
+        "liveTests": live_attempts.report(),
+        "studyPlanTemplates": {**study_plan_template_stats, "cached": len(study_plan_templates)},
+        "llm": llm_router.report(),
+        "buddyContext": {
+            **buddy_context_stats,
+            "promptTokensAvg": round(buddy_context_stats["promptTokensTotal"] / buddy_context_stats["answers"], 1)
+            if buddy_context_stats["answers"] else 0
+        }
+    }
 
-# ==================== CORS Middleware ====================
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
 # Configure logging
 logging.basicConfig(
@@ -1154,6 +2355,225 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+
+# ==================== App Lifecycle ====================
+
+def mongo_client_options() -> dict:
+    """Connection pool and timeout settings; total connections = workers x MONGO_MAX_POOL_SIZE"""
+    options = {
+        "maxPoolSize": int(os.environ.get('MONGO_MAX_POOL_SIZE', 50)),
+        "minPoolSize": int(os.environ.get('MONGO_MIN_POOL_SIZE', 0)),
+        "maxIdleTimeMS": int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 300000)),
+        "waitQueueTimeoutMS": int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000)),
+        "serverSelectionTimeoutMS": int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+        "connectTimeoutMS": int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+    }
+    if os.environ.get('MONGO_SOCKET_TIMEOUT_MS'):
+        options["socketTimeoutMS"] = int(os.environ['MONGO_SOCKET_TIMEOUT_MS'])
+    return options
+
+async def create_indexes():
+    await ensure_dedup_indexes(db.questions)
+    await db.questions.create_index("id")
+    await ensure_catalog_indexes(db.question_catalog)
+    await db.questions.create_index([("subject", 1), ("chapter", 1), ("topic", 1)])
+    await db.questions.create_index(
+        [("question", TEXT), ("topic", TEXT), ("chapter", TEXT), ("explanation", TEXT)],
+        weights={"question": 10, "topic": 5, "chapter": 3, "explanation": 1},
+        name="question_text"
+    )
+    await db.chat_messages.create_index([("userId", 1), ("createdAt", -1)])
+    await db.chat_messages.create_index([("userId", 1), ("sessionId", 1), ("createdAt", -1)])
+    await db.chat_sessions.create_index([("id", 1), ("userId", 1)], unique=True)
+    await db.llm_calls.create_index([("day", 1), ("route", 1)])
+    await db.llm_calls.create_index([("userId", 1), ("day", 1)])
+    await db.llm_calls.create_index("createdAt", expireAfterSeconds=LLM_LEDGER_RETENTION_DAYS * 86400)
+    await db.llm_quotas.create_index([("userId", 1), ("route", 1), ("day", 1)], unique=True)
+    await db.llm_quotas.create_index("createdAt", expireAfterSeconds=2 * 86400)
+    await db.study_plan_templates.create_index("key", unique=True)
+    await db.study_plan_templates.create_index("id", unique=True)
+    await db.study_plans.create_index([("userId", 1), ("createdAt", -1)])
+    await db.papers.create_index("id", unique=True)
+    await db.test_attempts.create_index("id", unique=True)
+    await db.test_attempts.create_index([("userId", 1), ("paperId", 1), ("status", 1)])
+    await db.papers.create_index([("blueprintKey", 1), ("createdAt", -1)])
+    await db.jobs.create_index("id", unique=True)
+    await db.jobs.create_index([("status", 1), ("runAfter", 1)])
+    await db.jobs.create_index([("status", 1), ("leaseUntil", 1)])
+    await db.jobs.create_index("activeKey", unique=True, sparse=True)
+    await db.jobs.create_index("finishedAt", expireAfterSeconds=JOB_RETENTION_DAYS * 86400)
+    await db.practice_sessions.create_index([("userId", 1), ("createdAt", -1)])
+    await db.practice_sessions.create_index("createdAt")
+    await db.chat_messages.create_index("createdAt")
+    await ensure_ttl_index(db, "daily_questions", "date", DAILY_QUESTION_TTL_DAYS)
+    await ensure_ttl_index(db, "pregenerated_questions", "createdAt", PREGENERATED_TTL_DAYS)
+    await db.pregenerated_questions.create_index("questions.id")
+    await ensure_archive_indexes(db)
+    await ensure_question_attempts_collection()
+    await ensure_weak_area_indexes(db)
+
+async def warm_answer_cache():
+    # Most recent answers first so the cache keeps the freshest wording of each doubt
+    messages = await db.chat_messages.find(
+        {"cached": {"$ne": True}}, {"_id": 0, "message": 1, "response": 1}
+    ).sort("createdAt", -1).to_list(BUDDY_CACHE_WARM_LIMIT)
+    for chat in reversed(messages):
+        answer_cache.add(chat["message"], chat["response"])
+    logger.info(f"Answer cache warmed with {len(answer_cache.entries)} entries")
+
+async def warm_connection_pool():
+    # Concurrent pings make the pool open connections before traffic arrives
+    connections = min(WARMUP_CONNECTIONS, mongo_client_options()["maxPoolSize"])
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(connections)))
+
+async def warm_study_plan_templates():
+    templates = await db.study_plan_templates.find({}, {"_id": 0}).sort("createdAt", -1).to_list(STUDY_PLAN_TEMPLATE_CACHE_SIZE)
+    for template in reversed(templates):
+        remember_study_plan_template(template)
+
+async def warm_question_catalog():
+    # Backfill once for a question bank that predates the catalog
+    if not await db.question_catalog.find_one({}) and await db.questions.find_one({}, {"_id": 1}):
+        logger.info(f"Question catalog rebuilt: {await rebuild_catalog(db.questions, db.question_catalog)}")
+    await catalog_cache.get(db.question_catalog)
+
+async def warm_llm_integration():
+    load_llm_integration()
+
+WARMUP_CONNECTIONS = int(os.environ.get('WARMUP_CONNECTIONS', 10))
+WARMUP_RETRY_SECONDS = 2.0
+READY_PING_TIMEOUT = 1.0
+WARMUP_STEPS = [
+    ("connections", warm_connection_pool),
+    ("indexes", create_indexes),
+    ("answerCache", warm_answer_cache),
+    ("studyPlanTemplates", warm_study_plan_templates),
+    ("questionCatalog", warm_question_catalog),
+    ("llmIntegration", warm_llm_integration),
+]
+
+async def warm_up(app: FastAPI):
+    """Run the warm-up steps until they all succeed, then start job workers and report ready"""
+    while True:
+        try:
+            for name, step in WARMUP_STEPS:
+                if name in app.state.warmup:
+                    continue
+                started = time.perf_counter()
+                await step()
+                app.state.warmup[name] = round((time.perf_counter() - started) * 1000, 1)
+            break
+        except Exception as e:
+            logger.error(f"Warm-up step failed, retrying in {WARMUP_RETRY_SECONDS}s: {e!r}")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+    await job_queue.start(db.jobs)
+    app.state.schedulers = [asyncio.create_task(schedule_archival()), asyncio.create_task(schedule_weak_areas())]
+    app.state.ready = True
+    logger.info(f"Warm-up finished (ms per step): {app.state.warmup}")
+
+ARCHIVE_INTERVAL_HOURS = float(os.environ.get('ARCHIVE_INTERVAL_HOURS', 24))
+
+async def schedule_archival():
+    """Queue the archival job periodically; the dedup key keeps workers from running it twice at once"""
+    while True:
+        try:
+            await job_queue.submit("archival", {}, dedup_key="archival")
+        except Exception as e:
+            logger.error(f"Failed to schedule archival: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL_HOURS * 3600)
+
+WEAK_AREAS_HOUR_UTC = int(os.environ.get('WEAK_AREAS_HOUR_UTC', 2))
+
+async def schedule_weak_areas():
+    """Queue the weak-area job every night at WEAK_AREAS_HOUR_UTC"""
+    while True:
+        now = datetime.utcnow()
+        next_run = now.replace(hour=WEAK_AREAS_HOUR_UTC, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        await asyncio.sleep((next_run - now).total_seconds())
+        try:
+            await job_queue.submit("weak_areas", {}, dedup_key="weak_areas")
+        except Exception as e:
+            logger.error(f"Failed to schedule weak areas: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the Mongo client and background workers for the lifetime of the app"""
+    global client, db
+    client = app.state.mongo_client or AsyncIOMotorClient(os.environ['MONGO_URL'], **mongo_client_options())
+    db = client[os.environ['DB_NAME']]
+    
+    # Serve /healthz right away; /readyz stays 503 until warm-up completes
+    app.state.ready = False
+    app.state.warmup = {}
+    app.state.schedulers = []
+    await chat_writer.start(db.chat_messages)
+    await llm_ledger.start(db.llm_calls)
+    await attempt_events.start(db.question_attempts)
+    warmup = asyncio.create_task(warm_up(app))
+    try:
+        yield
+    finally:
+        tasks = [warmup, *app.state.schedulers]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await job_queue.stop()
+        # Let in-flight session summaries finish so their writes are not lost
+        if _background_tasks:
+            await asyncio.wait(list(_background_tasks), timeout=BACKGROUND_TASK_DRAIN_SECONDS)
+        await live_attempts.close_all()
+        await chat_writer.stop()
+        await llm_ledger.stop()
+        await attempt_events.stop()
+        client.close()
+
+probe_router = APIRouter()
+
+@probe_router.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@probe_router.get("/readyz")
+async def readyz(request: Request, response: Response):
+    """Readiness: warm-up finished and MongoDB answers a ping"""
+    state = request.app.state
+    ready = state.ready
+    if ready:
+        try:
+            await asyncio.wait_for(client.admin.command("ping"), timeout=READY_PING_TIMEOUT)
+        except Exception:
+            ready = False
+    response.status_code = 200 if ready else 503
+    return {"ready": ready, "warmup": state.warmup}
+
+def create_app(mongo_client=None) -> FastAPI:
+    """
+    Build the ASGI app. Nothing connects until the lifespan starts, so each
+    worker process opens its own pool:
+
+        uvicorn server:create_app --factory --workers 4
+
+    Point liveness probes at /healthz and readiness probes at /readyz.
+    `mongo_client` replaces the client normally created from MONGO_URL.
+    """
+    app = FastAPI(lifespan=lifespan)
+    app.state.mongo_client = mongo_client
+    app.state.ready = False
+    app.state.warmup = {}
+    app.state.schedulers = []
+    app.include_router(api_router)
+    app.include_router(probe_router)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
+
+# `uvicorn server:app` keeps working
+app = create_app()
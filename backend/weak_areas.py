@@ -0,0 +1,269 @@
+"""
+Topic mastery and weak areas of every student, computed in bulk.
+
+Users are read in chunks of `chunk_users`, ordered by id. For each chunk the
+main process aggregates the students' practice sessions (per chapter) and
+attempt events (per question). The pool then turns these into mastery per
+chapter and per topic, with the same classification the app shows: accuracy
+>= 70% Strong, >= 40% Needs Revision, otherwise Weak. Practice sessions only
+record a chapter, so they count towards chapter mastery; attempt events count
+towards both the chapter and the topic of their question.
+
+Each chunk's results are bulk-written as one topic_mastery document per
+student, plus `users.weakAreas`: the Weak chapters with at least
+`min_attempts` attempts, weakest first. Then the id of the chunk's last
+student is checkpointed, so a crashed run resumes with the next chunk instead
+of starting over. Only the same night's run may resume: a checkpoint from a run
+started more than `WEAK_AREAS_RESUME_HOURS` ago is discarded, as the students
+it already covered have new data by then.
+
+CLI (reads MONGO_URL and DB_NAME from the environment or backend/.env):
+
+    python weak_areas.py                   # one process per CPU
+    python weak_areas.py --workers 1 --restart
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from pymongo import ReplaceOne, UpdateOne
+
+from batch import BATCH_WORKERS, Checkpoint, bulk_write_batches, map_batches, process_pool
+from grading import WEAK_CHAPTER_ACCURACY
+
+logger = logging.getLogger(__name__)
+
+STRONG_ACCURACY = 70.0
+WEAK_AREA_MIN_ATTEMPTS = int(os.environ.get('WEAK_AREA_MIN_ATTEMPTS', 5))
+WEAK_AREAS_CHUNK_USERS = int(os.environ.get('WEAK_AREAS_CHUNK_USERS', 1000))
+WEAK_AREAS_RESUME_HOURS = float(os.environ.get('WEAK_AREAS_RESUME_HOURS', 12))
+CHECKPOINT_JOB = "weak_areas"
+CLASSIFICATIONS = ("Strong", "Needs Revision", "Weak")
+
+
+def classify(accuracy: np.ndarray) -> np.ndarray:
+    """Index into CLASSIFICATIONS for every accuracy percentage"""
+    return np.where(accuracy >= STRONG_ACCURACY, 0, np.where(accuracy >= WEAK_CHAPTER_ACCURACY, 1, 2))
+
+
+def column(values) -> np.ndarray:
+    return np.fromiter(values, dtype=np.int64)
+
+
+def group_totals(cells: np.ndarray, attempts: np.ndarray, correct: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """Sorted distinct cells with their summed attempts and correct answers"""
+    unique, inverse = np.unique(cells, return_inverse=True)
+    return (unique, np.bincount(inverse, weights=attempts, minlength=len(unique)).astype(np.int64),
+            np.bincount(inverse, weights=correct, minlength=len(unique)).astype(np.int64))
+
+
+def mastery_entries(cells: np.ndarray, attempts: np.ndarray, correct: np.ndarray, width: int,
+                    keys: list, fields: tuple, users: int) -> List[List[dict]]:
+    """Per-user lists of entries; cell = user * width + index into keys"""
+    keep = attempts > 0
+    cells, attempts, correct = cells[keep], attempts[keep], correct[keep]
+    accuracy = np.round(correct * 100 / np.maximum(attempts, 1), 1)
+    owner = cells // width
+    bounds = np.searchsorted(owner, np.arange(users + 1)).tolist()
+    columns = zip((cells % width).tolist(), attempts.tolist(), correct.tolist(), accuracy.tolist(),
+                  classify(accuracy).tolist())
+    entries = [
+        {**dict(zip(fields, keys[code])), "attempts": n, "correct": c, "accuracy": a,
+         "classification": CLASSIFICATIONS[k]}
+        for code, n, c, a, k in columns
+    ]
+    return [entries[bounds[user]:bounds[user + 1]] for user in range(users)]
+
+
+# ==================== Worker Side ====================
+
+# Topics and chapters of the bank, sorted so entries come out in display order
+_question_topic: Dict[str, int] = {}
+_topic_keys: List[Tuple[str, str, str]] = []
+_topic_chapter = np.zeros(0, dtype=np.int64)
+_chapter_keys: List[Tuple[str, str]] = []
+_min_attempts = WEAK_AREA_MIN_ATTEMPTS
+
+
+def init_worker(topics: Dict[str, Tuple[str, str, str]], min_attempts: int):
+    global _question_topic, _topic_keys, _topic_chapter, _chapter_keys, _min_attempts
+    _topic_keys = sorted(set(topics.values()))
+    topic_index = {key: i for i, key in enumerate(_topic_keys)}
+    _chapter_keys = sorted({key[:2] for key in _topic_keys})
+    chapter_index = {key: i for i, key in enumerate(_chapter_keys)}
+    _topic_chapter = np.array([chapter_index[key[:2]] for key in _topic_keys], dtype=np.int64)
+    _question_topic = {question_id: topic_index[key] for question_id, key in topics.items()}
+    _min_attempts = min_attempts
+
+
+def user_mastery(chunk: dict) -> List[dict]:
+    """Mastery of every student in a chunk, in the chunk's user order"""
+    users = {user_id: i for i, user_id in enumerate(chunk["userIds"])}
+
+    # Practice sessions may name chapters without bank questions; rank them among the bank's
+    practiced = {(row["_id"]["subject"], row["_id"]["chapter"]) for row in chunk["practice"]}
+    chapter_keys = sorted(practiced.union(_chapter_keys))
+    chapter_index = {key: i for i, key in enumerate(chapter_keys)}
+    bank_chapter = np.array([chapter_index[key] for key in _chapter_keys], dtype=np.int64)[_topic_chapter] \
+        if _chapter_keys else _topic_chapter
+
+    # Attempts on questions deleted since they were answered are dropped
+    answered = [row for row in chunk["attempts"] if row["_id"]["questionId"] in _question_topic]
+    user = column(users[row["_id"]["userId"]] for row in answered)
+    topic = column(_question_topic[row["_id"]["questionId"]] for row in answered)
+    attempts = column(row["n"] for row in answered)
+    correct = column(row["correct"] for row in answered)
+    practice = chunk["practice"]
+    p_user = column(users[row["_id"]["userId"]] for row in practice)
+    p_chapter = column(chapter_index[(row["_id"]["subject"], row["_id"]["chapter"])] for row in practice)
+    p_attempts = column(row["attempted"] for row in practice)
+    p_correct = column(row["correct"] for row in practice)
+
+    topics = mastery_entries(*group_totals(user * len(_topic_keys) + topic, attempts, correct),
+                             len(_topic_keys), _topic_keys, ("subject", "chapter", "topic"), len(users))
+    chapters = mastery_entries(*group_totals(
+        np.concatenate([user * len(chapter_keys) + bank_chapter[topic], p_user * len(chapter_keys) + p_chapter]),
+        np.concatenate([attempts, p_attempts]), np.concatenate([correct, p_correct]),
+    ), len(chapter_keys), chapter_keys, ("subject", "chapter"), len(users))
+
+    results = []
+    for user_id, user_chapters, user_topics in zip(chunk["userIds"], chapters, topics):
+        weak = sorted((entry for entry in user_chapters
+                       if entry["classification"] == "Weak" and entry["attempts"] >= _min_attempts),
+                      key=lambda entry: entry["accuracy"])
+        results.append({
+            "userId": user_id,
+            "chapters": user_chapters,
+            "topics": user_topics,
+            "weakAreas": [entry["chapter"] for entry in weak],
+        })
+    return results
+
+
+# ==================== Job ====================
+
+async def question_topics(db) -> Dict[str, Tuple[str, str, str]]:
+    """(subject, chapter, topic) of every bank and pre-generated question"""
+    topics = {}
+    async for question in db.questions.find({}, {"_id": 0, "id": 1, "subject": 1, "chapter": 1, "topic": 1}):
+        topics[question["id"]] = (question["subject"], question["chapter"], question.get("topic") or question["chapter"])
+    async for stored in db.pregenerated_questions.find({}, {"_id": 0, "subject": 1, "chapter": 1, "questions.id": 1,
+                                                           "questions.topic": 1}):
+        for question in stored.get("questions", []):
+            if "id" in question:
+                topics.setdefault(question["id"], (stored["subject"], stored["chapter"],
+                                                   question.get("topic") or stored["chapter"]))
+    return topics
+
+
+async def user_chunks(db, after, chunk_users: int):
+    """Practice and attempt totals of `chunk_users` students at a time, by user id"""
+    while True:
+        query = {"id": {"$gt": after}} if after else {}
+        user_ids = [user["id"] async for user in db.users.find(query, {"_id": 0, "id": 1}).sort("id", 1).limit(chunk_users)]
+        if not user_ids:
+            return
+        practice = await db.practice_sessions.aggregate([
+            {"$match": {"userId": {"$in": user_ids}}},
+            {"$group": {"_id": {"userId": "$userId", "subject": "$subject", "chapter": "$chapter"},
+                        "attempted": {"$sum": "$questionsAttempted"}, "correct": {"$sum": "$questionsCorrect"}}},
+        ], allowDiskUse=True).to_list(None)
+        attempts = await db.question_attempts.aggregate([
+            {"$match": {"userId": {"$in": user_ids}, "correct": {"$ne": None}}},
+            {"$group": {"_id": {"userId": "$userId", "questionId": "$meta.questionId"},
+                        "n": {"$sum": 1}, "correct": {"$sum": {"$cond": ["$correct", 1, 0]}}}},
+        ], allowDiskUse=True).to_list(None)
+        yield {"userIds": user_ids, "practice": practice, "attempts": attempts}
+        after = user_ids[-1]
+
+
+async def compute_weak_areas(db, workers: int = 1, chunk_users: int = WEAK_AREAS_CHUNK_USERS,
+                             min_attempts: int = WEAK_AREA_MIN_ATTEMPTS, restart: bool = False) -> dict:
+    started = time.perf_counter()
+    checkpoint = Checkpoint(db, CHECKPOINT_JOB)
+    state = None if restart else await checkpoint.load()
+    if state and datetime.utcnow() - state["startedAt"] > timedelta(hours=WEAK_AREAS_RESUME_HOURS):
+        logger.info(f"Discarding the checkpoint of the weak areas run started at {state['startedAt']}")
+        state = None
+    if state:
+        logger.info(f"Resuming weak areas after user {state['lastUserId']} ({state['users']} done)")
+    else:
+        state = {"lastUserId": None, "users": 0, "weak": 0, "startedAt": datetime.utcnow()}
+    resumed_after = state["lastUserId"]
+
+    pool = process_pool(workers, init_worker, (await question_topics(db), min_attempts))
+    try:
+        chunks = user_chunks(db, state["lastUserId"], chunk_users)
+        async for results in map_batches(pool, user_mastery, chunks, max_inflight=max(2, workers * 2)):
+            now = datetime.utcnow()
+            await bulk_write_batches(db.topic_mastery, (
+                ReplaceOne({"userId": result["userId"]}, {**result, "updatedAt": now}, upsert=True)
+                for result in results
+            ))
+            await bulk_write_batches(db.users, (
+                UpdateOne({"id": result["userId"]}, {"$set": {"weakAreas": result["weakAreas"]}})
+                for result in results
+            ))
+            state.update(
+                lastUserId=results[-1]["userId"],
+                users=state["users"] + len(results),
+                weak=state["weak"] + sum(1 for result in results if result["weakAreas"]),
+            )
+            await checkpoint.save(state)
+    finally:
+        if pool:
+            pool.shutdown()
+    await checkpoint.clear()
+
+    report = {
+        "users": state["users"],
+        "usersWithWeakAreas": state["weak"],
+        "resumedAfter": resumed_after,
+        "elapsedSeconds": round(time.perf_counter() - started, 2),
+    }
+    logger.info(f"Weak areas: {report}")
+    return report
+
+
+async def ensure_weak_area_indexes(db):
+    await db.topic_mastery.create_index("userId", unique=True)
+    await db.users.create_index("id")
+
+
+# ==================== CLI ====================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute topic mastery and weak areas of every student")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--chunk-users", type=int, default=WEAK_AREAS_CHUNK_USERS)
+    parser.add_argument("--min-attempts", type=int, default=WEAK_AREA_MIN_ATTEMPTS)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an interrupted run")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            return await compute_weak_areas(client[os.environ['DB_NAME']], args.workers, args.chunk_users,
+                                            args.min_attempts, args.restart)
+        finally:
+            client.close()
+
+    print(json.dumps(asyncio.run(run()), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,141 @@
+"""
+Bounded in-process write-behind queue.
+
+Request handlers enqueue documents without awaiting the database; a
+background task flushes them with unordered insert_many calls whenever a
+batch fills up or the flush interval passes. When the queue is full new
+documents are dropped and counted rather than blocking the request.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    def __init__(self, name: str, max_batch: int = 500, flush_interval: float = 1.0, max_pending: int = 10000):
+        self.name = name
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.collection = None
+        self._pending: deque = deque()
+        self._inflight: List[dict] = []
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+
+    def put(self, document: dict) -> bool:
+        """Queue a document for insertion; returns False if it was dropped"""
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._pending.append(document)
+        self.enqueued += 1
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+        return True
+
+    def room(self) -> int:
+        """Documents that can still be queued before new ones are dropped"""
+        return self.max_pending - len(self._pending)
+
+    def pending(self, predicate: Callable[[dict], bool]) -> List[dict]:
+        """Copies of queued or in-flight documents matching `predicate` (read-your-writes)"""
+        documents = []
+        for document in list(self._inflight) + list(self._pending):
+            if predicate(document):
+                copy = dict(document)
+                copy.pop("_id", None)
+                documents.append(copy)
+        return documents
+
+    async def start(self, collection):
+        self.collection = collection
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and drain everything still queued"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._pending:
+            if not await self.flush():
+                self.dropped += len(self._pending)
+                self._pending.clear()
+        logger.info(f"Write-behind queue {self.name} drained ({self.written} written, {self.dropped} dropped)")
+
+    async def _run(self):
+        while True:
+            # asyncio.wait, unlike wait_for before Python 3.12, never turns stop()'s cancellation into a timeout
+            wake = asyncio.ensure_future(self._wake.wait())
+            try:
+                await asyncio.wait([wake], timeout=self.flush_interval)
+            finally:
+                wake.cancel()
+            self._wake.clear()
+            while self._pending:
+                if not await self.flush():
+                    await asyncio.sleep(self.flush_interval)
+                    break
+                if len(self._pending) < self.max_batch:
+                    break
+
+    async def flush(self) -> bool:
+        if not self._pending or self.collection is None:
+            return True
+        batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+        self._inflight = batch
+        started = time.perf_counter()
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+            self.written += len(batch)
+            return True
+        except BulkWriteError as e:
+            # Per-document rejections are not transient; keep what was inserted
+            self.written += e.details.get("nInserted", 0)
+            self.dropped += len(e.details.get("writeErrors", []))
+            logger.error(f"Write-behind flush for {self.name} rejected documents: {e.details.get('writeErrors', [])[:3]}")
+            return True
+        except Exception as e:
+            self.failed_batches += 1
+            # Requeue what fits so a transient outage doesn't lose the batch
+            room = self.max_pending - len(self._pending)
+            for document in reversed(batch[:room]):
+                document.pop("_id", None)
+                self._pending.appendleft(document)
+            self.dropped += max(0, len(batch) - room)
+            logger.error(f"Write-behind flush for {self.name} failed: {e}")
+            return False
+        finally:
+            self._inflight = []
+            self.flushes += 1
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self._pending) + len(self._inflight),
+            "maxPending": self.max_pending,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failedBatches": self.failed_batches,
+            "flushes": self.flushes,
+            "lastFlushMs": round(self.last_flush_ms, 2),
+        }
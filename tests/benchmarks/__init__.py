@@ -0,0 +1,12 @@
+"""
+Micro-benchmarks for pure-Python hot paths in backend/server.py.
+
+Requires pytest-benchmark. Every benchmark runs on synthetic datasets of
+10, 1k and 100k items. Save a run and compare later runs against it:
+
+    pytest tests/benchmarks --benchmark-autosave --benchmark-storage=file://tests/benchmarks/.history
+    pytest tests/benchmarks --benchmark-storage=file://tests/benchmarks/.history \\
+        --benchmark-compare --benchmark-compare-fail=mean:10%
+
+Skip the largest scale during local iteration with `-k "not 100000"`.
+"""
@@ -0,0 +1,66 @@
+"""Synthetic datasets shared by the benchmarks"""
+
+import random
+
+SCALES = [10, 1_000, 100_000]
+
+SUBJECTS = {
+    "Physics": ["Laws of Motion", "Gravitation", "Current Electricity", "Wave Optics"],
+    "Chemistry": ["Structure of Atom", "Chemical Bonding", "Equilibrium", "Thermodynamics"],
+    "Biology": ["Cell: The Unit of Life", "Photosynthesis", "Human Reproduction", "Evolution"],
+}
+
+
+def make_question(rng: random.Random, index: int) -> dict:
+    subject = rng.choice(list(SUBJECTS))
+    return {
+        "id": f"q-{index}",
+        "question": f"Synthetic benchmark question number {index} about {rng.choice(SUBJECTS[subject])}?",
+        "options": [f"Option {c} {index}" for c in "ABCD"],
+        "correctAnswer": rng.randrange(4),
+        "explanation": "Synthetic explanation referencing NCERT " * 3,
+        "subject": subject,
+        "chapter": rng.choice(SUBJECTS[subject]),
+        "topic": f"Topic {index % 50}",
+        "difficulty": rng.choice(["Easy", "Moderate", "medium", "hard"]),
+    }
+
+
+def make_questions(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [make_question(rng, i) for i in range(n)]
+
+
+def make_practice_sessions(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    sessions = []
+    for i in range(n):
+        subject = rng.choice(list(SUBJECTS))
+        attempted = rng.randint(1, 30)
+        sessions.append({
+            "id": f"s-{i}",
+            "userId": "bench-user",
+            "subject": subject,
+            "chapter": rng.choice(SUBJECTS[subject]),
+            "questionsAttempted": attempted,
+            "questionsCorrect": rng.randint(0, attempted),
+            "timeSpent": attempted * 45,
+        })
+    return sessions
+
+
+def make_mock_tests(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"t-{i}",
+            "userId": "bench-user",
+            "testType": "full",
+            "totalQuestions": 180,
+            "correctAnswers": rng.randint(40, 180),
+            "score": rng.uniform(0, 720),
+            "timeSpent": 3 * 3600,
+            "accuracy": rng.uniform(0, 100),
+        }
+        for i in range(n)
+    ]
@@ -0,0 +1,42 @@
+"""
+Throughput of the per-batch reduction in the difficulty calibration job.
+
+Every attempt event passes through item_statistics once, so a worker must
+reduce a 50k-event batch to per-question sums in a fraction of a second.
+"""
+
+import random
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+EVENTS = 50_000
+QUESTIONS = 2_000
+STUDENTS = 5_000
+MIN_EVENTS_PER_SECOND = 250_000
+
+
+def make_events(n: int, rng: random.Random) -> tuple:
+    abilities = {f"u-{i}": rng.uniform(0.2, 0.9) for i in range(STUDENTS)}
+    ease = [rng.uniform(0.2, 0.95) for _ in range(QUESTIONS)]
+    events = []
+    for _ in range(n):
+        user, question = f"u-{rng.randrange(STUDENTS)}", rng.randrange(QUESTIONS)
+        p = ease[question] * (0.5 + abilities[user] * 0.7)
+        events.append({"meta": {"questionId": f"q-{question}"}, "userId": user, "correct": rng.random() < p})
+    return abilities, events
+
+
+def test_item_statistics(benchmark, server):
+    from calibration import init_worker, item_statistics
+
+    abilities, events = make_events(EVENTS, random.Random(0))
+    init_worker(abilities)
+
+    ids, stats = benchmark(item_statistics, events)
+
+    assert stats.shape == (len(ids), 7)
+    assert stats[:, 0].sum() == EVENTS
+    if benchmark.stats:  # None under --benchmark-disable
+        assert EVENTS / benchmark.stats.stats.median >= MIN_EVENTS_PER_SECOND
@@ -0,0 +1,45 @@
+"""
+Throughput of batch grading in POST /api/tests/grade.
+
+Institutes grade a whole centre's answer sheets at once, so a batch of a few
+thousand 180-question NEET sheets must grade in well under a second.
+"""
+
+import random
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+SHEETS = 5_000
+QUESTIONS = 180
+MIN_SHEETS_PER_SECOND = 5_000
+
+
+def make_paper(rng: random.Random) -> list:
+    return [
+        {"id": f"q-{i}", "correctAnswer": rng.randrange(4), "subject": "Physics", "chapter": f"Chapter {i % 20}"}
+        for i in range(QUESTIONS)
+    ]
+
+
+def make_sheets(paper: list, n: int, rng: random.Random) -> list:
+    return [
+        {q["id"]: (rng.randrange(4) if rng.random() < 0.9 else None) for q in paper}
+        for _ in range(n)
+    ]
+
+
+def test_grade_sheets(benchmark, server):
+    from grading import AnswerKey, grade_sheets
+
+    rng = random.Random(0)
+    paper = make_paper(rng)
+    key = AnswerKey.build(paper)
+    sheets = make_sheets(paper, SHEETS, rng)
+
+    results = benchmark(grade_sheets, key, sheets, True)
+
+    assert len(results) == SHEETS
+    if benchmark.stats:  # None under --benchmark-disable
+        assert SHEETS / benchmark.stats.stats.median >= MIN_SHEETS_PER_SECOND
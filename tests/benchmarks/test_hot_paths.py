@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from .datasets import SCALES, make_mock_tests, make_practice_sessions, make_questions
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.mark.parametrize("n", SCALES)
+def test_compute_analytics(benchmark, server, n):
+    """Summation and per-subject loops behind GET /api/analytics/{user_id}"""
+    sessions = make_practice_sessions(n)
+    tests = make_mock_tests(max(1, n // 10))
+    result = benchmark(server.compute_analytics, sessions, tests)
+    assert result["totalQuestions"] == sum(s["questionsAttempted"] for s in sessions)
+
+
+@pytest.mark.parametrize("n", SCALES)
+def test_serialize_questions(benchmark, server, n):
+    """Question model construction in POST /api/questions/generate"""
+    documents = make_questions(n)
+    result = benchmark(server.serialize_questions, documents)
+    assert len(result) == n
+
+
+@pytest.mark.parametrize("n", SCALES)
+def test_serialize_question_list(benchmark, server, n):
+    """List-view projection in POST /api/questions/generate?view=list"""
+    documents = make_questions(n)
+    result = benchmark(server.serialize_question_list, documents)
+    assert len(result) == n
+    assert "explanation" not in result[0]
+
+
+@pytest.mark.parametrize("n", SCALES)
+def test_annotate_questions(benchmark, server, n):
+    """contentHash and MinHash/LSH bands computed for every imported question"""
+    from question_dedup import annotate
+
+    documents = make_questions(n)
+    result = benchmark(lambda: [annotate(dict(q)) for q in documents])
+    assert len({q["contentHash"] for q in result}) == n
+
+
+@pytest.mark.parametrize("n", SCALES)
+def test_parse_ai_questions(benchmark, server, n):
+    """JSON parsing and validation of model output in GET /api/questions/pregenerated"""
+    response = json.dumps(make_questions(n), ensure_ascii=False)
+    result = benchmark(server.parse_ai_questions, response)
+    assert len(result) == n
+
+
+@pytest.mark.parametrize("n", SCALES)
+def test_json_loads_model_output(benchmark, n):
+    """Raw json.loads cost, to separate parsing from model validation"""
+    response = json.dumps(make_questions(n), ensure_ascii=False)
+    result = benchmark(json.loads, response)
+    assert len(result) == n
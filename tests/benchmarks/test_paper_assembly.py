@@ -0,0 +1,34 @@
+"""
+Allocation of a full NEET paper across subjects, difficulties and chapters.
+
+Allocation runs on every uncached POST /api/papers/assemble before the single
+sampling aggregation, so it must stay cheap even for a bank with hundreds of
+chapters.
+"""
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+ALLOCATION_BUDGET_MS = 20
+
+
+def make_availability(chapters_per_subject: int, per_cell: int = 40) -> dict:
+    return {
+        (subject, f"{subject} chapter {i}", level): per_cell
+        for subject in ("Physics", "Chemistry", "Biology")
+        for i in range(chapters_per_subject)
+        for level in ("easy", "medium", "hard")
+    }
+
+
+def test_allocate_neet_paper(benchmark, server):
+    from paper_assembly import DEFAULT_DIFFICULTY_MIX, NEET_SECTIONS, allocate_paper
+
+    available = make_availability(100)
+    cells, summary = benchmark(allocate_paper, NEET_SECTIONS, DEFAULT_DIFFICULTY_MIX, available)
+
+    assert sum(cell["count"] for cell in cells) == 180
+    assert [s["allocated"] for s in summary] == [45, 45, 90]
+    if benchmark.stats:  # None under --benchmark-disable
+        assert benchmark.stats.stats.median * 1000 < ALLOCATION_BUDGET_MS
@@ -0,0 +1,27 @@
+"""
+Cost of the in-process token-bucket check that guards the AI routes.
+
+The check runs before every limited request, so it has to stay in the
+microsecond range rather than costing a database round trip.
+"""
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+CHECK_BUDGET_US = 50
+
+
+def test_memory_bucket_take(benchmark, server):
+    from rate_limit import Limit, MemoryBackend
+
+    backend = MemoryBackend(max_keys=10_000)
+    limit = Limit(rate=1000.0, burst=1000.0)
+    keys = [f"buddy:u:user-{i}" for i in range(20_000)]
+    counter = iter(range(10 ** 9))
+
+    benchmark(lambda: backend.take_now(keys[next(counter) % len(keys)], limit))
+
+    assert len(backend.buckets) <= 10_000
+    if benchmark.stats:  # None under --benchmark-disable
+        assert benchmark.stats.stats.median * 1e6 < CHECK_BUDGET_US
@@ -0,0 +1,69 @@
+"""
+Search latency on a 200k-question bank.
+
+Needs a real MongoDB (text indexes are not emulated in memory):
+
+    BENCH_MONGO_URL=mongodb://localhost:27017 pytest tests/benchmarks/test_search.py
+
+The bank is seeded once into the `neet_benchmarks` database and reused.
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from .datasets import make_questions
+
+pytest.importorskip("pytest_benchmark")
+
+BANK_SIZE = 200_000
+SEARCH_BUDGET_MS = 50
+
+QUERIES = [
+    ("newton force", {}),
+    ("photosynthesis light reaction", {"subject": "Biology"}),
+    ("equilibrium", {"subject": "Chemistry", "difficulty": "easy"}),
+    ("question 199", {"page": 3}),
+]
+
+
+@pytest.fixture(scope="module")
+def search_env(server):
+    mongo_url = os.environ.get("BENCH_MONGO_URL")
+    if not mongo_url:
+        pytest.skip("BENCH_MONGO_URL is not set")
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    loop = asyncio.new_event_loop()
+    client = AsyncIOMotorClient(mongo_url, io_loop=loop)
+    server.db = client["neet_benchmarks"]
+
+    async def seed():
+        existing = await server.db.questions.count_documents({})
+        if existing < BANK_SIZE:
+            await server.db.questions.drop()
+            for start in range(0, BANK_SIZE, 10_000):
+                batch = make_questions(10_000, seed=start)
+                for i, question in enumerate(batch):
+                    question["id"] = f"q-{start + i}"
+                    question["question"] = question["question"].replace(f"number {i}", f"number {start + i}")
+                await server.db.questions.insert_many(batch, ordered=False)
+        await server.create_indexes()
+
+    loop.run_until_complete(seed())
+    yield server, loop
+    client.close()
+    loop.close()
+
+
+@pytest.mark.parametrize("text,filters", QUERIES, ids=[q for q, _ in QUERIES])
+def test_search_latency(benchmark, search_env, text, filters):
+    server, loop = search_env
+    params = {"subject": None, "chapter": None, "difficulty": None, "page": 1, "pageSize": 20, **filters}
+
+    result = benchmark(lambda: loop.run_until_complete(server.search_questions(q=text, **params)))
+
+    assert isinstance(result["results"], list)
+    if benchmark.stats:  # None under --benchmark-disable
+        assert benchmark.stats.stats.median * 1000 < SEARCH_BUDGET_MS
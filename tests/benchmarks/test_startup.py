@@ -0,0 +1,50 @@
+"""
+Import-time budget for backend/server.py.
+
+Importing the module must not need environment variables, a database or the
+LLM integration; workers that import quickly restart and scale out quickly.
+Each measurement runs in a fresh interpreter so nothing is already cached.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from ..conftest import BACKEND_DIR
+
+IMPORT_BUDGET_SECONDS = 1.5
+RUNS = 3
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import server
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "seconds": elapsed,
+    "llmLoaded": "emergentintegrations" in sys.modules,
+    "clientOpened": server.client is not None,
+}))
+"""
+
+
+def test_import_budget():
+    pytest.importorskip("fastapi")
+    pytest.importorskip("motor")
+    env = {k: v for k, v in os.environ.items() if k not in ("MONGO_URL", "DB_NAME", "EMERGENT_LLM_KEY")}
+
+    results = []
+    for _ in range(RUNS):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=str(BACKEND_DIR), env=env,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    assert not any(r["llmLoaded"] for r in results)
+    assert not any(r["clientOpened"] for r in results)
+    best = min(r["seconds"] for r in results)
+    assert best < IMPORT_BUDGET_SECONDS, f"import server took {best:.2f}s (budget {IMPORT_BUDGET_SECONDS}s)"
@@ -0,0 +1,46 @@
+"""
+Throughput of the per-chunk step of the nightly weak-area job.
+
+The pool turns the practice and attempt totals of a chunk of students into
+their mastery; a 1000-student chunk must finish within a second so a
+night's run scales with the number of processes, not with this step.
+"""
+
+import random
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+STUDENTS = 1_000
+QUESTIONS = 5_000
+ATTEMPTED_PER_STUDENT = 200
+MIN_STUDENTS_PER_SECOND = 1_000
+
+
+def make_chunk(rng: random.Random) -> tuple:
+    topics = {f"q-{i}": ("Physics", f"Chapter {i % 30}", f"Topic {i % 150}") for i in range(QUESTIONS)}
+    user_ids = [f"u-{i:05d}" for i in range(STUDENTS)]
+    practice, attempts = [], []
+    for user_id in user_ids:
+        for chapter in rng.sample(range(30), 5):
+            practice.append({"_id": {"userId": user_id, "subject": "Physics", "chapter": f"Chapter {chapter}"},
+                             "attempted": 10, "correct": rng.randrange(11)})
+        for question in rng.sample(range(QUESTIONS), ATTEMPTED_PER_STUDENT):
+            n = rng.randrange(1, 3)
+            attempts.append({"_id": {"userId": user_id, "questionId": f"q-{question}"}, "n": n,
+                             "correct": rng.randrange(n + 1)})
+    return topics, {"userIds": user_ids, "practice": practice, "attempts": attempts}
+
+
+def test_user_mastery(benchmark, server):
+    from weak_areas import init_worker, user_mastery
+
+    topics, chunk = make_chunk(random.Random(0))
+    init_worker(topics, 5)
+
+    results = benchmark(user_mastery, chunk)
+
+    assert [result["userId"] for result in results] == chunk["userIds"]
+    if benchmark.stats:  # None under --benchmark-disable
+        assert STUDENTS / benchmark.stats.stats.median >= MIN_STUDENTS_PER_SECOND
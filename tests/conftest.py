@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+
+
+@pytest.fixture(scope="session")
+def server():
+    """Import server.py without network access (fake LLM, lazy Motor client)"""
+    pytest.importorskip("fastapi")
+    pytest.importorskip("motor")
+    from tests.loadtest import fake_llm
+
+    fake_llm.install()
+    fake_llm.FakeLlmChat.configure(fake_llm.FakeLlmConfig(latency_ms=1, latency_sigma=0, seed=0))
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "neet_benchmarks")
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    import server
+
+    return server
+
+
+@pytest.fixture
+def api(server):
+    """Run `body(client)` against a fresh app on an in-memory database and return its result"""
+    httpx = pytest.importorskip("httpx")
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from tests.loadtest.runner import wait_ready
+
+    def run(body):
+        async def main():
+            server.catalog_cache.invalidate()
+            app = server.create_app(mongo_client=mongomock_motor.AsyncMongoMockClient())
+            async with app.router.lifespan_context(app):
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                    await wait_ready(client)
+                    return await body(client)
+
+        return asyncio.run(main())
+
+    return run
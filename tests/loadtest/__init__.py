@@ -0,0 +1,13 @@
+"""
+NEET HUB.AI offline load-test harness.
+
+Boots the FastAPI app in-process against an in-memory MongoDB stand-in
+(or a real MongoDB via --mongo-url) and a fake LlmChat with configurable
+latency/error distributions, drives a weighted mix of realistic traffic and
+writes per-route throughput and p50/p95/p99 latencies as JSON.
+
+    python -m tests.loadtest --concurrency 50 --duration 60 --output baseline.json
+    python -m tests.loadtest --duration 60 --baseline baseline.json --tolerance 0.2
+    python -m tests.loadtest --base-url http://localhost:8001 --duration 60
+    python -m tests.loadtest --workers 4 --mongo-url mongodb://localhost:27017 --duration 60
+"""
@@ -0,0 +1,18 @@
+"""
+ASGI factory for multi-worker load tests: the real app with the fake LLM.
+
+Started by `python -m tests.loadtest --workers N --mongo-url ...`; the fake
+LLM settings are passed through LOADTEST_LLM_CONFIG (JSON).
+"""
+
+import json
+import os
+
+from .fake_llm import FakeLlmConfig
+from .runner import load_server
+
+
+def create_app():
+    config = FakeLlmConfig(**json.loads(os.environ.get("LOADTEST_LLM_CONFIG") or "{}"))
+    server = load_server(os.environ["MONGO_URL"], os.environ["DB_NAME"], config)
+    return server.create_app()
@@ -0,0 +1,154 @@
+"""
+Fake stand-in for emergentintegrations' LlmChat.
+
+Responses are shaped after the prompt so that the JSON-parsing routes in
+server.py exercise their real code paths. Latency and failures are drawn from
+a FakeLlmConfig shared by every instance.
+"""
+
+import asyncio
+import json
+import random
+import re
+import sys
+import types
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+
+@dataclass
+class FakeLlmConfig:
+    latency_ms: float = 800.0  # median latency
+    latency_sigma: float = 0.5  # lognormal spread, 0 = fixed latency
+    error_rate: float = 0.0  # probability that send_message raises
+    invalid_json_rate: float = 0.0  # probability of returning non-JSON text
+    seed: Optional[int] = None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class FakeUserMessage:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeLlmChat:
+    """Drop-in replacement for LlmChat(...).with_model(...).send_message(...)"""
+
+    config = FakeLlmConfig()
+    calls = 0
+    _rng = random.Random()
+
+    def __init__(self, api_key=None, session_id=None, system_message: str = ""):
+        self.session_id = session_id
+        self.system_message = system_message or ""
+        self.provider = None
+        self.model = None
+
+    @classmethod
+    def configure(cls, config: FakeLlmConfig):
+        cls.config = config
+        cls.calls = 0
+        cls._rng = random.Random(config.seed)
+
+    def with_model(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        return self
+
+    async def send_message(self, message) -> str:
+        cls = type(self)
+        cls.calls += 1
+        config = cls.config
+        delay = config.latency_ms
+        if config.latency_sigma > 0:
+            delay = cls._rng.lognormvariate(0, config.latency_sigma) * config.latency_ms
+        await asyncio.sleep(delay / 1000)
+
+        if cls._rng.random() < config.error_rate:
+            raise RuntimeError("Fake LLM error")
+        if cls._rng.random() < config.invalid_json_rate:
+            return "Sorry, I cannot produce JSON right now."
+        return _respond(self.system_message, getattr(message, "text", str(message)))
+
+
+def _question(index: int, subject: str = "Physics", chapter: str = "Laws of Motion") -> dict:
+    return {
+        "question": f"Synthetic load-test question {index} on {chapter}?",
+        "options": ["Option A", "Option B", "Option C", "Option D"],
+        "correctAnswer": index % 4,
+        "explanation": "Synthetic explanation with an NCERT reference for load testing.",
+        "subject": subject,
+        "chapter": chapter,
+        "topic": "Load Testing",
+        "difficulty": "medium",
+    }
+
+
+def _respond(system_message: str, prompt: str) -> str:
+    """Return a response with the shape the calling route expects"""
+    if "study planner" in system_message:
+        days = int(re.search(r"Create a (\d+)-day", prompt).group(1)) if "-day" in prompt else 7
+        return json.dumps({
+            "title": f"{days}-Day NEET Study Plan",
+            "dailySchedule": [
+                {
+                    "day": day + 1,
+                    "subjects": ["Physics", "Chemistry", "Biology"],
+                    "topics": ["Topic 1", "Topic 2"],
+                    "hours": 6,
+                    "goals": ["Goal 1", "Goal 2"],
+                }
+                for day in range(min(days, 30))
+            ],
+            "weeklyGoals": ["Finish one chapter per subject"],
+            "tips": ["Revise NCERT daily"],
+        })
+
+    if "Always respond with valid JSON only" in system_message:
+        return json.dumps({
+            "subject": "Physics",
+            "chapter": "Laws of Motion",
+            "topic": "Newton's Laws",
+            "difficulty": "Moderate",
+            "questions": [
+                {
+                    "question": f"Synthetic MCQ {i}?",
+                    "options": {"A": "Newton", "B": "Joule", "C": "Watt", "D": "Pascal"},
+                    "correct": "A",
+                    "explanation": "Synthetic explanation.",
+                }
+                for i in range(5)
+            ],
+        })
+
+    batch = re.search(r"Generate (\d+) NEET-level MCQ questions from (.+?), chapter: (.+?)\.\s", prompt)
+    if batch:
+        count, subject, chapter = int(batch.group(1)), batch.group(2), batch.group(3)
+        return json.dumps([_question(i, subject, chapter) for i in range(count)])
+
+    if "Create a NEET-level MCQ question" in prompt:
+        return json.dumps(_question(0))
+
+    if "motivational" in system_message:
+        return "Consistency beats intensity. Finish today's NCERT chapter before you sleep."
+
+    return (
+        "Great question! Mitosis produces two identical diploid cells, while meiosis produces "
+        "four genetically different haploid gametes (NCERT Class 11, Chapter 10)."
+    )
+
+
+def install():
+    """Register the fake under the emergentintegrations import path"""
+    package = types.ModuleType("emergentintegrations")
+    llm = types.ModuleType("emergentintegrations.llm")
+    chat = types.ModuleType("emergentintegrations.llm.chat")
+    chat.LlmChat = FakeLlmChat
+    chat.UserMessage = FakeUserMessage
+    package.llm = llm
+    llm.chat = chat
+    sys.modules["emergentintegrations"] = package
+    sys.modules["emergentintegrations.llm"] = llm
+    sys.modules["emergentintegrations.llm.chat"] = chat
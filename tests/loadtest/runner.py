@@ -0,0 +1,331 @@
+"""
+Load-test driver: boots the app, seeds data, runs the traffic mix and reports.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from . import fake_llm
+from .fake_llm import FakeLlmChat, FakeLlmConfig, FakeUserMessage
+from .traffic import TrafficMix, VirtualUser, _practice_session, parse_mix
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / "backend"
+
+
+# ==================== App Boot ====================
+
+def load_server(mongo_url: Optional[str], db_name: str, llm_config: FakeLlmConfig):
+    """Import server.py with the fake LLM and a local or in-memory database"""
+    fake_llm.install()
+    FakeLlmChat.configure(llm_config)
+    os.environ["MONGO_URL"] = mongo_url or "mongodb://localhost:27017"
+    os.environ["DB_NAME"] = db_name
+    # Virtual users share one IP and a handful of ids; measure capacity, not the limits
+    os.environ.setdefault("RATE_LIMITS_ENABLED", "false")
+    os.environ.setdefault("LLM_DAILY_QUOTAS", "{}")
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+
+    import server
+
+    server.LlmChat = FakeLlmChat
+    server.UserMessage = FakeUserMessage
+    # server.py configures INFO logging; one httpx line per request would dominate the run
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    return server
+
+
+def build_app(server, mongo_url: Optional[str]):
+    """The app from the server's factory, on the in-memory stand-in unless a MongoDB URL is given"""
+    if mongo_url:
+        return server.create_app()
+    from mongomock_motor import AsyncMongoMockClient
+
+    return server.create_app(mongo_client=AsyncMongoMockClient())
+
+
+@contextlib.contextmanager
+def spawn_workers(workers: int, port: int, mongo_url: str, db_name: str, llm_config: FakeLlmConfig):
+    """Run `uvicorn --workers N` on the app factory with the fake LLM; yields the base URL"""
+    env = dict(os.environ, MONGO_URL=mongo_url, DB_NAME=db_name,
+               LOADTEST_LLM_CONFIG=json.dumps(llm_config.to_dict()))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "tests.loadtest.app:create_app", "--factory",
+         "--workers", str(workers), "--port", str(port), "--log-level", "warning"],
+        cwd=str(BACKEND_DIR.parent), env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(f"{base_url}/readyz", timeout=1).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("uvicorn workers did not start")
+            time.sleep(0.5)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60):
+    """Wait until /readyz reports the warm-up phase finished"""
+    deadline = time.monotonic() + timeout
+    while (await client.get("/readyz")).status_code != 200:
+        if time.monotonic() > deadline:
+            raise RuntimeError("app did not become ready")
+        await asyncio.sleep(0.05)
+
+
+async def seed(client: httpx.AsyncClient, users: int, sessions_per_user: int, rng: random.Random) -> List[VirtualUser]:
+    """Create users, sample questions and some practice history through the API"""
+    response = await client.post("/api/questions/populate-samples")
+    response.raise_for_status()
+
+    virtual_users = []
+    for i in range(users):
+        response = await client.post("/api/users", json={
+            "name": f"Load Test {i}",
+            "email": f"loadtest-{i}@example.com",
+            "prepLevel": rng.choice(["class11", "class12", "dropper"]),
+        })
+        response.raise_for_status()
+        virtual_users.append(VirtualUser(id=response.json()["id"], rng=random.Random(rng.random())))
+
+    for user in virtual_users:
+        for _ in range(sessions_per_user):
+            request = _practice_session(user)
+            await client.post(request.url, json=request.json)
+    return virtual_users
+
+
+# ==================== Driver ====================
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def drive(client: httpx.AsyncClient, mix: TrafficMix, users: List[VirtualUser], concurrency: int,
+                duration: float, warmup: float, max_requests: Optional[int]) -> dict:
+    """Run `concurrency` closed-loop workers and collect per-route latencies"""
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    issued = 0
+
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    async def worker():
+        nonlocal issued
+        while True:
+            now = time.perf_counter()
+            if now >= deadline or (max_requests and issued >= max_requests):
+                return
+            issued += 1
+            op = mix.pick()
+            user = mix.rng.choice(users)
+            request = op.build(user)
+            start = time.perf_counter()
+            try:
+                response = await client.request(request.method, request.url, params=request.params, json=request.json)
+                status = str(response.status_code)
+                failed = response.status_code >= 400
+            except Exception as e:
+                status = type(e).__name__
+                failed = True
+            if start < measure_from:
+                continue
+            latencies[op.route].append((time.perf_counter() - start) * 1000)
+            statuses[op.route][status] += 1
+            if failed:
+                errors[op.route] += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = min(time.perf_counter(), deadline) - measure_from
+
+    routes = {}
+    for route, values in sorted(latencies.items()):
+        values.sort()
+        routes[route] = {
+            "count": len(values),
+            "errors": errors[route],
+            "statuses": dict(statuses[route]),
+            "throughputRps": round(len(values) / elapsed, 2) if elapsed > 0 else 0,
+            "meanMs": round(sum(values) / len(values), 2),
+            "p50Ms": round(percentile(values, 50), 2),
+            "p95Ms": round(percentile(values, 95), 2),
+            "p99Ms": round(percentile(values, 99), 2),
+            "maxMs": round(values[-1], 2),
+        }
+
+    total = sum(r["count"] for r in routes.values())
+    return {
+        "totals": {
+            "requests": total,
+            "errors": sum(r["errors"] for r in routes.values()),
+            "elapsedSeconds": round(elapsed, 2),
+            "throughputRps": round(total / elapsed, 2) if elapsed > 0 else 0,
+        },
+        "routes": routes,
+    }
+
+
+# ==================== Reporting ====================
+
+def print_report(report: dict):
+    print("=" * 100)
+    print(f"{'Route':<42}{'count':>8}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    print("-" * 100)
+    for route, stats in report["routes"].items():
+        print(f"{route:<42}{stats['count']:>8}{stats['errors']:>6}{stats['throughputRps']:>9}"
+              f"{stats['p50Ms']:>10}{stats['p95Ms']:>10}{stats['p99Ms']:>10}")
+    totals = report["totals"]
+    print("-" * 100)
+    print(f"Total: {totals['requests']} requests, {totals['errors']} errors, "
+          f"{totals['throughputRps']} req/s over {totals['elapsedSeconds']}s")
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Return regressions of p95 latency or throughput beyond `tolerance`"""
+    regressions = []
+    for route, base in baseline.get("routes", {}).items():
+        current = report["routes"].get(route)
+        if not current:
+            continue
+        if base["p95Ms"] and current["p95Ms"] > base["p95Ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {base['p95Ms']}ms -> {current['p95Ms']}ms")
+    base_rps = baseline.get("totals", {}).get("throughputRps", 0)
+    if base_rps and report["totals"]["throughputRps"] < base_rps * (1 - tolerance):
+        regressions.append(f"throughput {base_rps} -> {report['totals']['throughputRps']} req/s")
+    return regressions
+
+
+# ==================== Entry Point ====================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tests.loadtest", description=__doc__)
+    parser.add_argument("--base-url", help="Drive a running deployment instead of booting the app in-process")
+    parser.add_argument("--mongo-url", help="Use a real MongoDB instead of the in-memory stand-in")
+    parser.add_argument("--db-name", default="neet_loadtest")
+    parser.add_argument("--workers", type=int,
+                        help="Serve the app with `uvicorn --workers N` (needs --mongo-url) to measure worker scaling")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --workers")
+    parser.add_argument("--keep-db", action="store_true", help="Do not drop the load-test database afterwards")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds before measuring")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--sessions-per-user", type=int, default=20)
+    parser.add_argument("--mix", help='Reweight routes, e.g. "POST /api/ai/buddy=50,GET /api/analytics/{user_id}=10"')
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-latency-sigma", type=float, default=0.5)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-invalid-json-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Compare against a previous JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression ratio vs baseline")
+    return parser.parse_args(argv)
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    llm_config = FakeLlmConfig(
+        latency_ms=args.llm_latency_ms,
+        latency_sigma=args.llm_latency_sigma,
+        error_rate=args.llm_error_rate,
+        invalid_json_rate=args.llm_invalid_json_rate,
+        seed=args.seed,
+    )
+    mix = TrafficMix(parse_mix(args.mix), rng=random.Random(args.seed))
+    timeout = httpx.Timeout(120.0)
+
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout) as client:
+            users = await seed(client, args.users, args.sessions_per_user, rng)
+            result = await drive(client, mix, users, args.concurrency, args.duration, args.warmup, args.requests)
+        target = args.base_url
+    elif args.workers:
+        with spawn_workers(args.workers, args.port, args.mongo_url, args.db_name, llm_config) as base_url:
+            async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+                users = await seed(client, args.users, args.sessions_per_user, rng)
+                result = await drive(client, mix, users, args.concurrency, args.duration, args.warmup, args.requests)
+        if not args.keep_db:
+            from motor.motor_asyncio import AsyncIOMotorClient
+
+            await AsyncIOMotorClient(args.mongo_url).drop_database(args.db_name)
+        target = f"uvicorn x{args.workers} (mongo)"
+    else:
+        server = load_server(args.mongo_url, args.db_name, llm_config)
+        app = build_app(server, args.mongo_url)
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+                await wait_ready(client)
+                users = await seed(client, args.users, args.sessions_per_user, rng)
+                result = await drive(client, mix, users, args.concurrency, args.duration, args.warmup, args.requests)
+            if args.mongo_url and not args.keep_db:
+                await server.client.drop_database(args.db_name)
+        target = "in-process (mongo)" if args.mongo_url else "in-process (in-memory)"
+
+    result["meta"] = {
+        "createdAt": datetime.utcnow().isoformat(),
+        "target": target,
+        "concurrency": args.concurrency,
+        "users": args.users,
+        "warmupSeconds": args.warmup,
+        "mix": {op.route: op.weight for op in mix.operations},
+        "llm": llm_config.to_dict() if not args.base_url else None,
+        "workers": args.workers or 1,
+        "llmCalls": FakeLlmChat.calls if not (args.base_url or args.workers) else None,
+        "python": platform.python_version(),
+    }
+    return result
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.workers and not args.mongo_url:
+        raise SystemExit("--workers needs --mongo-url: worker processes cannot share the in-memory database")
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"Report written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if regressions:
+            print("\nRegressions vs baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("\nNo regressions vs baseline")
@@ -0,0 +1,170 @@
+"""
+Weighted traffic mix for the load-test harness.
+
+Each Operation builds one HTTP request from a VirtualUser. The route name is
+the FastAPI path template so results aggregate per endpoint, not per URL.
+"""
+
+import random
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+SUBJECT_CHAPTERS = {
+    "Physics": ["Laws of Motion", "Work, Energy and Power", "Gravitation", "Current Electricity"],
+    "Chemistry": ["Structure of Atom", "Chemical Bonding", "Thermodynamics", "Equilibrium"],
+    "Biology": ["Cell: The Unit of Life", "Photosynthesis", "Human Reproduction", "Evolution"],
+}
+
+BUDDY_DOUBTS = [
+    "Difference between mitosis and meiosis?",
+    "Why is static friction greater than kinetic friction?",
+    "Explain hybridisation in NH3",
+    "What is the 10% law of energy transfer?",
+    "How do I remember the periodic trends?",
+    "What is Young's double slit fringe width formula?",
+]
+
+
+@dataclass
+class VirtualUser:
+    id: str
+    rng: random.Random
+
+    def subject_chapter(self):
+        subject = self.rng.choice(list(SUBJECT_CHAPTERS))
+        return subject, self.rng.choice(SUBJECT_CHAPTERS[subject])
+
+
+@dataclass
+class Request:
+    method: str
+    url: str
+    params: Optional[dict] = None
+    json: Optional[object] = None
+
+
+@dataclass
+class Operation:
+    route: str
+    weight: float
+    build: Callable[[VirtualUser], Request]
+
+
+def _practice_questions(user):
+    subject, chapter = user.subject_chapter()
+    return Request("POST", "/api/questions/generate", params={"subject": subject, "chapter": chapter, "count": 10})
+
+
+def _mixed_questions(user):
+    buckets = []
+    for _ in range(5):
+        subject, chapter = user.subject_chapter()
+        buckets.append({"subject": subject, "chapter": chapter, "count": 10})
+    return Request("POST", "/api/questions/mixed", json={"buckets": buckets, "view": "list"})
+
+
+def _practice_session(user):
+    subject, chapter = user.subject_chapter()
+    attempted = user.rng.randint(5, 30)
+    return Request("POST", "/api/practice/session", json={
+        "userId": user.id,
+        "subject": subject,
+        "chapter": chapter,
+        "questionsAttempted": attempted,
+        "questionsCorrect": user.rng.randint(0, attempted),
+        "timeSpent": attempted * 60,
+    })
+
+
+def _mock_test(user):
+    correct = user.rng.randint(60, 170)
+    return Request("POST", "/api/tests", json={
+        "userId": user.id,
+        "testType": "full",
+        "totalQuestions": 180,
+        "correctAnswers": correct,
+        "score": correct * 4,
+        "timeSpent": 3 * 3600,
+        "accuracy": round(correct / 180 * 100, 1),
+        "weakChapters": ["Gravitation"],
+    })
+
+
+def _syllabus_progress(user):
+    subject, chapter = user.subject_chapter()
+    return Request("POST", "/api/syllabus/progress", json={
+        "userId": user.id,
+        "classType": "class11",
+        "subjectId": subject.lower(),
+        "chapterId": chapter.lower().replace(" ", "-"),
+        "topicId": "topic-1",
+        "status": user.rng.choice(["in_progress", "completed", "revision"]),
+    })
+
+
+def _buddy(user):
+    return Request("POST", "/api/ai/buddy", params={"userId": user.id, "message": user.rng.choice(BUDDY_DOUBTS)})
+
+
+def _pregenerated(user):
+    subject, chapter = user.subject_chapter()
+    return Request("GET", "/api/questions/pregenerated", params={"subject": subject, "chapter": chapter, "count": 10})
+
+
+def _study_plan(user):
+    return Request(
+        "POST",
+        "/api/study-plan/generate",
+        params={"userId": user.id, "dailyHours": user.rng.choice([4, 6, 8]), "duration": 30, "prepLevel": "class12"},
+        json=user.rng.sample(list(SUBJECT_CHAPTERS), 1),
+    )
+
+
+DEFAULT_MIX: List[Operation] = [
+    # Practice
+    Operation("POST /api/questions/generate", 20, _practice_questions),
+    Operation("POST /api/questions/mixed", 4, _mixed_questions),
+    Operation("POST /api/practice/session", 10, _practice_session),
+    Operation("GET /api/practice/sessions/{user_id}", 5, lambda u: Request("GET", f"/api/practice/sessions/{u.id}")),
+    Operation("GET /api/questions/pregenerated", 4, _pregenerated),
+    # Tests
+    Operation("POST /api/tests", 4, _mock_test),
+    Operation("GET /api/tests/{user_id}", 4, lambda u: Request("GET", f"/api/tests/{u.id}")),
+    # Analytics and progress
+    Operation("GET /api/analytics/{user_id}", 10, lambda u: Request("GET", f"/api/analytics/{u.id}")),
+    Operation("POST /api/syllabus/progress", 4, _syllabus_progress),
+    Operation("GET /api/syllabus/progress/{user_id}", 3, lambda u: Request("GET", f"/api/syllabus/progress/{u.id}")),
+    # Home screen
+    Operation("GET /api/ai/motivation", 5, lambda u: Request("GET", "/api/ai/motivation")),
+    Operation("GET /api/questions/daily", 5, lambda u: Request("GET", "/api/questions/daily")),
+    # Buddy chat
+    Operation("POST /api/ai/buddy", 15, _buddy),
+    Operation("GET /api/ai/buddy/history/{user_id}", 5, lambda u: Request("GET", f"/api/ai/buddy/history/{u.id}")),
+    # Study plans
+    Operation("POST /api/study-plan/generate", 1, _study_plan),
+    Operation("GET /api/study-plan/{user_id}", 2, lambda u: Request("GET", f"/api/study-plan/{u.id}")),
+]
+
+
+def parse_mix(spec: Optional[str]) -> List[Operation]:
+    """Reweight the default mix from "route=weight,route=weight" (unknown routes are an error)"""
+    if not spec:
+        return DEFAULT_MIX
+    by_route: Dict[str, Operation] = {op.route: op for op in DEFAULT_MIX}
+    weights = {}
+    for item in spec.split(","):
+        route, _, weight = item.rpartition("=")
+        route = route.strip()
+        if route not in by_route:
+            raise ValueError(f"Unknown route in mix: {route}")
+        weights[route] = float(weight)
+    return [Operation(op.route, weights.get(op.route, 0), op.build) for op in DEFAULT_MIX if weights.get(op.route, 0) > 0]
+
+
+@dataclass
+class TrafficMix:
+    operations: List[Operation]
+    rng: random.Random = field(default_factory=random.Random)
+
+    def pick(self) -> Operation:
+        return self.rng.choices(self.operations, weights=[op.weight for op in self.operations])[0]
@@ -0,0 +1,49 @@
+"""
+Archival of cold chat history into per-user monthly buckets.
+
+A run that stops after writing buckets but before deleting the hot documents
+is simply repeated, so archiving the same documents twice must leave the
+buckets exactly as one run does.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def chat_messages(now: datetime) -> list:
+    return [
+        {"id": f"m-{n}", "userId": f"u-{n % 2}", "sessionId": "s", "message": f"question {n}",
+         "response": f"answer {n}", "cached": False, "createdAt": now - timedelta(days=100 + 20 * n)}
+        for n in range(6)
+    ]
+
+
+def test_repeated_archival_leaves_buckets_unchanged(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from archival import ensure_archive_indexes, read_archived, run_archival
+
+    async def run():
+        db = mongomock_motor.AsyncMongoMockClient()["archival"]
+        await ensure_archive_indexes(db)
+        now = datetime.utcnow().replace(microsecond=0)
+        messages = chat_messages(now)
+        await db.chat_messages.insert_many([dict(m) for m in messages])
+        await db.chat_messages.insert_one({**messages[0], "id": "hot", "createdAt": now})
+
+        first = await run_archival(db)
+        buckets = await db.chat_archive.find({}, {"_id": 0}).sort([("userId", 1), ("month", 1)]).to_list(None)
+        # As if the first run had stopped before deleting the hot documents
+        await db.chat_messages.insert_many([dict(m) for m in messages])
+        second = await run_archival(db)
+        repeated = await db.chat_archive.find({}, {"_id": 0}).sort([("userId", 1), ("month", 1)]).to_list(None)
+        archived = await read_archived(db, "chat_messages", "u-0", limit=10)
+        return first, second, buckets, repeated, archived, await db.chat_messages.distinct("id")
+
+    first, second, buckets, repeated, archived, hot = asyncio.run(run())
+    assert first["chat"]["moved"] == second["chat"]["moved"] == 6
+    assert repeated == buckets
+    assert sum(len(bucket["items"]) for bucket in repeated) == 6
+    assert [item["id"] for item in archived] == ["m-0", "m-2", "m-4"]
+    assert hot == ["hot"]
@@ -0,0 +1,42 @@
+"""
+Difficulty estimates of the calibration job.
+
+Per-batch sums must add up to the sums of one big batch, whatever way the
+events are split across workers.
+"""
+
+import random
+
+import numpy as np
+
+
+def make_events(n: int, rng: random.Random, students: int = 500, questions: int = 200) -> tuple:
+    abilities = {f"u-{i}": rng.uniform(0.2, 0.9) for i in range(students)}
+    ease = [rng.uniform(0.2, 0.95) for _ in range(questions)]
+    events = []
+    for _ in range(n):
+        user, question = f"u-{rng.randrange(students)}", rng.randrange(questions)
+        p = ease[question] * (0.5 + abilities[user] * 0.7)
+        events.append({"meta": {"questionId": f"q-{question}"}, "userId": user, "correct": rng.random() < p})
+    return abilities, events
+
+
+def test_batches_add_up(server):
+    from calibration import init_worker, item_estimates, item_statistics
+
+    abilities, events = make_events(5_000, random.Random(1))
+    init_worker(abilities)
+
+    whole_ids, whole = item_statistics(events)
+    index = {question_id: i for i, question_id in enumerate(whole_ids)}
+    summed = np.zeros_like(whole)
+    for start in range(0, len(events), 700):
+        ids, stats = item_statistics(events[start:start + 700])
+        summed[[index[question_id] for question_id in ids]] += stats
+
+    assert np.allclose(summed, whole)
+    estimates = item_estimates(whole)
+    assert ((estimates["pCorrect"] >= 0) & (estimates["pCorrect"] <= 1)).all()
+    # Harder questions get a higher Rasch difficulty
+    order = np.argsort(estimates["pCorrect"])
+    assert estimates["irtDifficulty"][order[0]] > estimates["irtDifficulty"][order[-1]]
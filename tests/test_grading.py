@@ -0,0 +1,36 @@
+"""
+NEET marking of answer sheets and validation of submitted choices.
+"""
+
+import pytest
+
+
+def test_neet_marking(server):
+    from grading import AnswerKey, grade_sheets
+
+    paper = [
+        {"id": "a", "correctAnswer": 0, "subject": "Physics", "chapter": "Gravitation"},
+        {"id": "b", "correctAnswer": 1, "subject": "Physics", "chapter": "Gravitation"},
+        {"id": "c", "correctAnswer": 2, "subject": "Biology", "chapter": "Evolution"},
+    ]
+    key = AnswerKey.build(paper)
+    [result] = grade_sheets(key, [{"a": 0, "b": 3, "x": 1}], full_paper=True)
+
+    assert (result["correctAnswers"], result["wrongAnswers"], result["skipped"]) == (1, 1, 1)
+    assert result["score"] == 4 - 1
+    assert result["accuracy"] == 33.3
+    assert result["unknownQuestions"] == 1
+    assert result["weakChapters"] == ["Evolution"]
+    assert {c["chapter"]: c["accuracy"] for c in result["chapters"]} == {"Gravitation": 50.0, "Evolution": 0.0}
+
+
+@pytest.mark.parametrize("choice", [40_000, -1])
+def test_out_of_range_choice_is_rejected(server, choice):
+    from grading import AnswerKey, grade_sheets
+
+    key = AnswerKey.build([{"id": "a", "correctAnswer": 0, "subject": "Physics", "chapter": "Gravitation"}])
+    with pytest.raises(ValueError):
+        grade_sheets(key, [{"a": choice}], full_paper=True)
+    # The API rejects the sheet before grading (422, not 500)
+    with pytest.raises(ValueError):
+        server.GradeRequest(sheets=[{"userId": "u", "answers": {"a": choice}}])
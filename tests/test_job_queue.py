@@ -0,0 +1,165 @@
+"""
+Guarantees of the Mongo-backed job queue that scheduled jobs rely on.
+
+Every API process runs the schedulers, so the database (not a check in one
+process) must keep a dedup key to a single active job.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def make_jobs(mongomock_motor):
+    return mongomock_motor.AsyncMongoMockClient()["job_queue"]["jobs"]
+
+
+def test_dedup_key_allows_one_active_job(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from job_queue import JobQueue
+
+    async def run():
+        collection = make_jobs(mongomock_motor)
+        await collection.create_index("activeKey", unique=True, sparse=True)
+        # One queue per API process, all firing at once
+        queues = [JobQueue(workers=0) for _ in range(4)]
+        for queue in queues:
+            await queue.start(collection)
+        jobs = await asyncio.gather(*(queue.submit("archival", {}, dedup_key="archival") for queue in queues))
+        await collection.update_one({"id": jobs[0]["id"]}, {"$set": {"status": "succeeded"}, "$unset": {"activeKey": ""}})
+        again = await queues[0].submit("archival", {}, dedup_key="archival")
+        return jobs, again, await collection.count_documents({})
+
+    jobs, again, stored = asyncio.run(run())
+    assert len({job["id"] for job in jobs}) == 1
+    # A finished job no longer blocks the next run
+    assert again["id"] != jobs[0]["id"]
+    assert stored == 2
+
+
+def test_expired_lease_on_last_attempt_fails_the_job(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from job_queue import JobQueue
+
+    async def run():
+        collection = make_jobs(mongomock_motor)
+        queue = JobQueue(workers=0)
+        await queue.start(collection)
+        exhausted = await queue.submit("archival", {}, dedup_key="archival", max_attempts=3)
+        retryable = await queue.submit("study_plan", {}, max_attempts=3)
+        # Both workers were killed mid-run; their leases have expired
+        expired = datetime.utcnow() - timedelta(minutes=1)
+        await collection.update_one({"id": exhausted["id"]}, {"$set": {"status": "running", "attempts": 3, "leaseUntil": expired}})
+        await collection.update_one({"id": retryable["id"]}, {"$set": {"status": "running", "attempts": 1, "leaseUntil": expired}})
+        claimed = await queue._claim("worker-2")
+        return claimed, await queue.get(exhausted["id"]), await collection.find_one({"id": exhausted["id"]})
+
+    claimed, exhausted, stored = asyncio.run(run())
+    assert (claimed["type"], claimed["attempts"]) == ("study_plan", 2)
+    assert exhausted["status"] == "failed" and exhausted["finishedAt"] is not None
+    assert "activeKey" not in stored
+
+
+class FlakyJobs:
+    """Job collection whose outcome writes (and optionally heartbeats) fail a given number of times"""
+
+    def __init__(self, collection, outcome_failures: int = 0, heartbeat_failures: int = 0):
+        self.collection = collection
+        self.outcome_failures = outcome_failures
+        self.heartbeat_failures = heartbeat_failures
+        self.heartbeats = 0
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def update_one(self, query, update, **kwargs):
+        if "workerId" in query and "status" in query:
+            self.heartbeats += 1
+            if self.heartbeat_failures:
+                self.heartbeat_failures -= 1
+                raise ConnectionError("primary stepped down")
+        elif "workerId" in query and self.outcome_failures:
+            self.outcome_failures -= 1
+            raise ConnectionError("primary stepped down")
+        return await self.collection.update_one(query, update, **kwargs)
+
+
+def run_jobs(mongomock_motor, jobs: FlakyJobs, handler, count: int, lease_seconds: float = 0.3) -> list:
+    from job_queue import JobQueue
+
+    async def run():
+        jobs.collection = make_jobs(mongomock_motor)
+        queue = JobQueue(workers=1, lease_seconds=lease_seconds, poll_interval=0.01)
+        queue.register("echo", handler)
+        await queue.start(jobs)
+        submitted = [await queue.submit("echo", {"n": n}) for n in range(count)]
+        finished = [await queue.wait(job["id"], timeout=5) for job in submitted]
+        await queue.stop()
+        return finished
+
+    return asyncio.run(run())
+
+
+async def echo(payload: dict) -> dict:
+    return payload
+
+
+def test_failed_outcome_write_is_retried(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    jobs = FlakyJobs(None, outcome_failures=2)
+    [job] = run_jobs(mongomock_motor, jobs, echo, 1)
+
+    assert (job["status"], job["attempts"], job["result"]) == ("succeeded", 1, {"n": 0})
+
+
+def test_worker_survives_an_unrecordable_outcome(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from job_queue import OUTCOME_WRITE_ATTEMPTS
+
+    jobs = FlakyJobs(None, outcome_failures=OUTCOME_WRITE_ATTEMPTS)
+    first, second = run_jobs(mongomock_motor, jobs, echo, 2)
+
+    # The worker lived on: it ran the next job and, once the lease expired, the first one again
+    assert (first["status"], first["attempts"]) == ("succeeded", 2)
+    assert (second["status"], second["attempts"]) == ("succeeded", 1)
+
+
+def test_heartbeat_keeps_beating_after_a_failure(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    async def slow(payload: dict) -> dict:
+        await asyncio.sleep(0.35)
+        return payload
+
+    jobs = FlakyJobs(None, heartbeat_failures=1)
+    [job] = run_jobs(mongomock_motor, jobs, slow, 1)
+
+    assert job["status"] == "succeeded"
+    assert jobs.heartbeats >= 3
+
+
+def test_failure_handler_runs_once_after_the_last_attempt(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from job_queue import JobQueue
+
+    refunded = []
+
+    async def broken(payload: dict) -> dict:
+        raise RuntimeError("model unavailable")
+
+    async def refund(payload: dict):
+        refunded.append(payload)
+
+    async def run():
+        queue = JobQueue(workers=1, poll_interval=0.01)
+        queue.register("study_plan", broken, on_failure=refund)
+        await queue.start(make_jobs(mongomock_motor))
+        job = await queue.submit("study_plan", {"userId": "u"}, max_attempts=1)
+        finished = await queue.wait(job["id"], timeout=5)
+        await queue.stop()
+        return finished
+
+    assert asyncio.run(run())["status"] == "failed"
+    assert refunded == [{"userId": "u"}]
@@ -0,0 +1,110 @@
+"""
+Write volume of live test attempts.
+
+A student answering a 180-question paper must cost a bounded number of
+database writes, not one per answer event:
+
+    writes <= min(events, active seconds / debounce) + 1 final flush
+"""
+
+import asyncio
+import math
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+QUESTIONS = 180
+DEBOUNCE = 0.02
+EVENT_GAP = 0.001
+
+
+async def answer_paper(collection, writer_cls, stats: dict) -> tuple:
+    attempt = {
+        "id": "attempt-1",
+        "answers": "-" * QUESTIONS,
+        "deadline": datetime.utcnow() + timedelta(hours=3),
+        "status": "in_progress",
+        "version": 0,
+        "writes": 1,
+    }
+    await collection.insert_one(dict(attempt))
+    writer = writer_cls(collection, attempt, debounce=DEBOUNCE, stats=stats)
+    started = time.perf_counter()
+    for i in range(QUESTIONS):
+        writer.apply({"type": "answer", "index": i, "choice": i % 4})
+        writer.apply({"type": "navigate", "index": min(i + 1, QUESTIONS - 1)})
+        await asyncio.sleep(EVENT_GAP)
+    active = time.perf_counter() - started
+    await writer.close()
+    return writer, active, await collection.find_one({"id": "attempt-1"})
+
+
+def test_answer_events_are_coalesced(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from live_tests import AttemptWriter
+
+    stats = {}
+    collection = mongomock_motor.AsyncMongoMockClient()["live_tests"]["test_attempts"]
+    writer, active, saved = asyncio.run(answer_paper(collection, AttemptWriter, stats))
+
+    flushes = stats["writes"]
+    assert stats["events"] == 2 * QUESTIONS
+    assert flushes <= math.ceil(active / DEBOUNCE) + 1
+    assert flushes < QUESTIONS / 5
+    # Nothing is lost by coalescing
+    assert saved["answers"] == "".join(str(i % 4) for i in range(QUESTIONS))
+    assert saved["version"] == 2 * QUESTIONS
+    assert saved["writes"] == 1 + flushes
+
+
+def test_stale_write_does_not_overwrite_newer_state(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from live_tests import AttemptWriter
+
+    async def run():
+        collection = mongomock_motor.AsyncMongoMockClient()["live_tests"]["test_attempts"]
+        attempt = {"id": "a", "answers": "--", "deadline": datetime.utcnow() + timedelta(hours=1),
+                   "status": "in_progress", "version": 5, "writes": 1}
+        await collection.insert_one(dict(attempt))
+        stale = AttemptWriter(collection, {**attempt, "version": 3}, debounce=60)
+        stale.apply({"type": "answer", "index": 0, "choice": 1})
+        await stale.close()
+        return await collection.find_one({"id": "a"})
+
+    saved = asyncio.run(run())
+    assert (saved["answers"], saved["version"]) == ("--", 5)
+
+
+def test_failed_save_is_retried(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from live_tests import AttemptWriter
+
+    class FlakyCollection:
+        """Fails the first save, like a replica set election"""
+
+        def __init__(self, collection):
+            self.collection = collection
+            self.failures = 1
+
+        async def update_one(self, *args, **kwargs):
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("primary stepped down")
+            return await self.collection.update_one(*args, **kwargs)
+
+    async def run():
+        collection = mongomock_motor.AsyncMongoMockClient()["live_tests"]["test_attempts"]
+        attempt = {"id": "a", "answers": "--", "deadline": datetime.utcnow() + timedelta(hours=1),
+                   "status": "in_progress", "version": 0, "writes": 1}
+        await collection.insert_one(dict(attempt))
+        writer = AttemptWriter(FlakyCollection(collection), attempt, debounce=DEBOUNCE)
+        writer.apply({"type": "answer", "index": 1, "choice": 2})
+        # No further events: the failed window alone must lead to a retry
+        await asyncio.sleep(DEBOUNCE * 5)
+        saved = await collection.find_one({"id": "a"})
+        writer._task.cancel()
+        return saved
+
+    saved = asyncio.run(run())
+    assert (saved["answers"], saved["version"]) == ("-2", 1)
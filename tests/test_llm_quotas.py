@@ -0,0 +1,66 @@
+"""
+Daily per-user quotas on the routes that call the model.
+
+Only calls that produce an answer count: a failed generation gives its charge
+back, and two first calls of the day racing on the insert both count.
+"""
+
+import asyncio
+import types
+
+import pytest
+
+
+class RacingQuotas:
+    """Quota collection whose first upsert loses the insert race to another request"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.lost = False
+
+    async def update_one(self, query, update, upsert=False):
+        from pymongo.errors import DuplicateKeyError
+
+        if upsert and not self.lost:
+            self.lost = True
+            # The other request inserts the day's document first
+            await self.collection.update_one({k: v for k, v in query.items() if k != "count"}, update, upsert=True)
+            raise DuplicateKeyError("E11000 duplicate key error")
+        return await self.collection.update_one(query, update, upsert=upsert)
+
+
+def test_first_calls_of_the_day_racing_both_count(server, monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    monkeypatch.setitem(server.LLM_DAILY_QUOTAS, "buddy", 5)
+
+    async def run():
+        quotas = mongomock_motor.AsyncMongoMockClient()["quotas"]["llm_quotas"]
+        await quotas.create_index([("userId", 1), ("route", 1), ("day", 1)], unique=True)
+        monkeypatch.setattr(server, "db", types.SimpleNamespace(llm_quotas=RacingQuotas(quotas)))
+        await server.consume_llm_quota("u", "buddy")
+        return await quotas.find_one({"userId": "u"})
+
+    assert asyncio.run(run())["count"] == 2
+
+
+def test_failed_generation_is_refunded(api, server, monkeypatch):
+    from tests.loadtest.fake_llm import FakeLlmChat, FakeLlmConfig
+
+    monkeypatch.setitem(server.LLM_DAILY_QUOTAS, "buddy", 2)
+
+    async def ask(client, message):
+        response = await client.post("/api/ai/buddy", params={"userId": "quota-user", "message": message})
+        return response.status_code
+
+    async def body(client):
+        monkeypatch.setattr(FakeLlmChat, "config", FakeLlmConfig(latency_ms=1, latency_sigma=0, error_rate=1.0))
+        failed = await ask(client, "What is inertia?")
+        charged_after_failure = (await server.db.llm_quotas.find_one({"userId": "quota-user"}))["count"]
+        monkeypatch.setattr(FakeLlmChat, "config", FakeLlmConfig(latency_ms=1, latency_sigma=0))
+        answered = [await ask(client, f"Define {term}") for term in ("torque", "impulse", "momentum")]
+        return failed, charged_after_failure, answered
+
+    failed, charged_after_failure, answered = api(body)
+    assert (failed, charged_after_failure) == (200, 0)
+    # The failed call did not use up the allowance: two answers, then the quota is spent
+    assert answered == [200, 200, 429]
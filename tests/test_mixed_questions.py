@@ -0,0 +1,37 @@
+"""
+Mixed question sets drawn from several chapters in one request.
+"""
+
+from datetime import datetime
+
+
+def make_question(i: int, chapter: str, topic: str) -> dict:
+    return {"id": f"{chapter}-{i}", "subject": "Biology", "chapter": chapter, "topic": topic,
+            "question": f"{chapter} question {i}?", "options": ["A", "B", "C", "D"], "correctAnswer": i % 4,
+            "explanation": "", "difficulty": "easy" if i % 2 else "hard", "createdAt": datetime.utcnow()}
+
+
+def test_buckets_are_drawn_without_repeats(api, server):
+    async def body(client):
+        await server.db.questions.insert_many(
+            [make_question(i, "Genetics", "Mendel" if i < 4 else "Linkage") for i in range(10)]
+            + [make_question(i, "Evolution", "Origin of Life") for i in range(3)]
+        )
+        response = await client.post("/api/questions/mixed", json={"buckets": [
+            {"subject": "Biology", "chapter": "Genetics", "count": 10},
+            # Overlaps the Genetics bucket: every Mendel question was drawn there already
+            {"subject": "Biology", "chapter": "Genetics", "topic": "Mendel", "count": 2},
+            {"subject": "Biology", "chapter": "Evolution", "difficulty": "easy", "count": 5},
+        ], "view": "list"})
+        too_many = await client.post("/api/questions/mixed", json={"buckets": [
+            {"subject": "Biology", "chapter": "Genetics", "count": 200},
+            {"subject": "Biology", "chapter": "Evolution", "count": 1},
+        ]})
+        return response.json(), too_many.status_code
+
+    result, too_many = api(body)
+    ids = [q["id"] for q in result["questions"]]
+    assert len(ids) == len(set(ids)) == 11
+    assert [bucket["returned"] for bucket in result["buckets"]] == [10, 0, 1]
+    assert "correctAnswer" not in result["questions"][0]
+    assert too_many == 422
@@ -0,0 +1,48 @@
+"""
+Allocation of a paper's questions across subjects, chapters and difficulties,
+and reuse of assembled papers.
+"""
+
+from datetime import datetime, timedelta
+
+
+def test_largest_remainder_is_exact_and_respects_capacity(server):
+    from paper_assembly import largest_remainder
+
+    assert largest_remainder(10, {"a": 1, "b": 1, "c": 1}) == {"a": 4, "b": 3, "c": 3}
+    assert largest_remainder(45, {"easy": 0.3, "medium": 0.5, "hard": 0.2}) == {"easy": 14, "medium": 22, "hard": 9}
+    # The surplus of a capped part goes to the others
+    assert largest_remainder(10, {"a": 1, "b": 1}, {"a": 2, "b": 100}) == {"a": 2, "b": 8}
+    # Short only when the bank is
+    assert largest_remainder(10, {"a": 1, "b": 1}, {"a": 2, "b": 3}) == {"a": 2, "b": 3}
+
+
+def test_section_difficulty_mix_holds_across_chapters(server):
+    from paper_assembly import allocate_section
+
+    available = {("Physics", f"c{i}", level): 5 for i in range(20) for level in ("easy", "medium", "hard")}
+    cells = allocate_section("Physics", 45, {f"c{i}": 1 for i in range(20)},
+                             {"easy": 0.3, "medium": 0.5, "hard": 0.2}, available)
+    by_level = {}
+    for cell in cells:
+        by_level[cell["difficulty"]] = by_level.get(cell["difficulty"], 0) + cell["count"]
+    assert by_level == {"easy": 14, "medium": 22, "hard": 9}
+
+
+def test_short_paper_is_reused_briefly(api, server):
+    async def body(client):
+        # The sample bank is far short of a 180-question NEET paper
+        await client.post("/api/questions/populate-samples")
+        first = (await client.post("/api/papers/assemble")).json()
+        again = (await client.post("/api/papers/assemble")).json()
+        stored = await server.db.papers.count_documents({})
+        refreshed = (await client.post("/api/papers/assemble", params={"refresh": "true"})).json()
+        await server.db.papers.update_many({}, {"$set": {"createdAt": datetime.utcnow() - timedelta(hours=1)}})
+        expired = (await client.post("/api/papers/assemble")).json()
+        return first, again, stored, refreshed, expired
+
+    first, again, stored, refreshed, expired = api(body)
+    assert not first["complete"] and first["totalQuestions"] > 0
+    assert (again["id"], stored) == (first["id"], 1)
+    assert refreshed["id"] != first["id"]
+    assert expired["id"] not in (first["id"], refreshed["id"])
@@ -0,0 +1,37 @@
+"""
+Question counts kept by the catalog and the routes that read them.
+
+Counts are adjusted on every write through the API; writes made elsewhere
+show up after a rebuild, and must never hide stored questions meanwhile.
+"""
+
+from datetime import datetime
+
+QUESTION = {"id": "direct", "subject": "Physics", "chapter": "Gravitation", "topic": "Orbits",
+            "question": "Escape velocity from Earth is about?", "options": ["11.2 km/s", "7.9 km/s", "3 km/s", "1 km/s"],
+            "correctAnswer": 0, "explanation": "sqrt(2gR)", "difficulty": "medium"}
+
+
+def test_incremental_counts_match_a_rebuild(api):
+    async def body(client):
+        await client.post("/api/questions/populate-samples")
+        await client.post("/api/questions/populate-samples")
+        incremental = (await client.get("/api/questions/catalog")).json()
+        await client.post("/api/questions/catalog/rebuild")
+        return incremental, (await client.get("/api/questions/catalog")).json()
+
+    incremental, rebuilt = api(body)
+    assert incremental["total"] > 0
+    assert incremental == rebuilt
+
+
+def test_generate_serves_questions_the_catalog_does_not_count(api, server):
+    async def body(client):
+        # Written outside the API, so the catalog (already loaded by warm-up) still counts nothing
+        await server.db.questions.insert_one({**QUESTION, "createdAt": datetime.utcnow()})
+        response = await client.post("/api/questions/generate",
+                                      params={"subject": "Physics", "chapter": "Gravitation"})
+        return response.json()["questions"]
+
+    questions = api(body)
+    assert [q["id"] for q in questions] == ["direct"]
@@ -0,0 +1,52 @@
+"""
+Exact and near-duplicate handling of the question bank.
+
+Questions stored before contentHash existed have no hash; the unique index
+only protects them once they are backfilled, and a dry run must not write a
+hash that an exact copy still holds.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+QUESTION = {"subject": "Physics", "chapter": "Laws of Motion", "topic": "Newton's Laws",
+            "question": "What is the SI unit of force?", "options": ["Newton", "Joule", "Watt", "Pascal"],
+            "correctAnswer": 0, "explanation": "kg m/s^2", "difficulty": "Easy"}
+
+
+def test_dry_run_leaves_hash_held_by_an_exact_copy(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from question_dedup import annotate, dedup_collection, ensure_dedup_indexes
+
+    async def run():
+        collection = mongomock_motor.AsyncMongoMockClient()["dedup"]["questions"]
+        await ensure_dedup_indexes(collection)
+        created = datetime.utcnow() - timedelta(days=30)
+        await collection.insert_one({**QUESTION, "id": "legacy", "createdAt": created})
+        await collection.insert_one(annotate({**QUESTION, "id": "copy", "createdAt": created + timedelta(days=1)}))
+
+        dry_run = await dedup_collection(collection)
+        legacy = await collection.find_one({"id": "legacy"})
+        applied = await dedup_collection(collection, apply=True)
+        return dry_run, legacy, applied, await collection.find({}, {"_id": 0}).to_list(None)
+
+    dry_run, legacy, applied, stored = asyncio.run(run())
+    assert (dry_run["duplicates"], dry_run["backfilled"]) == (1, 0)
+    assert "contentHash" not in legacy
+    assert applied["duplicates"] == 1
+    # Once the copy is gone the oldest question takes over its hash
+    assert [(q["id"], "contentHash" in q) for q in stored] == [("legacy", True)]
+
+
+def test_import_matches_questions_stored_without_a_hash(api, server):
+    async def body(client):
+        await server.db.questions.insert_one({**QUESTION, "id": "legacy", "createdAt": datetime.utcnow()})
+        response = await client.post("/api/questions/populate-samples")
+        stored = await server.db.questions.count_documents({"question": QUESTION["question"]})
+        return response.json(), stored
+
+    result, stored = api(body)
+    assert result["duplicates"] == 1
+    assert stored == 1
@@ -0,0 +1,25 @@
+"""
+Row validation of the streaming question import.
+
+A bad line must be reported against its line number and skipped; it must
+never abort the import, since earlier chunks are already committed.
+"""
+
+import io
+import json
+
+
+def test_non_object_lines_are_invalid(server):
+    from question_import import ImportReport, iter_rows, prepare_chunk
+
+    question = {"question": "Unit of force?", "options": ["N", "J", "W", "Pa"], "correctAnswer": 0,
+                "explanation": "Newton", "subject": "Physics", "chapter": "Laws of Motion", "topic": "Force"}
+    lines = [json.dumps(question), "[1, 2]", '"x"', "3", "{broken"]
+    report = ImportReport()
+
+    documents = prepare_chunk(iter_rows(io.StringIO("\n".join(lines)), "ndjson"), 100, server.Question, set(), report)
+
+    assert [d["question"] for d in documents] == ["Unit of force?"]
+    assert (report.read, report.invalid) == (5, 4)
+    assert [error["line"] for error in report.errors] == [2, 3, 4, 5]
+    assert "expected a JSON object, got list" in report.errors[0]["error"]
@@ -0,0 +1,34 @@
+"""
+List-view question fetches and the answers looked up after submission.
+
+The list view must not leak answers or explanations; POST /questions/answers
+returns them later, including for questions embedded in pre-generated sets.
+"""
+
+from datetime import datetime
+
+QUESTION = {"subject": "Physics", "chapter": "Gravitation", "topic": "Orbits",
+            "question": "Escape velocity from Earth is about?", "options": ["11.2 km/s", "7.9 km/s", "3 km/s", "1 km/s"],
+            "correctAnswer": 0, "explanation": "sqrt(2gR)", "difficulty": "medium"}
+
+
+def test_list_view_hides_answers_until_requested(api, server):
+    async def body(client):
+        await server.db.questions.insert_one({**QUESTION, "id": "bank", "createdAt": datetime.utcnow()})
+        await server.db.pregenerated_questions.insert_one({
+            "subject": "Physics", "chapter": "Gravitation",
+            "questions": [{**QUESTION, "id": "pregenerated", "correctAnswer": 2, "explanation": "embedded"}],
+        })
+        listed = await client.post("/api/questions/generate",
+                                    params={"subject": "Physics", "chapter": "Gravitation", "view": "list"})
+        answers = await client.post("/api/questions/answers", json={"ids": ["bank", "pregenerated", "gone", "bank"]})
+        return listed.json()["questions"], answers.json()
+
+    listed, answers = api(body)
+    assert [q["id"] for q in listed] == ["bank"]
+    assert not {"correctAnswer", "explanation"} & set(listed[0])
+    assert answers == {
+        "answers": [{"id": "bank", "correctAnswer": 0, "explanation": "sqrt(2gR)"},
+                    {"id": "pregenerated", "correctAnswer": 2, "explanation": "embedded"}],
+        "missing": ["gone"],
+    }
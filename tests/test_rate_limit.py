@@ -0,0 +1,61 @@
+"""
+Token buckets behind the AI route limits, and the 429s they produce.
+"""
+
+import pytest
+
+
+def test_bucket_refills_and_limits(server):
+    from rate_limit import Limit, MemoryBackend
+
+    backend = MemoryBackend()
+    limit = Limit(rate=1.0, burst=2.0)
+    assert backend.take_now("k", limit) == 0
+    assert backend.take_now("k", limit) == 0
+    assert 0 < backend.take_now("k", limit) <= 1.0
+
+
+@pytest.fixture
+def limited(server, monkeypatch):
+    """Two requests per minute per IP on the pregenerated route, in fresh buckets"""
+    import rate_limit
+
+    limiter = server.rate_limiter
+    monkeypatch.setattr(limiter, "enabled", True)
+    monkeypatch.setattr(limiter, "backend", rate_limit.MemoryBackend())
+    monkeypatch.setitem(limiter.limits, "pregenerated", rate_limit.RouteLimit(user=None, ip=rate_limit.Limit.per_minute(2, 2)))
+    return rate_limit
+
+
+def statuses(api, forwarded_for: list) -> list:
+    async def body(client):
+        return [
+            (await client.post("/api/jobs/pregenerated-questions", params={"subject": "Physics", "chapter": "Optics"},
+                               headers={"X-Forwarded-For": value})).status_code
+            for value in forwarded_for
+        ]
+
+    return api(body)
+
+
+def test_exhausted_bucket_returns_429_with_retry_after(api, limited):
+    async def body(client):
+        return [await client.post("/api/jobs/pregenerated-questions", params={"subject": "Physics", "chapter": "Optics"})
+                for _ in range(3)]
+
+    responses = api(body)
+    assert [r.status_code for r in responses] == [202, 202, 429]
+    assert 0 < int(responses[2].headers["Retry-After"]) <= 30
+
+
+def test_forged_forwarded_for_does_not_reset_the_bucket(api, limited):
+    # Untrusted by default: every request counts against the TCP peer
+    assert statuses(api, ["10.0.0.1", "10.0.0.2", "10.0.0.3"]) == [202, 202, 429]
+
+
+def test_forwarded_for_is_read_from_the_right_behind_a_proxy(api, limited, monkeypatch):
+    monkeypatch.setattr(limited, "TRUST_FORWARDED_FOR", True)
+    monkeypatch.setattr(limited, "TRUSTED_PROXY_HOPS", 1)
+    # The proxy appends the peer it saw; entries to its left come from the client
+    assert statuses(api, [f"10.0.0.{i}, 203.0.113.7" for i in range(3)]) == [202, 202, 429]
+    assert statuses(api, [f"203.0.113.{i}" for i in range(10, 13)]) == [202, 202, 202]
@@ -0,0 +1,15 @@
+"""
+Filters of the question search.
+"""
+
+import asyncio
+
+import pytest
+
+
+def test_unknown_difficulty_is_rejected(server):
+    from fastapi import HTTPException
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.search_questions(q="newton force", difficulty="foo"))
+    assert error.value.status_code == 400
@@ -0,0 +1,69 @@
+"""
+Mastery classification of the nightly weak-area job, and resuming its runs.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def test_classification(server):
+    from weak_areas import init_worker, user_mastery
+
+    init_worker({"a": ("Biology", "Evolution", "Origin of Life"), "b": ("Biology", "Genetics", "Mendel")}, 5)
+    [result] = user_mastery({
+        "userIds": ["u"],
+        "practice": [{"_id": {"userId": "u", "subject": "Biology", "chapter": "Genetics"}, "attempted": 10, "correct": 7}],
+        "attempts": [
+            {"_id": {"userId": "u", "questionId": "a"}, "n": 6, "correct": 2},
+            {"_id": {"userId": "u", "questionId": "b"}, "n": 2, "correct": 0},
+            {"_id": {"userId": "u", "questionId": "deleted"}, "n": 9, "correct": 0},
+        ],
+    })
+
+    chapters = {entry["chapter"]: entry for entry in result["chapters"]}
+    assert (chapters["Genetics"]["attempts"], chapters["Genetics"]["classification"]) == (12, "Needs Revision")
+    assert (chapters["Evolution"]["accuracy"], chapters["Evolution"]["classification"]) == (33.3, "Weak")
+    assert {entry["topic"]: entry["classification"] for entry in result["topics"]} == {
+        "Origin of Life": "Weak", "Mendel": "Weak"}
+    # Mendel is weak but has too few attempts to count as a weak area
+    assert result["weakAreas"] == ["Evolution"]
+
+
+def run_after_checkpoint(mongomock_motor, started_ago: timedelta) -> dict:
+    from batch import Checkpoint
+    from weak_areas import CHECKPOINT_JOB, compute_weak_areas
+
+    async def run():
+        db = mongomock_motor.AsyncMongoMockClient()["weak_areas"]
+        await db.users.insert_many([{"id": f"u{i}"} for i in range(3)])
+        await db.questions.insert_one({"id": "q", "subject": "Physics", "chapter": "Optics", "topic": "Lenses"})
+        await db.question_attempts.insert_many([
+            {"userId": f"u{i}", "meta": {"questionId": "q"}, "correct": False} for i in range(3) for _ in range(5)
+        ])
+        # Left behind by a run whose last attempt failed after the first chunk
+        await Checkpoint(db, CHECKPOINT_JOB).save(
+            {"lastUserId": "u0", "users": 1, "weak": 1, "startedAt": datetime.utcnow() - started_ago})
+        report = await compute_weak_areas(db, chunk_users=1)
+        return report, await Checkpoint(db, CHECKPOINT_JOB).load()
+
+    return asyncio.run(run())
+
+
+def test_same_night_run_resumes_from_checkpoint(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    report, checkpoint = run_after_checkpoint(mongomock_motor, timedelta(minutes=5))
+
+    assert (report["resumedAfter"], report["users"], report["usersWithWeakAreas"]) == ("u0", 3, 3)
+    assert checkpoint is None
+
+
+def test_next_scheduled_run_discards_an_old_checkpoint(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    report, checkpoint = run_after_checkpoint(mongomock_motor, timedelta(days=2))
+
+    assert (report["resumedAfter"], report["users"]) == (None, 3)
+    assert checkpoint is None
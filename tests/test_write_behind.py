@@ -0,0 +1,62 @@
+"""
+Write-behind queues: a failed flush must not lose or reorder documents.
+"""
+
+import asyncio
+
+import pytest
+
+
+class FlakyCollection:
+    """Fails the first insert, like a replica set election"""
+
+    def __init__(self, collection, failures: int = 1):
+        self.collection = collection
+        self.failures = failures
+
+    async def insert_many(self, documents, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("primary stepped down")
+        return await self.collection.insert_many(documents, ordered=ordered)
+
+
+def test_failed_flush_requeues_the_batch(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from write_behind import WriteBehindQueue
+
+    async def run():
+        collection = mongomock_motor.AsyncMongoMockClient()["write_behind"]["chat_messages"]
+        queue = WriteBehindQueue("chat", max_batch=3, flush_interval=0.01)
+        await queue.start(FlakyCollection(collection))
+        for n in range(5):
+            queue.put({"n": n})
+        # The first batch fails; the flusher retries after flush_interval
+        for _ in range(100):
+            if await collection.count_documents({}) == 5:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return queue.stats(), [doc["n"] async for doc in collection.find().sort("_id", 1)]
+
+    stats, stored = asyncio.run(run())
+    assert stored == [0, 1, 2, 3, 4]
+    assert (stats["failedBatches"], stats["written"], stats["dropped"], stats["depth"]) == (1, 5, 0, 0)
+
+
+def test_stop_drains_after_a_failed_flush(server):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from write_behind import WriteBehindQueue
+
+    async def run():
+        collection = mongomock_motor.AsyncMongoMockClient()["write_behind"]["llm_calls"]
+        queue = WriteBehindQueue("ledger", max_batch=2, flush_interval=60)
+        queue.collection = FlakyCollection(collection)
+        for n in range(3):
+            queue.put({"n": n})
+        assert not await queue.flush()
+        await asyncio.wait_for(queue.stop(), timeout=5)
+        return queue.stats(), await collection.count_documents({})
+
+    stats, stored = asyncio.run(run())
+    assert (stored, stats["written"], stats["dropped"]) == (3, 3, 0)